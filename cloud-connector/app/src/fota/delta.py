@@ -0,0 +1,316 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import struct
+
+DELTA_MAGIC = b"FOTADELTA1\n"
+GZIP_MAGIC = b"\x1f\x8b"
+DELTA_BLOCK_SIZE = 16 * 1024
+COPY_BLOCK_SIZE = 1024 * 1024
+MAX_LITERAL = 1024 * 1024
+WEAK_MODULUS = 1 << 16
+
+OP_COPY = b"C"
+OP_DATA = b"D"
+OP_END = b"E"
+COPY_FORMAT = ">QI"
+DATA_FORMAT = ">I"
+HEADER_FORMAT = ">I"
+
+INSTALLED_DIR = "installed"
+INSTALLED_STATE = "installed.json"
+
+
+class DeltaError(Exception):
+    pass
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_gzip(path):
+    with open(path, "rb") as f:
+        return f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def tar_name(file):
+    """Name of the package once its tar is stored uncompressed."""
+    if file.endswith(".tgz"):
+        return file[: -len(".tgz")] + ".tar"
+    if file.endswith(".gz"):
+        return file[: -len(".gz")]
+    return file
+
+
+def read_tar(path):
+    # compression spreads a change over the rest of the stream, so deltas
+    # are made between the uncompressed tars
+    with open(path, "rb") as f:
+        content = f.read()
+    if content.startswith(GZIP_MAGIC):
+        return gzip.decompress(content)
+    return content
+
+
+def unpack_gzip(source, path):
+    """Writes the decompressed source to path, returns its sha256."""
+    digest = hashlib.sha256()
+    with gzip.open(source, "rb") as f, open(path, "wb") as target:
+        for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+            digest.update(block)
+            target.write(block)
+    return digest.hexdigest()
+
+
+def weak_checksum(window):
+    a = sum(window) % WEAK_MODULUS
+    b = sum((len(window) - i) * byte for i, byte in enumerate(window)) % WEAK_MODULUS
+    return a, b
+
+
+class DeltaWriter:
+    def __init__(self, f) -> None:
+        self.f = f
+        self.copy = None
+        self.literal = bytearray()
+
+    def add_copy(self, offset, length):
+        self.flush_literal()
+        if self.copy is not None and self.copy[0] + self.copy[1] == offset:
+            self.copy = (self.copy[0], self.copy[1] + length)
+            return
+        self.flush_copy()
+        self.copy = (offset, length)
+
+    def add_literal(self, data):
+        self.flush_copy()
+        self.literal += data
+        if len(self.literal) >= MAX_LITERAL:
+            self.flush_literal()
+
+    def flush_copy(self):
+        if self.copy is not None:
+            self.f.write(OP_COPY + struct.pack(COPY_FORMAT, *self.copy))
+            self.copy = None
+
+    def flush_literal(self):
+        if self.literal:
+            self.f.write(OP_DATA + struct.pack(DATA_FORMAT, len(self.literal)))
+            self.f.write(self.literal)
+            self.literal = bytearray()
+
+    def close(self):
+        self.flush_copy()
+        self.flush_literal()
+        self.f.write(OP_END)
+
+
+def make_delta(base_path, target_path, delta_path, block_size=DELTA_BLOCK_SIZE):
+    """Writes the delta turning base into target, run when a campaign is
+    built. Blocks of base found at any offset of target, like binaries
+    unchanged between two VRTE releases, are copied, everything else is
+    stored as is. Gzipped packages are decompressed first, the delta
+    rebuilds the uncompressed tar and the digests of the header are those
+    of the uncompressed tars, which the campaign has to name as
+    base_sha256 and sha256. Returns the header."""
+    base = read_tar(base_path)
+    target = read_tar(target_path)
+    index = {}
+    for offset in range(0, len(base) - block_size + 1, block_size):
+        index.setdefault(weak_checksum(base[offset : offset + block_size]), offset)
+    header = {
+        "base_sha256": hashlib.sha256(base).hexdigest(),
+        "base_size": len(base),
+        "target_sha256": hashlib.sha256(target).hexdigest(),
+        "target_size": len(target),
+    }
+    with open(delta_path, "wb") as f:
+        encoded = json.dumps(header).encode()
+        f.write(DELTA_MAGIC + struct.pack(HEADER_FORMAT, len(encoded)) + encoded)
+        writer = DeltaWriter(f)
+        position = 0
+        literal_start = 0
+        checksum = None
+        while position + block_size <= len(target):
+            if checksum is None:
+                checksum = weak_checksum(target[position : position + block_size])
+            offset = index.get(checksum)
+            if (
+                offset is not None
+                and base[offset : offset + block_size]
+                == target[position : position + block_size]
+            ):
+                writer.add_literal(target[literal_start:position])
+                writer.add_copy(offset, block_size)
+                position += block_size
+                literal_start = position
+                checksum = None
+                continue
+            if position + block_size < len(target):
+                # roll the window one byte on
+                removed = target[position]
+                added = target[position + block_size]
+                a = (checksum[0] - removed + added) % WEAK_MODULUS
+                b = (checksum[1] - block_size * removed + a) % WEAK_MODULUS
+                checksum = (a, b)
+            position += 1
+        writer.add_literal(target[literal_start:])
+        writer.close()
+    return header
+
+
+def read_header(f):
+    if f.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+        raise DeltaError("not a FOTA delta")
+    (length,) = struct.unpack(HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT)))
+    return json.loads(f.read(length))
+
+
+def read_exactly(f, length):
+    data = f.read(length)
+    if len(data) != length:
+        raise DeltaError("delta truncated")
+    return data
+
+
+def apply_delta(
+    base_path, delta_path, target_path, expected_sha256=None, base_sha256=None
+):
+    """Rebuilds the target package from base and the delta in one streaming
+    pass. The base must be the one the delta was made from, base_sha256 saves
+    hashing it if already known. The result must hash to the target digest of
+    the delta, and to expected_sha256 if given, otherwise nothing is written
+    to target_path and DeltaError is raised. Returns the sha256 of the
+    target."""
+    part_path = target_path + ".part"
+    with open(delta_path, "rb") as delta:
+        header = read_header(delta)
+        if expected_sha256 and expected_sha256 != header["target_sha256"]:
+            raise DeltaError("delta does not build the requested package")
+        if os.path.getsize(base_path) != header["base_size"] or (
+            (base_sha256 or file_sha256(base_path)) != header["base_sha256"]
+        ):
+            raise DeltaError("installed package is not the base of the delta")
+        digest = hashlib.sha256()
+        try:
+            with open(base_path, "rb") as base, open(part_path, "wb") as target:
+                while True:
+                    op = read_exactly(delta, 1)
+                    if op == OP_END:
+                        break
+                    if op == OP_COPY:
+                        offset, length = struct.unpack(
+                            COPY_FORMAT,
+                            read_exactly(delta, struct.calcsize(COPY_FORMAT)),
+                        )
+                        if offset + length > header["base_size"]:
+                            raise DeltaError("delta copies beyond the base")
+                        base.seek(offset)
+                        while length > 0:
+                            block = read_exactly(base, min(COPY_BLOCK_SIZE, length))
+                            digest.update(block)
+                            target.write(block)
+                            length -= len(block)
+                    elif op == OP_DATA:
+                        (length,) = struct.unpack(
+                            DATA_FORMAT,
+                            read_exactly(delta, struct.calcsize(DATA_FORMAT)),
+                        )
+                        block = read_exactly(delta, length)
+                        digest.update(block)
+                        target.write(block)
+                    else:
+                        raise DeltaError("unknown delta operation {!r}".format(op))
+                target.flush()
+                os.fsync(target.fileno())
+                size = target.tell()
+            if (
+                size != header["target_size"]
+                or digest.hexdigest() != header["target_sha256"]
+            ):
+                raise DeltaError("rebuilt package does not match its digest")
+        except Exception:
+            os.remove(part_path)
+            raise
+    os.replace(part_path, target_path)
+    return digest.hexdigest()
+
+
+def load_installed(fota_host_dir):
+    try:
+        with open(os.path.join(fota_host_dir, INSTALLED_STATE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_installed(fota_host_dir, state):
+    path = os.path.join(fota_host_dir, INSTALLED_STATE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def installed_base(fota_host_dir):
+    """Returns {"file", "path", "sha256"} of the package last flashed
+    successfully, the base for deltas, or None."""
+    installed = load_installed(fota_host_dir).get("installed")
+    if installed is None:
+        return None
+    installed["path"] = os.path.join(fota_host_dir, INSTALLED_DIR, installed["file"])
+    if not os.path.exists(installed["path"]):
+        return None
+    return installed
+
+
+def record_flash_pending(fota_host_dir, file, sha256):
+    """Remembers the package handed to flashing, it becomes the installed
+    base once the flashing reports success."""
+    state = load_installed(fota_host_dir)
+    state["pending"] = {"file": file, "sha256": sha256}
+    save_installed(fota_host_dir, state)
+
+
+def promote_pending(fota_host_dir):
+    """Keeps a copy of the flashed package under installed/, the download
+    itself may be cleaned up. A gzipped package is kept as uncompressed tar,
+    the base deltas are made against. Returns the new base or None."""
+    state = load_installed(fota_host_dir)
+    pending = state.pop("pending", None)
+    if pending is None:
+        return None
+    installed_dir = os.path.join(fota_host_dir, INSTALLED_DIR)
+    os.makedirs(installed_dir, exist_ok=True)
+    source = os.path.join(fota_host_dir, pending["file"])
+    compressed = is_gzip(source)
+    if compressed:
+        pending = {"file": tar_name(pending["file"])}
+    path = os.path.join(installed_dir, pending["file"])
+    try:
+        os.remove(path + ".tmp")
+    except FileNotFoundError:
+        pass
+    if compressed:
+        pending["sha256"] = unpack_gzip(source, path + ".tmp")
+    else:
+        try:
+            os.link(source, path + ".tmp")
+        except OSError:
+            shutil.copyfile(source, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    previous = state.get("installed")
+    state["installed"] = pending
+    save_installed(fota_host_dir, state)
+    if previous is not None and previous["file"] != pending["file"]:
+        try:
+            os.remove(os.path.join(installed_dir, previous["file"]))
+        except FileNotFoundError:
+            pass
+    return pending
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from utils.bandwidth import PRIORITY_FOTA, bandwidthShaper
+
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+DOWNLOAD_CONCURRENCY = 4
+DOWNLOAD_RETRIES = 3
+HASH_BLOCK_SIZE = 256 * 1024
+READ_BLOCK_SIZE = 64 * 1024
+AES_BLOCK_SIZE = 16
+
+
+class RangedDownload:
+    """Downloads an S3 object with parallel ranged GETs and processes it in a
+    single pass.
+
+    Up to concurrency chunks are fetched at once, they are consumed in order:
+    decrypted if an AES-CBC (key, iv) is given, hashed and written to a
+    preallocated path.part file. Neither the encrypted package nor the whole
+    plaintext is ever held, peak memory is concurrency * chunk_size.
+
+    The number of finished chunks is recorded in path.part.json. A download
+    interrupted by a reboot or a dropped connection resumes at the first
+    missing chunk as long as the object (ETag) did not change. Once all chunks
+    are written the digest is checked by the optional verifier and the file is
+    renamed to path, sha256 is the digest of its content. A package failing
+    the check is deleted.
+
+    Responses are read at the rate the bandwidth shaper allows for FOTA
+    traffic, which goes ahead of uploads."""
+
+    def __init__(
+        self,
+        s3_cli,
+        bucket,
+        key,
+        path,
+        chunk_size=DOWNLOAD_CHUNK_SIZE,
+        concurrency=DOWNLOAD_CONCURRENCY,
+        progress=None,
+        decryption=None,
+        verifier=None,
+    ) -> None:
+        if decryption is not None and chunk_size % AES_BLOCK_SIZE:
+            raise ValueError("chunk size must be a multiple of the AES block size")
+        self.s3_cli = s3_cli
+        self.bucket = bucket
+        self.key = key
+        self.path = path
+        self.part_path = path + ".part"
+        self.state_path = path + ".part.json"
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.progress = progress
+        self.decryption = decryption
+        self.verifier = verifier
+        self.sha256 = None
+
+    def load_state(self, etag, size):
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if (
+            state.get("etag") != etag
+            or state.get("size") != size
+            or state.get("chunk_size") != self.chunk_size
+            or not os.path.exists(self.part_path)
+        ):
+            return 0
+        return state["next"]
+
+    def save_state(self):
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(
+                {
+                    "etag": self.etag,
+                    "size": self.size,
+                    "chunk_size": self.chunk_size,
+                    "next": self.next,
+                },
+                f,
+            )
+        os.replace(temp_path, self.state_path)
+
+    def preallocate(self):
+        with open(self.part_path, "wb") as f:
+            if self.size and hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, self.size)
+            else:
+                f.truncate(self.size)
+
+    def rehash(self, length):
+        # only on resume, the part already on disk is read back once
+        with open(self.part_path, "rb") as f:
+            while length > 0:
+                block = f.read(min(HASH_BLOCK_SIZE, length))
+                if not block:
+                    raise IOError("{} is shorter than recorded".format(self.part_path))
+                self.update(block)
+                length -= len(block)
+
+    def update(self, content):
+        """Called with the content of the package in order."""
+        self.digest.update(content)
+
+    def fetch_chunk(self, index, with_iv):
+        """Returns the bytes of chunk index, preceded by the last cipher block
+        of the previous chunk if with_iv."""
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.size) - 1
+        if with_iv:
+            start -= AES_BLOCK_SIZE
+        for attempt in range(DOWNLOAD_RETRIES):
+            try:
+                response = self.s3_cli.get_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Range="bytes={}-{}".format(start, end),
+                    IfMatch=self.etag,
+                )
+                data = self.read_body(response["Body"])
+                if len(data) != end + 1 - start:
+                    raise IOError(
+                        "chunk {} has {} of {} bytes".format(
+                            index, len(data), end + 1 - start
+                        )
+                    )
+                return data
+            except Exception as e:
+                print("chunk {} failed: {}".format(index, e))
+                if attempt == DOWNLOAD_RETRIES - 1:
+                    raise
+                time.sleep(2**attempt)
+
+    def read_body(self, body):
+        blocks = []
+        for block in body.iter_chunks(READ_BLOCK_SIZE):
+            bandwidthShaper.consume(len(block), PRIORITY_FOTA)
+            blocks.append(block)
+        return b"".join(blocks)
+
+    def create_decryptor(self, iv):
+        key, _ = self.decryption
+        return Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+
+    def consume(self, f, data, with_iv):
+        if self.decryption is not None:
+            if with_iv:
+                self.decryptor = self.create_decryptor(data[:AES_BLOCK_SIZE])
+                data = data[AES_BLOCK_SIZE:]
+            data = self.decryptor.update(data)
+        view = memoryview(data)
+        for offset in range(0, len(view), HASH_BLOCK_SIZE):
+            self.update(view[offset : offset + HASH_BLOCK_SIZE])
+        f.write(data)
+        # the chunk must be on disk before it is recorded as done
+        f.flush()
+        os.fsync(f.fileno())
+
+    def run(self, head=None):
+        if head is None:
+            head = self.s3_cli.head_object(Bucket=self.bucket, Key=self.key)
+        self.etag = head["ETag"]
+        self.size = head["ContentLength"]
+        if self.decryption is not None and self.size % AES_BLOCK_SIZE:
+            raise ValueError("{} is not AES-CBC encrypted".format(self.key))
+        chunks = -(-self.size // self.chunk_size)
+        self.digest = hashlib.sha256()
+        self.next = self.load_state(self.etag, self.size)
+        self.decryptor = None
+        if self.next:
+            print(
+                "resuming download of {}, {} of {} chunks done".format(
+                    self.key, self.next, chunks
+                )
+            )
+            self.rehash(self.next * self.chunk_size)
+        else:
+            self.preallocate()
+            self.save_state()
+            if self.decryption is not None:
+                self.decryptor = self.create_decryptor(self.decryption[1])
+        resumed = self.next
+
+        with open(self.part_path, "r+b") as f:
+            f.seek(self.next * self.chunk_size)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                pending = deque()
+                submitted = self.next
+                try:
+                    while self.next < chunks:
+                        while submitted < chunks and len(pending) < self.concurrency:
+                            # a resumed decryption continues from the cipher block
+                            # before the first missing chunk
+                            with_iv = self.decryption is not None and submitted == (
+                                resumed or -1
+                            )
+                            future = executor.submit(
+                                self.fetch_chunk, submitted, with_iv
+                            )
+                            pending.append((future, with_iv))
+                            submitted += 1
+                        future, with_iv = pending.popleft()
+                        self.consume(f, future.result(), with_iv)
+                        self.next += 1
+                        self.save_state()
+                        if self.progress is not None:
+                            self.progress(
+                                min(self.next * self.chunk_size, self.size), self.size
+                            )
+                except Exception:
+                    executor.shutdown(cancel_futures=True)
+                    raise
+            # None if all chunks were already written before a restart
+            if self.decryptor is not None:
+                self.decryptor.finalize()
+
+        self.sha256 = self.digest.hexdigest()
+        if self.verifier is not None:
+            try:
+                self.verifier.verify(self.digest.digest())
+            except Exception:
+                os.remove(self.part_path)
+                os.remove(self.state_path)
+                raise
+        os.replace(self.part_path, self.path)
+        os.remove(self.state_path)
+        return self.path
+
+
+def download_ranged(
+    s3_cli,
+    bucket,
+    key,
+    path,
+    config=None,
+    progress=None,
+    head=None,
+    decryption=None,
+    verifier=None,
+):
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+    concurrency = DOWNLOAD_CONCURRENCY
+    if config is not None:
+        chunk_size = int(config.fota_download_chunk_size)
+        concurrency = int(config.fota_download_concurrency)
+    download = RangedDownload(
+        s3_cli,
+        bucket,
+        key,
+        path,
+        chunk_size,
+        concurrency,
+        progress,
+        decryption,
+        verifier,
+    )
+    download.run(head)
+    return download
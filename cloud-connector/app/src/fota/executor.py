@@ -0,0 +1,333 @@
+import argparse
+import glob
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # only needed to run the service
+    mqtt = None
+
+FOTA_START_TOPIC = "fota_control_start"
+FOTA_CONTROL_TOPIC = "fota_control"
+FOTA_MODE_TOPIC = "fota_mode"
+CLIENT_ID = "fota-executor"
+
+VIP_HOST = "192.168.56.49"
+VIP_PASSWORD = "root"
+PING_COUNT = 3
+REBOOT_WAIT_S = 20
+CIP_RESTART_DELAY_S = 5
+COMMAND_TIMEOUT_S = 600
+UNPACK_DIR = "vrte"
+JOURNAL_NAME = "fota_journal.json"
+
+FOTA_MODE_FLASHING = "1"
+FOTA_MODE_DONE = "2"
+FOTA_MODE_FAILED = "3"
+FOTA_MODE_RESTART_CIP = "5"
+FLASH_DONE_STATE = 12
+
+# name, state and text reported when entered, state and text reported if it
+# fails, the states and texts of flash_vip.sh where it had them
+PHASES = [
+    ("check_vip", -2, "Test connection to VIP with IP {host}", -3, "Ping failed"),
+    ("stop_vrte", 4, "stop vrte", -4, None),
+    ("move_old_vrte", 5, "moving old VRTE", -5, None),
+    ("create_vrte_dir", 6, "create VRTE directory", -6, None),
+    ("unpack", 7, "untar VRTE files", -7, None),
+    ("copy_vrte", 8, "copy VRTE files to VIP", -8, None),
+    ("reboot_vip", 9, "reboot VIP to start the new VRTE", -9, None),
+    ("wait_vip", 10, "wait for VIP to boot", -10, None),
+    (
+        "check_vip_again",
+        11,
+        "Test connection to VIP with IP {host}",
+        -12,
+        "ERROR: Ping to VIP with IP {host} was failed. --> Update failed",
+    ),
+]
+# reported once a phase succeeded
+PHASE_DONE = {"check_vip": (3, "Ping successfull")}
+PHASE_NAMES = [phase[0] for phase in PHASES]
+
+
+def run_command(args, timeout=COMMAND_TIMEOUT_S):
+    print("running", " ".join(args))
+    try:
+        return subprocess.run(args, timeout=timeout).returncode
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(e)
+        return -1
+
+
+class FotaJournal:
+    """Queued packages and the phase of the running job, rewritten atomically
+    on every change so a restarted executor carries on where it stopped."""
+
+    def __init__(self, path) -> None:
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        return {"queue": state.get("queue", []), "current": state.get("current")}
+
+    def save(self, state):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+
+class FotaExecutor:
+    """Flashes the VRTE packages requested on fota_control_start onto the VIP.
+
+    Replaces the flash.sh polling loop: requests arriving during a flash are
+    queued instead of missed, and the phases of flash_vip.sh run as a state
+    machine reporting {"state", "text"} on fota_control like the script did.
+    The journal records the queue and the phase being run. After a restart
+    an interrupted job continues with that phase, all phases can be run
+    again, so the VIP is never left half updated by a CCU reboot."""
+
+    def __init__(
+        self,
+        work_dir,
+        publish,
+        run=run_command,
+        sleep=time.sleep,
+        vip_host=VIP_HOST,
+    ) -> None:
+        self.work_dir = work_dir
+        self.publish = publish
+        self.run = run
+        self.sleep = sleep
+        self.vip_host = vip_host
+        self.journal = FotaJournal(os.path.join(work_dir, JOURNAL_NAME))
+        self.lock = threading.Lock()
+        self.wakeup = queue.Queue()
+        self.state = self.journal.load()
+
+    def submit(self, package):
+        """Queues package, a file in work_dir. Returns False if it does not
+        exist or is already waiting. Called from the MQTT thread."""
+        package = package.strip()
+        if not os.path.isfile(os.path.join(self.work_dir, package)):
+            print("File does not exist:", package)
+            return False
+        with self.lock:
+            current = self.state["current"]
+            if package in self.state["queue"] or (
+                current is not None and current["package"] == package
+            ):
+                print("already queued:", package)
+                return False
+            self.state["queue"].append(package)
+            self.journal.save(self.state)
+        print("got flash command for VIP:", package)
+        self.wakeup.put(package)
+        return True
+
+    def next_job(self):
+        with self.lock:
+            if self.state["current"] is None and self.state["queue"]:
+                package = self.state["queue"].pop(0)
+                self.state["current"] = {"package": package, "phase": None}
+                self.journal.save(self.state)
+            return self.state["current"]
+
+    def enter(self, job, phase):
+        with self.lock:
+            job["phase"] = phase
+            self.journal.save(self.state)
+
+    def finish(self):
+        with self.lock:
+            self.state["current"] = None
+            self.journal.save(self.state)
+
+    def report(self, state, text):
+        self.publish(FOTA_CONTROL_TOPIC, json.dumps({"state": state, "text": text}))
+
+    def run_forever(self):
+        print("ready for next flash command")
+        while True:
+            job = self.next_job()
+            if job is None:
+                self.wakeup.get()
+                continue
+            self.flash(job)
+            print("ready for next flash command")
+
+    def flash(self, job):
+        package = job["package"]
+        start = 0
+        if job["phase"] is not None:
+            start = PHASE_NAMES.index(job["phase"])
+            print("resuming flashing of {} at {}".format(package, job["phase"]))
+        self.publish(FOTA_MODE_TOPIC, FOTA_MODE_FLASHING)
+        self.report(1, "flashing " + package)
+        try:
+            for name, state, text, failed_state, failed_text in PHASES[start:]:
+                self.enter(job, name)
+                text = text.format(host=self.vip_host)
+                self.report(state, text)
+                try:
+                    done = getattr(self, name)(package)
+                except Exception as e:
+                    print(e)
+                    done = False
+                if not done:
+                    print("ERROR: {} failed for {}".format(name, package))
+                    self.report(
+                        failed_state,
+                        (failed_text or text + " failed").format(host=self.vip_host),
+                    )
+                    self.publish(FOTA_MODE_TOPIC, FOTA_MODE_FAILED)
+                    return False
+                if name in PHASE_DONE:
+                    self.report(*PHASE_DONE[name])
+            self.report(FLASH_DONE_STATE, "Ping successfull")
+            self.publish(FOTA_MODE_TOPIC, FOTA_MODE_DONE)
+            print("Update done")
+            return True
+        finally:
+            self.finish()
+            # in any case the CIP is restarted, else its connection won't work
+            self.sleep(CIP_RESTART_DELAY_S)
+            self.publish(FOTA_MODE_TOPIC, FOTA_MODE_RESTART_CIP)
+
+    def ssh(self, command):
+        return self.run(
+            [
+                "sshpass",
+                "-p",
+                VIP_PASSWORD,
+                "ssh",
+                "-o",
+                "StrictHostKeyChecking=no",
+                "root@" + self.vip_host,
+                command,
+            ]
+        )
+
+    def ping(self):
+        return self.run(["ping", "-c", str(PING_COUNT), self.vip_host]) == 0
+
+    def check_vip(self, package):
+        return self.ping()
+
+    def stop_vrte(self, package):
+        return self.ssh("systemctl stop startup_vip.service") == 0
+
+    def move_old_vrte(self, package):
+        # already moved if the executor stopped right after it
+        return (
+            self.ssh(
+                "if [ -d /opt/vrte/ ]; then "
+                "rm -rf /opt/vrte_old/ && mv -f /opt/vrte/ /opt/vrte_old/; fi"
+            )
+            == 0
+        )
+
+    def create_vrte_dir(self, package):
+        return self.ssh("mkdir -p /opt/vrte/") == 0
+
+    def unpack(self, package):
+        unpack_dir = os.path.join(self.work_dir, UNPACK_DIR)
+        shutil.rmtree(unpack_dir, ignore_errors=True)
+        # tar detects the compression, rebuilt deltas may not be gzipped
+        return (
+            self.run(
+                ["tar", "xf", os.path.join(self.work_dir, package), "-C", self.work_dir]
+            )
+            == 0
+        )
+
+    def copy_vrte(self, package):
+        files = sorted(glob.glob(os.path.join(self.work_dir, UNPACK_DIR, "*")))
+        if not files:
+            print("no VRTE files in", package)
+            return False
+        return (
+            self.run(
+                [
+                    "sshpass",
+                    "-p",
+                    VIP_PASSWORD,
+                    "scp",
+                    "-o",
+                    "StrictHostKeyChecking=no",
+                    "-r",
+                    *files,
+                    "root@{}:/opt/vrte/".format(self.vip_host),
+                ]
+            )
+            == 0
+        )
+
+    def reboot_vip(self, package):
+        # the connection drops while rebooting, ssh fails even if it worked
+        self.ssh("reboot")
+        return True
+
+    def wait_vip(self, package):
+        self.sleep(REBOOT_WAIT_S)
+        return True
+
+    def check_vip_again(self, package):
+        return self.ping()
+
+
+def mqtt_client():
+    # a persistent session, mosquitto keeps QoS 1 requests while reconnecting
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        return mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2, client_id=CLIENT_ID, clean_session=False
+        )
+    # paho-mqtt 1.x, as packaged by Debian, has only the old callbacks
+    return mqtt.Client(client_id=CLIENT_ID, clean_session=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flashes FOTA packages to the VIP")
+    parser.add_argument("--work_dir", default="/data/fota")
+    parser.add_argument("--mqtt_host", default="127.0.0.1")
+    parser.add_argument("--mqtt_port", type=int, default=1883)
+    parser.add_argument("--vip_host", default=VIP_HOST)
+    args = parser.parse_args()
+
+    client = mqtt_client()
+    executor = FotaExecutor(
+        args.work_dir,
+        lambda topic, payload: client.publish(topic, payload, qos=1),
+        vip_host=args.vip_host,
+    )
+
+    def on_connect(client, userdata, flags, reason_code, properties=None):
+        print("connected to local broker:", reason_code)
+        client.subscribe(FOTA_START_TOPIC, qos=1)
+
+    def on_message(client, userdata, message):
+        executor.submit(message.payload.decode())
+
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.reconnect_delay_set(min_delay=1, max_delay=30)
+    client.connect_async(args.mqtt_host, args.mqtt_port)
+    client.loop_start()
+    executor.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # comes with the velocitas SDK
+    mqtt = None
+
+FOTA_START_TOPIC = "fota_control_start"
+FOTA_START_TIMEOUT_S = 10
+LOCAL_BROKER_HOST = "127.0.0.1"
+
+
+class FlashRequests:
+    """Own client on the local broker handing packages to the FOTA executor.
+
+    The SDK publishes events at QoS 0 only. Requests are published at QoS 1,
+    so the broker keeps them for the executor's persistent session while it
+    reconnects, and publish knows whether the broker took them."""
+
+    def __init__(self, port, host=LOCAL_BROKER_HOST) -> None:
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        else:
+            self.client = mqtt.Client()
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self.client.connect_async(host, int(port))
+        self.client.loop_start()
+
+    def publish(self, package, timeout=FOTA_START_TIMEOUT_S):
+        """Returns False if the broker did not acknowledge the request within
+        timeout. Paho clients are thread safe, it is called from the FOTA
+        handler thread."""
+        try:
+            info = self.client.publish(FOTA_START_TOPIC, package, qos=1)
+            info.wait_for_publish(timeout)
+            return info.is_published()
+        except Exception as e:
+            print("publishing the flash request failed:", e)
+            return False
@@ -1,14 +1,29 @@
 import base64
 import json
 import os
-import subprocess
+import posixpath
+from functools import partial
 
-import boto3
-import requests
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric.padding import MGF1, OAEP
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from fota.delta import (
+    DeltaError,
+    apply_delta,
+    installed_base,
+    promote_pending,
+    record_flash_pending,
+    tar_name,
+)
+from fota.download import download_ranged
+from fota.manifest import key_from_file, resolve_fota_object
+from fota.verify import PackageVerifier, VerificationError, load_public_key
 from utils.config_loader import loadConfig
+from utils.credentials import s3Client
+
+DECRYPT_BLOCK_SIZE = 1024 * 1024
+# flash_vip.sh reached the VIP again after rebooting it into the new VRTE
+FLASH_DONE_STATE = 12
 
 
 # https://cryptography.io/en/latest/hazmat/primitives/asymmetric/rsa/
@@ -19,27 +34,60 @@ def handle_fota_request(fotaRequest, vehicleApp, config, awsClient):
             file = fotaRequest["file"]
             encryptedKeyBase64 = fotaRequest["key"]
             fota_host_dir = fotaRequest["hostDir"]
-            # encryptedKey = base64.b64decode(encryptedKeyBase64)
-            # decryptedKeyBase64 = decryptAESKey(encryptedKey, config)
-            awsClient.publishFOTAControlMessage("downloading file:" + file)
-            tempEncryptedFlashFile, iv = download_file_from_s3(
-                file, config, fota_host_dir
-            )
+            try:
+                key = None
+                decryption = None
+                if fotaRequest.get("encrypted"):
+                    # decrypted while downloading, the encrypted file is never stored
+                    encryptedKey = base64.b64decode(encryptedKeyBase64)
+                    key = base64.b64decode(decryptAESKey(encryptedKey, config))
+                    decryption = (key, base64.b64decode(fotaRequest["iv"]))
+                tempEncryptedFlashFile, sha256 = None, None
+                if fotaRequest.get("delta"):
+                    tempEncryptedFlashFile, sha256 = download_delta(
+                        fotaRequest, config, fota_host_dir, awsClient, key
+                    )
+                if tempEncryptedFlashFile is None:
+                    awsClient.publishFOTAControlMessage(
+                        "downloading file:" + file, "download"
+                    )
+                    tempEncryptedFlashFile, sha256 = download_file_from_s3(
+                        file,
+                        config,
+                        fota_host_dir,
+                        download_progress_reporter(awsClient),
+                        fotaRequest.get("campaign"),
+                        decryption,
+                    )
+            except VerificationError as e:
+                # a corrupt package never reaches the flashing
+                awsClient.publishFOTAControlMessage(
+                    "package rejected: " + str(e), "failed"
+                )
+                return {"state": "error", "file": file}
+            except Exception as e:
+                print("download of {} failed: {}".format(file, e))
+                awsClient.publishFOTAControlMessage(
+                    "download failed: " + str(e), "failed"
+                )
+                return {"state": "error", "file": file}
+            if not tempEncryptedFlashFile:
+                awsClient.publishFOTAControlMessage(
+                    "package not found: " + file, "failed"
+                )
+                return {"state": "error", "file": file}
 
             awsClient.publishFOTAControlMessage(
                 "download okay, start flashing of:" + tempEncryptedFlashFile
             )
-            # if tempEncryptedFlashFile:
-            # decryptAESEncryptedFile(
-            #    tempEncryptedFlashFile,
-            #    tempDecryptedFlashFile,
-            #    decryptedKeyBase64,
-            #    iv,
-            # )
-
-            asyncio.run(
-                vehicleApp.publish_event("fota_control_start", tempEncryptedFlashFile)
-            )
+            if sha256 is not None:
+                record_flash_pending(fota_host_dir, tempEncryptedFlashFile, sha256)
+
+            if not vehicleApp.flashRequests.publish(tempEncryptedFlashFile):
+                awsClient.publishFOTAControlMessage(
+                    "flash request not acknowledged by the local broker", "failed"
+                )
+                return {"state": "error", "file": tempEncryptedFlashFile}
 
             return {"state": "ok", "file": tempEncryptedFlashFile}
 
@@ -47,22 +95,68 @@ def handle_fota_request(fotaRequest, vehicleApp, config, awsClient):
             return {"state": "ok"}
 
 
-def flashFileToTarget(fota_host_dir, awsClient):
-    os.chdir(fota_host_dir)
-    
-    awsClient.publishFOTAControlMessage(str((os.getcwd())))
+def download_delta(fotaRequest, config, fota_host_dir, awsClient, key=None):
+    """Rebuilds the requested package from the delta of the request and the
+    installed base. Returns (package, sha256), or (None, None) if the full
+    package has to be downloaded instead.
+
+    The request names the delta as {"file", "base_sha256", "sha256"}, with
+    "iv" if it is encrypted with the key of the package."""
+    delta = fotaRequest["delta"]
+    base = installed_base(fota_host_dir)
+    if base is None or base["sha256"] != delta.get("base_sha256"):
+        awsClient.publishFOTAControlMessage(
+            "installed package is not the delta base, using full package", "download"
+        )
+        return None, None
+    decryption = None
+    if key is not None and "iv" in delta:
+        decryption = (key, base64.b64decode(delta["iv"]))
+    awsClient.publishFOTAControlMessage(
+        "downloading delta:" + delta["file"], "download"
+    )
     try:
-        result = subprocess.call(["./flash.sh"])
-        print("test")
-        # result = subprocess.run(
-        #    ["sh", "flash.sh"],
-        #    capture_output=True,  # Python >= 3.7 only
-        #    text=True,  # Python >= 3.7 only
-        # )
-        print(result)
+        delta_file, _ = download_file_from_s3(
+            delta["file"],
+            config,
+            fota_host_dir,
+            download_progress_reporter(awsClient),
+            fotaRequest.get("campaign"),
+            decryption,
+        )
+        if not delta_file:
+            raise DeltaError("delta not found")
+        # the delta rebuilds the uncompressed tar of the package
+        package = tar_name(
+            posixpath.basename(key_from_file(fotaRequest["file"], config.fota_bucket))
+        )
+        awsClient.publishFOTAControlMessage(
+            "rebuilding {} from {}".format(package, base["file"]), "download"
+        )
+        sha256 = apply_delta(
+            base["path"], delta_file, package, delta.get("sha256"), base["sha256"]
+        )
+        os.remove(delta_file)
+        return package, sha256
     except Exception as e:
-        print(e)
-        awsClient.publishFOTAControlMessage(str(e))
+        # the full package is verified on its own, falling back is always safe
+        awsClient.publishFOTAControlMessage(
+            "delta failed: {}, using full package".format(e), "download"
+        )
+        return None, None
+
+
+def handle_fota_control(message, fota_host_dir):
+    """Makes the flashed package the base for the next delta once the
+    flashing reports success. Returns the new base or None."""
+    try:
+        state = json.loads(message).get("state")
+    except (ValueError, AttributeError):
+        # flash_vip.sh does not quote all of its messages properly
+        return None
+    if state != FLASH_DONE_STATE:
+        return None
+    return promote_pending(fota_host_dir)
 
 
 def encryptAESKey(key, config):
@@ -96,73 +190,82 @@ def decryptAESKey(encryptedKey, config) -> bytes | None:
 
 
 def decryptAESEncryptedFile(encryptedFilePath, decryptedFilePath, key, iv):
-    with open(encryptedFilePath, "rb") as f:
-        cipher = Cipher(
-            algorithms.AES(base64.b64decode(key)),
-            modes.CBC(base64.b64decode(iv)),
-        )
-        decryptor = cipher.decryptor()
+    cipher = Cipher(
+        algorithms.AES(base64.b64decode(key)),
+        modes.CBC(base64.b64decode(iv)),
+    )
+    decryptor = cipher.decryptor()
+    with open(encryptedFilePath, "rb") as f, open(
+        decryptedFilePath, "wb"
+    ) as decryptedFile:
+        for block in iter(partial(f.read, DECRYPT_BLOCK_SIZE), b""):
+            decryptedFile.write(decryptor.update(block))
+        decryptedFile.write(decryptor.finalize())
 
-        decryptedBytes = decryptor.update(f.read()) + decryptor.finalize()
-        with open(decryptedFilePath, "wb") as decryptedFile:
-            decryptedFile.write(decryptedBytes)
 
+def package_verifier(metadata, entry, config):
+    public_key = None
+    if os.path.exists(config.fota_public_key):
+        public_key = load_public_key(config.fota_public_key)
+    verifier = PackageVerifier.from_metadata(metadata["Metadata"], entry, public_key)
+    if str(config.fota_require_signature).lower() == "true" and (
+        verifier.signature is None
+    ):
+        raise VerificationError("package is not signed")
+    if not verifier.checks and str(config.fota_allow_unverified).lower() != "true":
+        raise VerificationError("package has no sha256 or signature to check")
+    return verifier
 
-def obtain_temporary_credentials(config):
-    device_cert_path = config.cert_filepath
-    device_private_key_path = config.pri_key_filepath
 
-    resp = requests.get(
-        config.credentials_provider,
-        headers={"x-amzn-iot-thingname": config.deviceId},
-        cert=(device_cert_path, device_private_key_path),
-    )
-    print(resp)
-
-    if resp:  # check whether https request succeeds
-        credentials = resp.json()
-        access_key_id = credentials["credentials"]["accessKeyId"]
-        secrete_access_key = credentials["credentials"]["secretAccessKey"]
-        session_token = credentials["credentials"]["sessionToken"]
-        return access_key_id, secrete_access_key, session_token
-    else:
-        print("error requesting temporary access to AWS S3")
-        return "", "", ""
+def download_progress_reporter(awsClient, steps=10):
+    reported = [0]
+
+    def report(done_bytes, total_bytes):
+        step = done_bytes * steps // total_bytes
+        if step > reported[0]:
+            reported[0] = step
+            awsClient.publishFOTAControlMessage(
+                "downloaded {}%".format(100 * done_bytes // total_bytes), "download"
+            )
 
+    return report
 
-def download_file_from_s3(file, config, fota_host_dir):
+
+def download_file_from_s3(
+    file, config, fota_host_dir, progress=None, campaign=None, decryption=None
+):
     print(os.getcwd())
     os.chdir(fota_host_dir)
     temp_file = ""
-    iv = ""
-    access_key_id, secrete_access_key, session_token = obtain_temporary_credentials(
-        config
-    )
-    print("got temporary credentials")
-    if access_key_id:
-        s3_cli = boto3.client(
-            "s3",
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secrete_access_key,
-            aws_session_token=session_token,
+    sha256 = None
+    s3_cli = s3Client(config)
+    if s3_cli is not None:
+        fileKey, metadata, entry = resolve_fota_object(
+            s3_cli, config.fota_bucket, file, campaign
         )
-
-        for entry in s3_cli.list_objects(Bucket=config.fota_bucket)["Contents"]:
-            if "Key" in entry:
-                fileKey = entry["Key"]
-                if fileKey in file:
-                    print("file found in S3 bucket:", entry)
-                    metadata = s3_cli.head_object(
-                        Bucket=config.fota_bucket, Key=fileKey
-                    )
-                    # iv = metadata["Metadata"]["iv"]
-                    temp_file = f"{fileKey}"
-                    with open(temp_file, "wb") as f:
-                        s3_cli.download_fileobj(config.fota_bucket, fileKey, f)
+        if fileKey is None:
+            print("file not found in S3 bucket:", file)
+        else:
+            print("file found in S3 bucket:", fileKey)
+            # iv = metadata["Metadata"]["iv"]
+            temp_file = posixpath.basename(fileKey)
+            verifier = package_verifier(metadata, entry, config)
+            download = download_ranged(
+                s3_cli,
+                config.fota_bucket,
+                fileKey,
+                temp_file,
+                config,
+                progress,
+                metadata,
+                decryption,
+                verifier,
+            )
+            sha256 = download.sha256
 
     else:
         print("No credentials available for accessing AWS S3")
-    return (temp_file, iv)
+    return (temp_file, sha256)
 
 
 if __name__ == "__main__":
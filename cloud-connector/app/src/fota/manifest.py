@@ -0,0 +1,99 @@
+import json
+import posixpath
+
+from botocore.exceptions import ClientError
+
+MANIFEST_NAME = "manifest.json"
+
+# (bucket, prefix) -> (etag, files)
+manifest_cache = {}
+
+
+def is_not_found(error):
+    return error.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound")
+
+
+def key_from_file(file, bucket):
+    """FOTA requests name the file as s3://bucket/key or as the plain key."""
+    if file.startswith("s3://"):
+        file_bucket, _, key = file[len("s3://") :].partition("/")
+        if file_bucket != bucket:
+            print("requested bucket {} differs from {}".format(file_bucket, bucket))
+        return key
+    return file
+
+
+def head_object(s3_cli, bucket, key):
+    try:
+        return s3_cli.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if is_not_found(e):
+            return None
+        raise
+
+
+def load_manifest(s3_cli, bucket, prefix):
+    """Returns the files of the campaign below prefix, {name: {"key": ...}}.
+
+    The manifest is fetched with If-None-Match, an unchanged manifest costs
+    one empty round trip."""
+    manifest_key = posixpath.join(prefix, MANIFEST_NAME)
+    etag, files = manifest_cache.get((bucket, prefix), (None, {}))
+    # an empty If-None-Match header is not a valid condition
+    conditions = {"IfNoneMatch": etag} if etag else {}
+    try:
+        response = s3_cli.get_object(Bucket=bucket, Key=manifest_key, **conditions)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "304":
+            return files
+        if is_not_found(e):
+            return {}
+        raise
+    files = json.loads(response["Body"].read())["files"]
+    manifest_cache[(bucket, prefix)] = (response["ETag"], files)
+    return files
+
+
+def write_manifest(s3_cli, bucket, prefix, metadata=None):
+    """Indexes all objects below prefix into prefix/manifest.json. Run when a
+    campaign is uploaded, devices then never list the bucket. metadata adds
+    fields like sha256 and signature to the entries by name."""
+    files = {}
+    paginator = s3_cli.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix.rstrip("/") + "/"):
+        for entry in page.get("Contents", []):
+            name = posixpath.relpath(entry["Key"], prefix)
+            if name == MANIFEST_NAME:
+                continue
+            files[name] = {
+                "key": entry["Key"],
+                "size": entry["Size"],
+                "etag": entry["ETag"],
+                **(metadata or {}).get(name, {}),
+            }
+    s3_cli.put_object(
+        Bucket=bucket,
+        Key=posixpath.join(prefix, MANIFEST_NAME),
+        Body=json.dumps({"files": files}).encode(),
+        ContentType="application/json",
+    )
+    return files
+
+
+def resolve_fota_object(s3_cli, bucket, file, campaign=None):
+    """Returns (key, head_object response, manifest entry) of the requested
+    file, or (None, None, None). With a campaign the key is looked up in its
+    manifest, otherwise the key named by the request is used as is."""
+    entry = {}
+    if campaign:
+        files = load_manifest(s3_cli, bucket, campaign)
+        entry = files.get(file) or files.get(posixpath.basename(file))
+        key = entry["key"] if entry else None
+    else:
+        key = key_from_file(file, bucket)
+    if not key:
+        return None, None, None
+    head = head_object(s3_cli, bucket, key)
+    if head is None:
+        return None, None, None
+    return key, head, entry
@@ -0,0 +1,61 @@
+import base64
+import hmac
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa, utils
+
+
+class VerificationError(Exception):
+    pass
+
+
+def load_public_key(path):
+    with open(path, "rb") as f:
+        return serialization.load_pem_public_key(f.read())
+
+
+class PackageVerifier:
+    """Checks the SHA-256 computed while downloading a package.
+
+    The expected digest and the base64 signature come from the x-amz-meta
+    sha256 and signature of the S3 object or from the campaign manifest
+    entry. The signature is made over the SHA-256 of the package with RSA
+    PKCS#1 v1.5 or ECDSA, e.g. openssl dgst -sha256 -sign key.pem package,
+    and is verified on the digest, so the package is not read again."""
+
+    def __init__(self, sha256=None, signature=None, public_key=None) -> None:
+        self.sha256 = sha256.lower() if sha256 else None
+        self.signature = base64.b64decode(signature) if signature else None
+        self.public_key = public_key
+
+    @classmethod
+    def from_metadata(cls, metadata, entry=None, public_key=None):
+        expected = {**metadata, **(entry or {})}
+        return cls(expected.get("sha256"), expected.get("signature"), public_key)
+
+    def verify(self, digest):
+        if self.sha256 is not None and not hmac.compare_digest(
+            digest.hex(), self.sha256
+        ):
+            raise VerificationError("sha256 mismatch: {}".format(digest.hex()))
+        if self.signature is None:
+            return
+        if self.public_key is None:
+            raise VerificationError("no public key to verify the signature")
+        prehashed = utils.Prehashed(hashes.SHA256())
+        try:
+            if isinstance(self.public_key, rsa.RSAPublicKey):
+                self.public_key.verify(
+                    self.signature, digest, padding.PKCS1v15(), prehashed
+                )
+            elif isinstance(self.public_key, ec.EllipticCurvePublicKey):
+                self.public_key.verify(self.signature, digest, ec.ECDSA(prehashed))
+            else:
+                raise VerificationError("unsupported public key type")
+        except InvalidSignature:
+            raise VerificationError("invalid signature")
+
+    @property
+    def checks(self):
+        return self.sha256 is not None or self.signature is not None
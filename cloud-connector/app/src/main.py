@@ -24,15 +24,34 @@
 
 from awscrt import mqtt
 from awsiot import mqtt_connection_builder
-from fota.fota import handle_fota_request
+from fota.flash_request import FlashRequests
+from fota.fota import handle_fota_control, handle_fota_request
 from minidemocar2_pb2 import Vehicle as ProtoVehicle
+from publisher.delta_encoder import DeltaEncoder
+from publisher.fota_progress import FotaProgress
+from publisher.outbox import OUTBOX_DRAIN_BATCH, OUTBOX_DRAIN_RATE, Outbox
+from publisher.payload_codec import CODECS, PayloadCodec
+from publisher.proto_setters import (
+    compileSetterTable,
+    findUnmappedFilters,
+    findUnmappedSignals,
+)
+from publisher.scheduler import PublishScheduler, timeMillis
+from publisher.signal_filter import SignalFilters
+from publisher.telemetry_batcher import TelemetryBatcher
+from uploader.jobs import UploadJobQueue
 from uploader.uploader import scan_dir_and_upload
+from utils.async_mqtt import AsyncMqttConnection
+from utils.bandwidth import bandwidthShaper
 from utils.config_loader import loadConfig
+from utils.databroker_writer import DatabrokerWriter
+from utils.s3_pool import s3Pool
+from utils.signal_writes import SignalWrites
+from utils.vss_catalog import VssCatalog
 
 # from vehicle import Vehicle  # type: ignore
 from vehicle import Vehicle, vehicle
 from velocitas_sdk.model import DataPoint, Model
-from velocitas_sdk.test.inttesthelper import IntTestHelper
 from velocitas_sdk.vdb.reply import DataPointReply
 
 # from sdv.util.log import (  # type: ignore
@@ -51,140 +70,299 @@
 
 message_topic_upstream_ack = "enterer/upstream/SDV_E2E_MiniDemoCar_China"
 message_topic_upstream = "enterer/upstream/SDV_E2E_MiniDemoCar_China/binary"
+message_topic_upstream_delta = "enterer/upstream/SDV_E2E_MiniDemoCar_China/delta"
+message_topic_upstream_telemetry = (
+    "enterer/upstream/SDV_E2E_MiniDemoCar_China/telemetry"
+)
 message_topic_upstream_fota_control = (
     "enterer/upstream/SDV_E2E_MiniDemoCar_China/fota_control"
 )
+message_topic_upstream_fota_progress = (
+    "enterer/upstream/SDV_E2E_MiniDemoCar_China/fota_control/progress"
+)
 message_topic_down = "enterer/downstream"
 # message_topic_telemetry_upstream = "enterer/upstream/telemetry"
 
-STATE_PUBLISH_INTERVALL_MS = 1000
-IDLE_STATE_PUBLISH_INTERVALL_MS = 5000
-IDLE_STATE_TRIGGER_TIME_MS = 600000
-
-
-def timeMillis():
-    return int(round(time.time() * 1000))
-
 
 class AWSConnection:
     def __init__(self) -> None:
-        self.stateUpdateRateMs = STATE_PUBLISH_INTERVALL_MS
-        self.idleStateTriggerTimeMs = IDLE_STATE_TRIGGER_TIME_MS
-        self.idleStatePublishIntervall = IDLE_STATE_PUBLISH_INTERVALL_MS
-        self.lastStatePublish = timeMillis()
-        self.lastReceiveTime = timeMillis()
-        self.userDefinedStateUpdateRateMs = self.stateUpdateRateMs
+        self.scheduler = PublishScheduler()
 
         self.proto = ProtoVehicle()
+        self.protoSetters = compileSetterTable(self.proto)
+        self.deltaEncoder = DeltaEncoder()
+        self.telemetryBatcher = TelemetryBatcher()
+        self.signalFilters = SignalFilters()
+        self.payloadCodec = PayloadCodec()
+        self.scheduler.addDeadline(self.telemetryBatcher.deadline)
+        self.scheduler.addDeadline(self.signalFilters.deadline)
         self.deviceState = {}
-        self.protoMapping = {}
         self.config = {}
-        self.fotaMessageBuffer = []
+        self.fotaProgress = FotaProgress()
+        self.fotaHostDir = None
+        self.uploadJobs = UploadJobQueue(
+            lambda job: scan_dir_and_upload(job.directory, job.filter, job.bundle, job),
+            self.reportUploadJob,
+        )
 
         self.binary = True
-        self.needTransmit = False
+        self.deltaPublish = False
+        self.batchTelemetry = False
         self.statePublishRetain = True
         self.awsConnectionOk = False
+        self.outboxDrainRate = OUTBOX_DRAIN_RATE
+        self.outboxDrainTask = None
+        self.tasks = set()
 
     def startConnection(self, vehicleConnectorApp):
         self.app = vehicleConnectorApp
-        self.t = Thread(target=self.initAWSConnection)
-        self.t.start()
+        unmappedFilters = findUnmappedFilters(
+            self.protoSetters, self.app.config.vss_signals
+        )
+        if unmappedFilters:
+            print("no protobuf field matches VSS signal filters:", unmappedFilters)
+        self.outbox = Outbox(
+            self.app.config.outbox_path, int(self.app.config.outbox_max_bytes)
+        )
+        self.configureCompression(self.app.config.binary_compression)
+        bandwidthShaper.configure(
+            self.app.config.bandwidth_limit,
+            self.app.config.bandwidth_burst,
+            self.app.config.publish_latency_target_ms,
+        )
+        self.loop = asyncio.get_running_loop()
+        self.awsMqtt = AsyncMqttConnection(self.loop)
+        self.spawn(self.initAWSConnection())
+
+    def spawn(self, coroutine):
+        # keep a reference, the loop only holds weak references to tasks
+        task = self.loop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def submit(self, coroutine):
+        """Runs coroutine on the connection loop, also from other threads.
+        From the loop the returned task can be awaited."""
+        try:
+            runningLoop = asyncio.get_running_loop()
+        except RuntimeError:
+            runningLoop = None
+        if runningLoop is self.loop:
+            return self.spawn(coroutine)
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
 
     def publishSignal(self, data):
         signalName = data["name"]
         signalValue = data["value"]
         self.deviceState[signalName] = signalValue
         try:
-            signalPath = signalName.split(".")
-            if signalName not in self.protoMapping:
-                # insert into protobuf structure
-                protoNode = self.proto
-                for node in signalName.split(".")[1:-1]:
-                    protoNode = getattr(protoNode, node)
-                self.protoMapping[signalName] = protoNode
-            if (
-                self.protoMapping[signalName]
-                .DESCRIPTOR.fields_by_name[signalPath[-1]]
-                .label
-                != 3
-            ):
-                setattr(self.protoMapping[signalName], signalPath[-1], signalValue)
-            else:
-                repeatedAttr = getattr(self.protoMapping[signalName], signalPath[-1])
-                del repeatedAttr[:]
-                repeatedAttr.extend(signalValue)
-            self.needTransmit = True
+            setter = self.protoSetters.get(signalName)
+            if setter is None:
+                # reported as unmapped when subscribing
+                return
+            currentTime = timeMillis()
+            flushAt = self.signalFilters.flushAt(signalName)
+            if not self.signalFilters.accept(signalName, signalValue, currentTime):
+                if self.signalFilters.flushAt(signalName) != flushAt:
+                    # the publisher has to wake up to flush it in time
+                    self.scheduler.wake()
+                return
+            self.applySignal(
+                setter,
+                signalName,
+                signalValue,
+                currentTime,
+                data.get("timeSec"),
+                data.get("timeNano"),
+            )
         except Exception as e:
             print("error:", e)
 
-    def publishState(self):
-        currentTime = timeMillis()
+    def applySignal(
+        self, setter, signalName, signalValue, currentTime, timeSec, timeNano
+    ):
+        setter(signalValue)
+        self.deltaEncoder.markChanged(signalName)
+        self.scheduler.notifyChange()
+        if self.batchTelemetry:
+            self.telemetryBatcher.add(
+                signalName, signalValue, timeSec, timeNano, currentTime
+            )
+            if self.telemetryBatcher.due(currentTime):
+                self.scheduler.wake()
+
+    def publishHeldBack(self, currentTime):
+        # values held back by a filter are published once they are due
+        for signalName, signalValue in self.signalFilters.flushDue(currentTime):
+            try:
+                self.applySignal(
+                    self.protoSetters[signalName],
+                    signalName,
+                    signalValue,
+                    currentTime,
+                    None,
+                    None,
+                )
+            except Exception as e:
+                print("error:", e)
+
+    async def publishOrStore(self, topic, payload, retain=False, coalesceKey=None):
+        """Returns True once the message is acknowledged. Messages that cannot
+        be delivered are stored and sent by the outbox drain."""
+        qos = mqtt.QoS.AT_LEAST_ONCE
+        if self.awsConnectionOk and len(self.outbox) > 0:
+            # queue behind the stored messages, else they arrive out of order
+            self.outbox.append(topic, payload, qos, retain, coalesceKey)
+            self.startOutboxDrain()
+            return False
+        if self.awsConnectionOk:
+            try:
+                start = time.monotonic()
+                await self.awsMqtt.publish(topic, payload, qos, retain)
+                # slow acks mean the uplink is congested, bulk transfers back off
+                bandwidthShaper.reportPublishLatency((time.monotonic() - start) * 1000)
+                return True
+            except Exception as e:
+                print("publish to {} failed, storing in outbox: {}".format(topic, e))
+        self.outbox.append(topic, payload, qos, retain, coalesceKey)
+        return False
+
+    def publishState(self, currentTime):
         try:
-            timeDiffMs = currentTime - self.lastStatePublish
-            if self.awsConnectionOk:
-                # if we did not transmit within the last 10 seconds, we transmit in any case
-                self.needTransmit |= timeDiffMs > 500
-                if self.binary and self.needTransmit:
-                    self.awsMqtt.publish(
-                        topic=message_topic_upstream,
-                        payload=self.proto.SerializeToString(),
-                        qos=mqtt.QoS.AT_LEAST_ONCE,
+            if self.binary and self.deltaPublish:
+                if self.awsConnectionOk:
+                    self.publishDelta(currentTime)
+                else:
+                    self.scheduler.retry()
+            elif self.binary:
+                self.spawn(
+                    self.publishOrStore(
+                        message_topic_upstream,
+                        self.payloadCodec.encode(self.proto.SerializeToString()),
                         retain=self.statePublishRetain,
+                        coalesceKey="state",
                     )
-                    self.lastStatePublish = currentTime
-                    self.needTransmit = False
-                # non binary protocol transmits alyways at base rate
-                elif not self.binary:
-                    pass
-                    # self.awsMqtt.publish(
-                    #    topic=message_topic_telemetry_upstream,
-                    #    payload=json.dumps(self.deviceState),
-                    #    qos=mqtt.QoS.AT_LEAST_ONCE,
-                    # )
+                )
+            # non binary protocol transmits alyways at base rate
+            elif not self.binary:
+                pass
+                # self.awsMqtt.publish(
+                #    topic=message_topic_telemetry_upstream,
+                #    payload=json.dumps(self.deviceState),
+                #    qos=mqtt.QoS.AT_LEAST_ONCE,
+                # )
 
         except Exception as e:
             print(e)
 
-    def publishFOTAControlMessage(self, payload):
-        if self.awsConnectionOk:
-            self.fotaMessageBuffer.append(payload)
-            self.awsMqtt.publish(
-                topic=message_topic_upstream_fota_control,
-                payload=json.dumps(self.fotaMessageBuffer),
-                qos=mqtt.QoS.AT_LEAST_ONCE,
-                retain=True,
+    def publishDelta(self, currentTime):
+        encoded = self.deltaEncoder.encode(self.proto, currentTime)
+        if encoded is None:
+            return
+        sequence, payload = encoded
+        self.spawn(self.publishDeltaMessage(sequence, payload))
+
+    async def publishDeltaMessage(self, sequence, payload):
+        try:
+            await self.awsMqtt.publish(
+                message_topic_upstream_delta,
+                self.payloadCodec.encode(payload),
+                mqtt.QoS.AT_LEAST_ONCE,
+            )
+            self.deltaEncoder.acknowledge(sequence)
+        except Exception as e:
+            print("delta {} not acknowledged, resending: {}".format(sequence, e))
+            self.deltaEncoder.reject(sequence)
+            self.scheduler.notifyChange()
+
+    def publishTelemetry(self, currentTime):
+        if not self.telemetryBatcher.due(currentTime):
+            return
+        payload = self.telemetryBatcher.flush()
+        if payload is not None:
+            self.spawn(
+                self.publishOrStore(
+                    message_topic_upstream_telemetry, self.payloadCodec.encode(payload)
+                )
             )
 
-    def publishACKMessage(self, payload):
-        payloadData = json.loads(payload)
-        if self.awsConnectionOk and "sessionId" in payloadData:
-            response = {"ack": payloadData["sessionId"]}
-            self.awsMqtt.publish(
-                topic=message_topic_upstream_ack,
-                payload=json.dumps(response),
-                qos=mqtt.QoS.AT_LEAST_ONCE,
+    def configureCompression(self, codec):
+        try:
+            self.payloadCodec.configureFromFile(
+                codec, self.app.config.binary_dictionary
             )
+        except Exception as e:
+            print("compression {} not available: {}".format(codec, e))
+            self.payloadCodec.configure("none")
+
+    def publishFOTAControlMessage(self, payload, phase="flash"):
+        # called from the FOTA handler thread as well
+        return self.submit(self.publishFOTAControl(payload, phase))
+
+    async def publishFOTAControl(self, payload, phase):
+        update = self.fotaProgress.update(payload, phase, timeMillis())
+        # updates are not coalesced, the stream keeps all of them in order
+        await self.publishOrStore(
+            message_topic_upstream_fota_progress, json.dumps(update)
+        )
+        return await self.publishOrStore(
+            message_topic_upstream_fota_control,
+            json.dumps(self.fotaProgress.summary()),
+            retain=True,
+            coalesceKey="fota_control",
+        )
 
-    def initAWSConnection(self):
-        self.awsMqtt = mqtt_connection_builder.mtls_from_path(
+    def startOutboxDrain(self):
+        if len(self.outbox) == 0:
+            return
+        if self.outboxDrainTask is not None and not self.outboxDrainTask.done():
+            return
+        self.outboxDrainTask = self.spawn(self.drainOutbox())
+
+    async def drainOutbox(self):
+        print("draining {} stored messages".format(len(self.outbox)))
+        while self.awsConnectionOk:
+            # a rate of 0 or below drains unthrottled
+            rate = self.outboxDrainRate
+            messages = self.outbox.peek(rate if rate > 0 else OUTBOX_DRAIN_BATCH)
+            if not messages:
+                break
+            for messageId, topic, payload, qos, retain in messages:
+                if not self.awsConnectionOk:
+                    return
+                try:
+                    await asyncio.wait_for(
+                        self.awsMqtt.publish(topic, payload, mqtt.QoS(qos), retain),
+                        timeout=30,
+                    )
+                    self.outbox.remove(messageId)
+                except Exception as e:
+                    print("outbox drain interrupted:", e)
+                    return
+                if rate > 0:
+                    await asyncio.sleep(1 / rate)
+
+    async def initAWSConnection(self):
+        self.awsMqtt.connection = mqtt_connection_builder.mtls_from_path(
             endpoint=self.app.config.endpoint,
             cert_filepath=self.app.config.cert_filepath,
             pri_key_filepath=self.app.config.pri_key_filepath,
             ca_filepath=self.app.config.ca_filepath,
-            on_connection_interrupted=self.on_connection_interrupted,
-            on_connection_resumed=self.on_connection_resumed,
+            on_connection_interrupted=self.awsMqtt.threadsafe(
+                self.on_connection_interrupted
+            ),
+            on_connection_resumed=self.awsMqtt.threadsafe(self.on_connection_resumed),
             client_id=self.app.config.deviceId,
             clean_session=False,
             keep_alive_secs=30,
-            on_connection_success=self.on_connection_success,
-            on_connection_failure=self.on_connection_failure,
-            on_connection_closed=self.on_connection_closed,
+            on_connection_success=self.awsMqtt.threadsafe(self.on_connection_success),
+            on_connection_failure=self.awsMqtt.threadsafe(self.on_connection_failure),
+            on_connection_closed=self.awsMqtt.threadsafe(self.on_connection_closed),
         )
 
         try:
-            connect_future = self.awsMqtt.connect()
-            connect_future.result()
+            await self.awsMqtt.connect()
         except Exception as e:
             print("connected failed: " + str(e))
             sys.exit(-1)
@@ -204,45 +382,47 @@ def initAWSConnection(self):
         )
 
         print("Subscribing to topic '{}'...".format(deviceSpecificSignalTopicDown))
-        subscribe_future, packet_id = self.awsMqtt.subscribe(
+        subscribe_result = await self.awsMqtt.subscribe(
             topic=deviceSpecificSignalTopicDown,
             qos=mqtt.QoS.AT_LEAST_ONCE,
             callback=self.on_signal_message_received,
         )
-        subscribe_result = subscribe_future.result()
         print("Subscribed with {}".format(str(subscribe_result["qos"])))
 
         print("Subscribing to topic '{}'...".format(deviceSpecificConfigTopicDown))
-        subscribe_future, packet_id = self.awsMqtt.subscribe(
+        subscribe_result = await self.awsMqtt.subscribe(
             topic=deviceSpecificConfigTopicDown,
             qos=mqtt.QoS.AT_LEAST_ONCE,
             callback=self.on_config_message_received,
         )
-        subscribe_result = subscribe_future.result()
         print("Subscribed with {}".format(str(subscribe_result["qos"])))
 
         print("Subscribing to topic '{}'...".format(deviceSpecificFotaTopicDown))
-        subscribe_future, packet_id = self.awsMqtt.subscribe(
+        subscribe_result = await self.awsMqtt.subscribe(
             topic=deviceSpecificFotaTopicDown,
             qos=mqtt.QoS.AT_LEAST_ONCE,
             callback=self.on_fota_message_received,
         )
-        subscribe_result = subscribe_future.result()
         print("Subscribed with {}".format(str(subscribe_result["qos"])))
 
         self.awsConnectionOk = True
+        # messages stored before a restart
+        self.startOutboxDrain()
 
         while True:
-            time.sleep(0.2)
-            currentTime = timeMillis()
-            if (currentTime - self.lastReceiveTime) > IDLE_STATE_TRIGGER_TIME_MS:
-                self.stateUpdateRateMs = IDLE_STATE_PUBLISH_INTERVALL_MS
+            currentTime = await self.scheduler.waitUntilDue()
+            self.publishHeldBack(currentTime)
+            self.publishTelemetry(currentTime)
+            if self.scheduler.takeStateSlot(currentTime):
+                self.publishState(currentTime)
 
-            self.publishState()
+    # Connection and message callbacks run on the connection loop, they are
+    # handed over from the awscrt thread by AsyncMqttConnection.
 
     # Callback when connection is accidentally lost.
     def on_connection_interrupted(self, connection, error, **kwargs):
         print("Connection interrupted. error: {}".format(error))
+        self.awsConnectionOk = False
 
     # Callback when an interrupted connection is re-established.
     def on_connection_resumed(self, connection, return_code, session_present, **kwargs):
@@ -251,17 +431,18 @@ def on_connection_resumed(self, connection, return_code, session_present, **kwar
                 return_code, session_present
             )
         )
+        self.awsConnectionOk = True
+        # the cloud may have missed deltas during the interruption
+        self.deltaEncoder.requestKeyframe()
+        self.scheduler.notifyChange()
+        self.startOutboxDrain()
 
         if return_code == mqtt.ConnectReturnCode.ACCEPTED and not session_present:
             print("Session did not persist. Resubscribing to existing topics...")
-            resubscribe_future, _ = connection.resubscribe_existing_topics()
-
-            # Cannot synchronously wait for resubscribe result because we're on the connection's event-loop thread,
-            # evaluate result with a callback instead.
-            resubscribe_future.add_done_callback(self.on_resubscribe_complete)
+            self.spawn(self.resubscribe())
 
-    def on_resubscribe_complete(self, resubscribe_future):
-        resubscribe_results = resubscribe_future.result()
+    async def resubscribe(self):
+        resubscribe_results = await self.awsMqtt.resubscribeExistingTopics()
         print("Resubscribe results: {}".format(resubscribe_results))
 
         for topic, qos in resubscribe_results["topics"]:
@@ -274,17 +455,28 @@ def on_signal_message_received(self, topic, payload, dup, qos, retain, **kwargs)
         # publish on local broker
         parsedMessage = json.loads(payload)
         if "signal" in parsedMessage:
-            self.publishACKMessage(payload)
-            self.lastReceiveTime = timeMillis()
-            self.stateUpdateRateMs = self.userDefinedStateUpdateRateMs
-            asyncio.run(
-                self.app.transmit(
-                    parsedMessage["signal"],
-                    parsedMessage["value"],
-                    parsedMessage.get("type"),
+            self.scheduler.notifyActivity()
+            self.spawn(
+                self.acknowledgeWrites(
+                    parsedMessage, self.app.signalWrites.transmitSingle(parsedMessage)
+                )
+            )
+        elif "signals" in parsedMessage:
+            self.scheduler.notifyActivity()
+            self.spawn(
+                self.acknowledgeWrites(
+                    parsedMessage,
+                    self.app.signalWrites.transmitBatch(parsedMessage["signals"]),
                 )
             )
 
+    async def acknowledgeWrites(self, parsedMessage, writing):
+        # the ACK carries the result per signal, rejected writes included
+        results = await writing
+        if "sessionId" in parsedMessage:
+            response = {"ack": parsedMessage["sessionId"], "results": results}
+            await self.publishOrStore(message_topic_upstream_ack, json.dumps(response))
+
     # Callback when the subscribed topic receives a config message
     def on_config_message_received(self, topic, payload, dup, qos, retain, **kwargs):
         print("Received config for kuksa.val VSS signal: {}".format(payload))
@@ -293,47 +485,117 @@ def on_config_message_received(self, topic, payload, dup, qos, retain, **kwargs)
         if "ignoreList" in parsedMessage:
             print(parsedMessage["ignoreList"])
             self.app.ignoreList = parsedMessage["ignoreList"]
+        if "signalFilters" in parsedMessage:
+            self.signalFilters.configure(parsedMessage["signalFilters"])
         if "stateUpdateRateMs" in parsedMessage:
-            self.userDefinedStateUpdateRateMs = parsedMessage["stateUpdateRateMs"]
-            self.stateUpdateRateMs = self.userDefinedStateUpdateRateMs
+            self.scheduler.stateUpdateRateMs = parsedMessage["stateUpdateRateMs"]
+        if "stateRefreshIntervalMs" in parsedMessage:
+            self.scheduler.stateRefreshIntervalMs = parsedMessage[
+                "stateRefreshIntervalMs"
+            ]
         if "idleStateTriggerTimeMs" in parsedMessage:
-            self.idleStateTriggerTimeMs = parsedMessage["idleStateTriggerTimeMs"]
+            self.scheduler.idleStateTriggerTimeMs = parsedMessage[
+                "idleStateTriggerTimeMs"
+            ]
         if "idleStatePublishIntervall" in parsedMessage:
-            self.idleStatePublishIntervall = parsedMessage["idleStatePublishIntervall"]
+            self.scheduler.idleStatePublishIntervall = parsedMessage[
+                "idleStatePublishIntervall"
+            ]
         if "binary" in parsedMessage:
-            self.binary = parsedMessage["binary"]
+            # either a flag or the name of the compression codec to use
+            if parsedMessage["binary"] in CODECS:
+                self.binary = True
+                self.configureCompression(parsedMessage["binary"])
+            else:
+                self.binary = parsedMessage["binary"]
+        if "binaryCompression" in parsedMessage:
+            self.configureCompression(parsedMessage["binaryCompression"])
+        if "deltaPublish" in parsedMessage:
+            self.deltaPublish = parsedMessage["deltaPublish"]
+            self.deltaEncoder.requestKeyframe()
+        if "keyframeIntervalMs" in parsedMessage:
+            self.deltaEncoder.keyframeIntervalMs = parsedMessage["keyframeIntervalMs"]
+        if "batchTelemetry" in parsedMessage:
+            self.batchTelemetry = parsedMessage["batchTelemetry"]
+        if "batchMaxSamples" in parsedMessage:
+            self.telemetryBatcher.maxSamples = parsedMessage["batchMaxSamples"]
+        if "batchMaxAgeMs" in parsedMessage:
+            self.telemetryBatcher.maxAgeMs = parsedMessage["batchMaxAgeMs"]
         if "scan_and_upload" in parsedMessage and "scan_filter" in parsedMessage:
-            result = scan_dir_and_upload(
-                parsedMessage["scan_and_upload"], parsedMessage["scan_filter"]
+            # only enqueued, the job reports its progress and result itself
+            self.uploadJobs.submit(
+                parsedMessage["scan_and_upload"],
+                parsedMessage["scan_filter"],
+                parsedMessage.get("scan_bundle"),
+                parsedMessage.get("uploadJobId"),
             )
-            self.awsMqtt.publish(
-                topic=message_topic_upstream,
-                payload=json.dumps({"scan_and_upload": result}),
-                qos=mqtt.QoS.AT_LEAST_ONCE,
+        if "cancelUploadJob" in parsedMessage:
+            if not self.uploadJobs.cancel(parsedMessage["cancelUploadJob"]):
+                print("no running upload job", parsedMessage["cancelUploadJob"])
+        if "uploadJobs" in parsedMessage:
+            self.spawn(
+                self.publishOrStore(
+                    message_topic_upstream,
+                    json.dumps({"uploadJobs": self.uploadJobs.statuses()}),
+                )
             )
+        if "poolMetrics" in parsedMessage:
+            self.spawn(
+                self.publishOrStore(
+                    message_topic_upstream,
+                    json.dumps(
+                        {
+                            "poolMetrics": s3Pool.metrics(),
+                            "bandwidth": bandwidthShaper.metrics(),
+                        }
+                    ),
+                )
+            )
+        if (
+            "bandwidthLimit" in parsedMessage
+            or "bandwidthBurst" in parsedMessage
+            or "publishLatencyTargetMs" in parsedMessage
+        ):
+            bandwidthShaper.configure(
+                parsedMessage.get("bandwidthLimit"),
+                parsedMessage.get("bandwidthBurst"),
+                parsedMessage.get("publishLatencyTargetMs"),
+            )
+        if "outboxDrainRate" in parsedMessage:
+            self.outboxDrainRate = parsedMessage["outboxDrainRate"]
         if "statePublishRetain" in parsedMessage:
             self.statePublishRetain = parsedMessage["statePublishRetain"]
+        # rates may have changed, let the publisher recompute its deadline
+        self.scheduler.wake()
 
         self.config = {**self.config, **parsedMessage}
-        self.awsMqtt.publish(
-            topic=message_topic_upstream,
-            payload=json.dumps(self.config),
-            qos=mqtt.QoS.AT_LEAST_ONCE,
-        )
+        self.spawn(self.publishOrStore(message_topic_upstream, json.dumps(self.config)))
+
+    def reportUploadJob(self, status, result):
+        # called from the upload worker thread
+        message = {"uploadJob": status}
+        if result is not None:
+            message["scan_and_upload"] = result
+        self.submit(self.publishOrStore(message_topic_upstream, json.dumps(message)))
 
     # Callback when the subscribed topic receives a FOTA message
     def on_fota_message_received(self, topic, payload, dup, qos, retain, **kwargs):
         print("Received FOTA message {}".format(payload))
         try:
-            self.fotaMessageBuffer.clear()
-            
-            self.publishFOTAControlMessage("Cloud Connector received FOTA request")
+            self.fotaProgress.reset(timeMillis())
+
+            self.publishFOTAControlMessage(
+                "Cloud Connector received FOTA request", "request"
+            )
             # needs to be async
 
             print("send message")
+            fotaRequest = json.loads(payload)
+            # the flashed package is kept there as the base for deltas
+            self.fotaHostDir = fotaRequest.get("hostDir", self.fotaHostDir)
             thread = Thread(
                 target=handle_fota_request,
-                args=(json.loads(payload), self.app, self.app.config, self),
+                args=(fotaRequest, self.app, self.app.config, self),
             )
 
             thread.start()
@@ -341,7 +603,7 @@ def on_fota_message_received(self, topic, payload, dup, qos, retain, **kwargs):
             print("launched handler")
         except Exception as e:
             print(e)
-            self.publishFOTAControlMessage("fota request failed:" + str(e))
+            self.publishFOTAControlMessage("fota request failed:" + str(e), "failed")
 
     # Callback when the connection successfully connects
     def on_connection_success(self, connection, callback_data):
@@ -372,11 +634,23 @@ def __init__(self, vehicle_client: Vehicle, awsConnection):
         self.ignoreList = []
 
         self.awsConnection = awsConnection
+        self.databrokerWriter = DatabrokerWriter()
+        self.flashRequests = FlashRequests(self.config.local_mqtt_port)
+        self.signalWrites = SignalWrites(
+            self.databrokerWriter, VssCatalog.load(self.config.vss_catalog)
+        )
 
     @subscribe_topic("fota_control")
     async def on_set_position_request_received(self, data_str: str) -> None:
         print("#################### data mqtt")
         print(data_str)
+        if self.awsConnection.fotaHostDir is not None:
+            # copying the flashed package must not block the loop
+            base = await asyncio.to_thread(
+                handle_fota_control, data_str, self.awsConnection.fotaHostDir
+            )
+            if base is not None:
+                print("delta base is now", base["file"])
         await self.awsConnection.publishFOTAControlMessage(data_str)
         print("published message")
 
@@ -399,7 +673,14 @@ async def recursive_subscribe(self, root):
                 await self.recursive_subscribe(attr)
 
     async def on_start(self):
+        await self.databrokerWriter.connect()
+        self.databrokerWriter.start()
         await self.recursive_subscribe(self.Vehicle)
+        unmappedSignals = findUnmappedSignals(
+            self.awsConnection.protoSetters, self.signals
+        )
+        if unmappedSignals:
+            print("no protobuf field for VSS signals:", unmappedSignals)
 
     async def on_signal_changed(self, signalName, data: DataPointReply):
         try:
@@ -420,32 +701,6 @@ async def on_signal_changed(self, signalName, data: DataPointReply):
         except Exception as e:
             print(e)
 
-    async def transmit(self, signalName, data, type=None):
-        # print("sending on kuksa broker ", signalName, " ", data)
-        try:
-            inttesthelper = IntTestHelper()
-            if type is not None and type == "int16[]":
-                # print("putting int16[] on broker")
-                await inttesthelper.set_int16Array_datapoint(
-                    name=signalName, value=data
-                )
-            elif type is not None and type == "uint8":
-                # print("putting uint8 on broker")
-                await inttesthelper.set_uint8_datapoint(name=signalName, value=data)
-            elif isinstance(data, str):
-                # print("putting string on broker")
-                await inttesthelper.set_string_datapoint(name=signalName, value=data)
-            elif isinstance(data, list):
-                # print("putting list on broker: ")
-                await inttesthelper.set_uint8Array_datapoint(
-                    name=signalName, value=data
-                )
-            else:
-                # print("putting boolean on broker")
-                await inttesthelper.set_bool_datapoint(name=signalName, value=data)
-        except Exception as e:
-            print(e)
-
 
 async def main():
     awsConnection = AWSConnection()
@@ -0,0 +1,101 @@
+from threading import Lock
+
+from minidemocar2_pb2 import VehicleDelta
+
+KEYFRAME_INTERVALL_MS = 60000
+# upper bound for unacknowledged deltas, beyond that we resync with a keyframe
+MAX_IN_FLIGHT_DELTAS = 64
+
+
+class DeltaEncoder:
+    """Builds VehicleDelta messages carrying only the leaves of the Vehicle
+    proto that changed since the last acknowledged publish."""
+
+    def __init__(self, keyframeIntervalMs=KEYFRAME_INTERVALL_MS) -> None:
+        self.keyframeIntervalMs = keyframeIntervalMs
+        self.sequence = 0
+        self.lastKeyframe = 0
+        self.forceKeyframe = True
+
+        self.dirty = set()
+        self.inFlight = {}
+        self.pathCache = {}
+        self.lock = Lock()
+
+    def markChanged(self, signalName):
+        with self.lock:
+            self.dirty.add(signalName)
+
+    def requestKeyframe(self):
+        with self.lock:
+            self.forceKeyframe = True
+
+    def keyframeDue(self, currentTime):
+        return (
+            self.forceKeyframe
+            or currentTime - self.lastKeyframe >= self.keyframeIntervalMs
+        )
+
+    def encode(self, state, currentTime):
+        """Returns (sequence, payload) for the next update or None if there is
+        nothing to send."""
+        with self.lock:
+            keyframe = self.keyframeDue(currentTime)
+            if not keyframe and not self.dirty:
+                return None
+
+            self.sequence += 1
+            delta = VehicleDelta(Sequence=self.sequence, Keyframe=keyframe)
+            if keyframe:
+                delta.State.CopyFrom(state)
+                self.lastKeyframe = currentTime
+                self.forceKeyframe = False
+            else:
+                for signalName in self.dirty:
+                    self.copyLeaf(state, delta, signalName)
+
+            self.inFlight[self.sequence] = (keyframe, self.dirty)
+            self.dirty = set()
+            if len(self.inFlight) > MAX_IN_FLIGHT_DELTAS:
+                self.inFlight.clear()
+                self.forceKeyframe = True
+
+            return self.sequence, delta.SerializeToString()
+
+    def acknowledge(self, sequence):
+        with self.lock:
+            self.inFlight.pop(sequence, None)
+
+    def reject(self, sequence):
+        # changes of a lost delta are sent again with the next one, without a
+        # lost keyframe the receiver has no base to apply deltas to
+        with self.lock:
+            entry = self.inFlight.pop(sequence, None)
+            if entry is None or entry[0]:
+                self.forceKeyframe = True
+            else:
+                self.dirty |= entry[1]
+
+    def copyLeaf(self, state, delta, signalName):
+        if signalName not in self.pathCache:
+            signalPath = signalName.split(".")
+            self.pathCache[signalName] = (signalPath[1:-1], signalPath[-1])
+        nodes, leaf = self.pathCache[signalName]
+
+        source = state
+        target = delta.State
+        for node in nodes:
+            source = getattr(source, node)
+            target = getattr(target, node)
+
+        field = source.DESCRIPTOR.fields_by_name[leaf]
+        value = getattr(source, leaf)
+        if field.label == field.LABEL_REPEATED:
+            if len(value) == 0:
+                delta.ClearedPaths.append(signalName)
+            else:
+                getattr(target, leaf).extend(value)
+        elif value == field.default_value:
+            delta.ClearedPaths.append(signalName)
+        else:
+            setattr(target, leaf, value)
@@ -0,0 +1,66 @@
+import json
+from collections import deque
+
+FOTA_SUMMARY_ENTRIES = 16
+FOTA_MAX_TEXT_LENGTH = 200
+
+
+class FotaProgress:
+    """Progress of the running FOTA request.
+
+    Every status line becomes an update with a sequence number and phase. The
+    summary keeps only the last maxEntries updates, so the retained message
+    has a bounded size however long the flashing takes."""
+
+    def __init__(
+        self, maxEntries=FOTA_SUMMARY_ENTRIES, maxTextLength=FOTA_MAX_TEXT_LENGTH
+    ) -> None:
+        self.maxTextLength = maxTextLength
+        self.recent = deque(maxlen=maxEntries)
+        self.reset()
+
+    def reset(self, currentTime=0):
+        self.sequence = 0
+        self.phase = None
+        self.state = None
+        self.started = currentTime
+        self.updated = currentTime
+        self.recent.clear()
+
+    def update(self, message, phase, currentTime):
+        """message is a status text or the json sent by the flash scripts,
+        {"state": n, "text": "..."} with an optional "phase"."""
+        state = None
+        text = message
+        if isinstance(message, str):
+            try:
+                message = json.loads(message)
+            except ValueError:
+                pass
+        if isinstance(message, dict):
+            state = message.get("state")
+            text = message.get("text", "")
+            phase = message.get("phase", phase)
+        self.sequence += 1
+        self.phase = phase
+        self.state = state
+        self.updated = currentTime
+        update = {
+            "sequence": self.sequence,
+            "phase": phase,
+            "state": state,
+            "text": str(text)[: self.maxTextLength],
+            "time": currentTime,
+        }
+        self.recent.append(update)
+        return update
+
+    def summary(self):
+        return {
+            "sequence": self.sequence,
+            "phase": self.phase,
+            "state": self.state,
+            "started": self.started,
+            "updated": self.updated,
+            "recent": list(self.recent),
+        }
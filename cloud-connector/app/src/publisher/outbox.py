@@ -0,0 +1,101 @@
+import os
+import sqlite3
+from threading import Lock
+
+OUTBOX_MAX_BYTES = 64 * 1024 * 1024
+OUTBOX_DRAIN_RATE = 20
+# messages peeked per round when the drain rate is unlimited
+OUTBOX_DRAIN_BATCH = 100
+
+
+class Outbox:
+    """Persistent queue for upstream messages that could not be published.
+
+    Messages are kept in a SQLite database in WAL mode, which keeps appends
+    cheap and survives container restarts. Messages with a coalesce key
+    replace the stored message with the same key, so only the latest state is
+    kept. When the queue grows beyond maxBytes the oldest messages are
+    dropped."""
+
+    def __init__(self, path, maxBytes=OUTBOX_MAX_BYTES) -> None:
+        self.maxBytes = maxBytes
+        self.lock = Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "topic TEXT NOT NULL, "
+            "payload BLOB NOT NULL, "
+            "qos INTEGER NOT NULL, "
+            "retain INTEGER NOT NULL, "
+            "coalesce_key TEXT UNIQUE)"
+        )
+        self.size = self.db.execute(
+            "SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM outbox"
+        ).fetchone()[0]
+        self.count = self.db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def __len__(self):
+        return self.count
+
+    def append(self, topic, payload, qos, retain=False, coalesceKey=None):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        with self.lock:
+            if coalesceKey is not None:
+                self.removeWhere("coalesce_key = ?", (coalesceKey,))
+            self.db.execute(
+                "INSERT INTO outbox (topic, payload, qos, retain, coalesce_key) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (topic, payload, int(qos), int(retain), coalesceKey),
+            )
+            self.size += len(payload)
+            self.count += 1
+            if self.size > self.maxBytes:
+                self.evict()
+
+    def evict(self):
+        # the newest message reaching the excess by running size is the last
+        # one dropped, so all of them go in one statement
+        row = self.db.execute(
+            "SELECT id FROM (SELECT id, SUM(LENGTH(payload)) OVER (ORDER BY id) "
+            "AS total FROM outbox) WHERE total >= ? ORDER BY id LIMIT 1",
+            (self.size - self.maxBytes,),
+        ).fetchone()
+        if row is None:
+            return
+        size = self.size
+        self.removeWhere("id <= ?", (row[0],))
+        print("outbox full, dropped {} bytes of old messages".format(size - self.size))
+
+    def removeWhere(self, condition, args):
+        row = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM outbox WHERE "
+            + condition,
+            args,
+        ).fetchone()
+        self.db.execute("DELETE FROM outbox WHERE " + condition, args)
+        self.count -= row[0]
+        self.size -= row[1]
+
+    def peek(self, limit):
+        """Returns the oldest messages as (id, topic, payload, qos, retain)."""
+        with self.lock:
+            return [
+                (messageId, topic, payload, qos, bool(retain))
+                for messageId, topic, payload, qos, retain in self.db.execute(
+                    "SELECT id, topic, payload, qos, retain FROM outbox "
+                    "ORDER BY id LIMIT ?",
+                    (limit,),
+                )
+            ]
+
+    def remove(self, messageId):
+        with self.lock:
+            self.removeWhere("id = ?", (messageId,))
@@ -0,0 +1,102 @@
+import struct
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zlib is used instead
+    zstandard = None
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# A protobuf message never starts with a zero byte (field number 0 is
+# invalid), so compressed payloads can be told apart from raw ones.
+HEADER_MAGIC = 0
+HEADER = struct.Struct(">BBI")
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+class PayloadCodec:
+    """Compresses binary payloads with zstd or zlib, optionally using a
+    dictionary trained on recorded Vehicle payloads.
+
+    Compressed payloads start with a header of magic byte, codec id and
+    dictionary id (big endian uint32, 0 without dictionary). The dictionary id
+    is the id of a trained zstd dictionary, otherwise the Adler-32 checksum of
+    the dictionary, which is what zlib itself uses to identify it."""
+
+    def __init__(self) -> None:
+        self.configure("none")
+
+    def configure(self, codec, dictionary=b""):
+        codecId = CODECS[codec]
+        if codecId == CODEC_ZSTD and zstandard is None:
+            print("zstandard not available, falling back to zlib")
+            codecId = CODEC_ZLIB
+
+        self.codecId = codecId
+        self.dictionary = dictionary
+        self.dictionaryId = 0
+        if codecId == CODEC_ZSTD:
+            zstdDict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            if zstdDict:
+                self.dictionaryId = zstdDict.dict_id() or zlib.adler32(dictionary)
+            self.compressor = zstandard.ZstdCompressor(
+                level=ZSTD_LEVEL,
+                dict_data=zstdDict,
+                write_content_size=False,
+                write_checksum=False,
+                write_dict_id=False,
+            )
+            self.decompressor = zstandard.ZstdDecompressor(dict_data=zstdDict)
+        elif codecId == CODEC_ZLIB and dictionary:
+            self.dictionaryId = zlib.adler32(dictionary)
+        self.header = HEADER.pack(HEADER_MAGIC, self.codecId, self.dictionaryId)
+
+    def configureFromFile(self, codec, dictionaryPath=None):
+        dictionary = b""
+        if dictionaryPath:
+            with open(dictionaryPath, "rb") as f:
+                dictionary = f.read()
+        self.configure(codec, dictionary)
+
+    def encode(self, payload):
+        if self.codecId == CODEC_NONE:
+            return payload
+        if self.codecId == CODEC_ZSTD:
+            return self.header + self.compressor.compress(payload)
+        # raw deflate stream, the header already identifies codec and dictionary
+        if self.dictionary:
+            compressor = zlib.compressobj(
+                ZLIB_LEVEL, zlib.DEFLATED, -15, zdict=self.dictionary
+            )
+        else:
+            compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15)
+        return self.header + compressor.compress(payload) + compressor.flush()
+
+    def decode(self, payload):
+        if not payload or payload[0] != HEADER_MAGIC:
+            return payload
+        magic, codecId, dictionaryId = HEADER.unpack_from(payload)
+        if dictionaryId != self.dictionaryId:
+            raise ValueError("unknown dictionary id {}".format(dictionaryId))
+        body = payload[HEADER.size :]
+        if codecId == CODEC_ZSTD:
+            return self.decompressor.decompressobj().decompress(body)
+        if self.dictionary:
+            decompressor = zlib.decompressobj(-15, zdict=self.dictionary)
+        else:
+            decompressor = zlib.decompressobj(-15)
+        return decompressor.decompress(body) + decompressor.flush()
+
+
+def trainDictionary(samples, dictionarySize=16384):
+    """Trains a zstd dictionary on recorded payloads. With zlib the most
+    recent samples are used as preset dictionary instead."""
+    if zstandard is not None:
+        return zstandard.train_dictionary(dictionarySize, samples).as_bytes()
+    return b"".join(samples)[-dictionarySize:]
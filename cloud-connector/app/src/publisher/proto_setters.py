@@ -0,0 +1,55 @@
+from functools import partial
+
+from google.protobuf.descriptor import FieldDescriptor
+
+
+def setRepeated(container, value):
+    del container[:]
+    container.extend(value)
+
+
+def compileSetterTable(message, prefix="Vehicle"):
+    """Maps every VSS path of the leaves below message to a callable that
+    stores a value in the field. Nested messages are resolved once here, so
+    an update only costs a dict lookup and the call."""
+    table = {}
+    addSetters(message, prefix, table)
+    return table
+
+
+def addSetters(node, path, table):
+    for field in node.DESCRIPTOR.fields:
+        fieldPath = path + "." + field.name
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            table[fieldPath] = partial(setRepeated, getattr(node, field.name))
+        elif field.type == FieldDescriptor.TYPE_MESSAGE:
+            addSetters(getattr(node, field.name), fieldPath, table)
+        else:
+            table[fieldPath] = partial(setattr, node, field.name)
+
+
+def findUnmappedSignals(table, signalNames):
+    return [signalName for signalName in signalNames if signalName not in table]
+
+
+def findUnmappedFilters(table, signalFilters):
+    return [
+        signalFilter
+        for signalFilter in signalFilters
+        if not any(path.startswith(signalFilter) for path in table)
+    ]
+
+
+def compileFieldTable(descriptor, prefix="Vehicle"):
+    """Maps every VSS path of the leaves below descriptor to its field."""
+    table = {}
+    for field in descriptor.fields:
+        fieldPath = prefix + "." + field.name
+        if (
+            field.label != FieldDescriptor.LABEL_REPEATED
+            and field.type == FieldDescriptor.TYPE_MESSAGE
+        ):
+            table.update(compileFieldTable(field.message_type, fieldPath))
+        else:
+            table[fieldPath] = field
+    return table
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+STATE_PUBLISH_INTERVALL_MS = 1000
+STATE_REFRESH_INTERVALL_MS = 10000
+IDLE_STATE_PUBLISH_INTERVALL_MS = 5000
+IDLE_STATE_TRIGGER_TIME_MS = 600000
+
+
+def timeMillis():
+    return int(round(time.time() * 1000))
+
+
+class PublishScheduler:
+    """Decides when the vehicle state is published.
+
+    Changes are published at most once per stateUpdateRateMs, or once per
+    idleStatePublishIntervall if no downstream message arrived within
+    idleStateTriggerTimeMs. Without changes the state is refreshed every
+    stateRefreshIntervalMs. In between the publishing task sleeps until the
+    next deadline or until it is notified of a change.
+
+    All methods must be called from the loop running waitUntilDue."""
+
+    def __init__(self) -> None:
+        self.stateUpdateRateMs = STATE_PUBLISH_INTERVALL_MS
+        self.stateRefreshIntervalMs = STATE_REFRESH_INTERVALL_MS
+        self.idleStateTriggerTimeMs = IDLE_STATE_TRIGGER_TIME_MS
+        self.idleStatePublishIntervall = IDLE_STATE_PUBLISH_INTERVALL_MS
+
+        self.lastPublish = 0
+        self.lastActivity = timeMillis()
+        self.pending = False
+        self.deadlines = []
+        self.wakeup = asyncio.Event()
+
+    def addDeadline(self, deadline):
+        # deadline is a callable returning the next due time in ms or None
+        self.deadlines.append(deadline)
+
+    def isIdle(self, currentTime):
+        return currentTime - self.lastActivity > self.idleStateTriggerTimeMs
+
+    def currentRateMs(self, currentTime):
+        if self.isIdle(currentTime):
+            return self.idleStatePublishIntervall
+        return self.stateUpdateRateMs
+
+    def nextDeadline(self, currentTime):
+        rate = self.currentRateMs(currentTime)
+        if self.pending:
+            return self.lastPublish + rate
+        return self.lastPublish + max(rate, self.stateRefreshIntervalMs)
+
+    def nextWakeup(self, currentTime):
+        wakeup = self.nextDeadline(currentTime)
+        for deadline in self.deadlines:
+            due = deadline()
+            if due is not None:
+                wakeup = min(wakeup, due)
+        return wakeup
+
+    def notifyChange(self):
+        if not self.pending:
+            self.pending = True
+            self.wakeup.set()
+
+    def notifyActivity(self):
+        # leaving idle mode shortens the deadline, so wake up the publisher
+        self.lastActivity = timeMillis()
+        self.wakeup.set()
+
+    def wake(self):
+        self.wakeup.set()
+
+    async def waitUntilDue(self):
+        while True:
+            currentTime = timeMillis()
+            wakeup = self.nextWakeup(currentTime)
+            if currentTime >= wakeup:
+                return currentTime
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self.wakeup.wait(), (wakeup - currentTime) / 1000
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def takeStateSlot(self, currentTime):
+        if currentTime < self.nextDeadline(currentTime):
+            return False
+        self.pending = False
+        self.lastPublish = currentTime
+        return True
+
+    def retry(self):
+        # keep the changes pending if they could not be sent, without waking
+        # the publisher before its next slot
+        self.pending = True
@@ -0,0 +1,130 @@
+class SignalFilter:
+    """Publish filter for one signal or branch.
+
+    A value is dropped if it is within deadbandAbs of the last published
+    value, within deadbandRel (fraction of the last value), or arrives less
+    than minIntervalMs after the last published value. A dropped value
+    outside the deadband is published once minIntervalMs has passed, any
+    other once maxIntervalMs has passed."""
+
+    settings = ("deadbandAbs", "deadbandRel", "minIntervalMs", "maxIntervalMs")
+
+    def __init__(
+        self, deadbandAbs=0, deadbandRel=0, minIntervalMs=0, maxIntervalMs=0
+    ) -> None:
+        self.deadbandAbs = deadbandAbs
+        self.deadbandRel = deadbandRel
+        self.minIntervalMs = minIntervalMs
+        self.maxIntervalMs = maxIntervalMs
+
+    def withinDeadband(self, value, lastValue):
+        if not isNumber(value) or not isNumber(lastValue):
+            return False
+        difference = abs(value - lastValue)
+        if self.deadbandAbs and difference < self.deadbandAbs:
+            return True
+        return bool(self.deadbandRel) and difference < self.deadbandRel * abs(lastValue)
+
+    def accept(self, value, lastValue, elapsedMs):
+        if self.maxIntervalMs and elapsedMs >= self.maxIntervalMs:
+            return True
+        if self.minIntervalMs and elapsedMs < self.minIntervalMs:
+            return False
+        return not self.withinDeadband(value, lastValue)
+
+    def flushAfterMs(self, value, lastValue):
+        """Time after the last published value at which the held back value
+        is published, None if only a new sample can publish it."""
+        delays = []
+        if self.maxIntervalMs:
+            delays.append(self.maxIntervalMs)
+        if not self.withinDeadband(value, lastValue):
+            # only dropped by minIntervalMs, publish it on the trailing edge
+            delays.append(self.minIntervalMs)
+        return min(delays) if delays else None
+
+
+def isNumber(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class SignalFilters:
+    """Filters configured per VSS path or branch over vss/config, the longest
+    matching prefix wins. The last value dropped per signal is held back and
+    returned by flushDue once it is due, deadline tells the publish scheduler
+    when that is."""
+
+    def __init__(self) -> None:
+        self.filters = {}
+        self.resolved = {}
+        self.lastPublished = {}
+        self.heldBack = {}
+
+    def configure(self, filterConfig):
+        filters = {}
+        for prefix, settings in filterConfig.items():
+            if not isinstance(settings, dict):
+                print("ignoring signal filter {}: {}".format(prefix, settings))
+                continue
+            unknown = [key for key in settings if key not in SignalFilter.settings]
+            if unknown:
+                print("ignoring unknown signal filter settings:", prefix, unknown)
+            filters[prefix] = SignalFilter(
+                **{
+                    key: value
+                    for key, value in settings.items()
+                    if key in SignalFilter.settings
+                }
+            )
+        self.filters = filters
+        self.resolved = {}
+
+    def filterFor(self, signalName):
+        if signalName not in self.resolved:
+            matches = [
+                prefix for prefix in self.filters if signalName.startswith(prefix)
+            ]
+            self.resolved[signalName] = (
+                self.filters[max(matches, key=len)] if matches else None
+            )
+        return self.resolved[signalName]
+
+    def accept(self, signalName, value, currentTime):
+        signalFilter = self.filterFor(signalName)
+        if signalFilter is None:
+            self.heldBack.pop(signalName, None)
+            return True
+        last = self.lastPublished.get(signalName)
+        if last is not None and not signalFilter.accept(
+            value, last[0], currentTime - last[1]
+        ):
+            self.heldBack[signalName] = value
+            return False
+        self.heldBack.pop(signalName, None)
+        self.lastPublished[signalName] = (value, currentTime)
+        return True
+
+    def flushAt(self, signalName):
+        signalFilter = self.filterFor(signalName)
+        if signalFilter is None or signalName not in self.heldBack:
+            return None
+        last = self.lastPublished[signalName]
+        delay = signalFilter.flushAfterMs(self.heldBack[signalName], last[0])
+        return None if delay is None else last[1] + delay
+
+    def deadline(self):
+        due = [self.flushAt(signalName) for signalName in self.heldBack]
+        due = [flushTime for flushTime in due if flushTime is not None]
+        return min(due) if due else None
+
+    def flushDue(self, currentTime):
+        """Returns the held back (signalName, value) pairs that are due and
+        counts them as published."""
+        flushed = []
+        for signalName, value in list(self.heldBack.items()):
+            flushTime = self.flushAt(signalName)
+            if flushTime is not None and currentTime >= flushTime:
+                del self.heldBack[signalName]
+                self.lastPublished[signalName] = (value, currentTime)
+                flushed.append((signalName, value))
+        return flushed
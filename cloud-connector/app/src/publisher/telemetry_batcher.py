@@ -0,0 +1,104 @@
+import time
+from threading import Lock
+
+from google.protobuf.descriptor import FieldDescriptor
+from minidemocar2_pb2 import TelemetryBatch
+from minidemocar2_pb2 import Vehicle as ProtoVehicle
+from publisher.proto_setters import compileFieldTable
+
+BATCH_MAX_SAMPLES = 1000
+BATCH_MAX_AGE_MS = 5000
+
+FLOAT_TYPES = (FieldDescriptor.TYPE_FLOAT, FieldDescriptor.TYPE_DOUBLE)
+INT_TYPES = (
+    FieldDescriptor.TYPE_INT32,
+    FieldDescriptor.TYPE_INT64,
+    FieldDescriptor.TYPE_UINT32,
+    FieldDescriptor.TYPE_UINT64,
+    FieldDescriptor.TYPE_SINT32,
+    FieldDescriptor.TYPE_SINT64,
+)
+
+
+def columnForField(field):
+    if field.label == FieldDescriptor.LABEL_REPEATED:
+        return "ArrayValues"
+    if field.type in FLOAT_TYPES:
+        return "FloatValues"
+    if field.type in INT_TYPES:
+        return "IntValues"
+    if field.type == FieldDescriptor.TYPE_BOOL:
+        return "BoolValues"
+    return "StringValues"
+
+
+class TelemetryBatcher:
+    """Collects every signal sample with its databroker timestamp into a
+    TelemetryBatch until maxSamples or maxAgeMs is reached."""
+
+    def __init__(self, maxSamples=BATCH_MAX_SAMPLES, maxAgeMs=BATCH_MAX_AGE_MS):
+        self.maxSamples = maxSamples
+        self.maxAgeMs = maxAgeMs
+        self.columns = {
+            path: columnForField(field)
+            for path, field in compileFieldTable(ProtoVehicle.DESCRIPTOR).items()
+        }
+
+        self.sequence = 0
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.batch = TelemetryBatch()
+        self.series = {}
+        self.sampleCount = 0
+        self.firstSampleTime = 0
+
+    def add(self, signalName, value, timeSec, timeNano, currentTime):
+        column = self.columns.get(signalName)
+        if column is None:
+            return
+        if not timeSec:
+            timeSec, timeNano = divmod(time.time_ns(), 1000000000)
+
+        with self.lock:
+            if self.sampleCount == 0:
+                self.batch.BaseTimeSec = timeSec
+                self.batch.BaseTimeNano = timeNano
+                self.firstSampleTime = currentTime
+            series = self.series.get(signalName)
+            if series is None:
+                series = self.batch.Series.add(Path=signalName)
+                self.series[signalName] = series
+
+            series.TimeOffsetUs.append(
+                (timeSec - self.batch.BaseTimeSec) * 1000000
+                + (timeNano - self.batch.BaseTimeNano) // 1000
+            )
+            if column == "ArrayValues":
+                series.ArrayValues.add(Values=value)
+            else:
+                getattr(series, column).append(value)
+            self.sampleCount += 1
+
+    def deadline(self):
+        if self.sampleCount == 0:
+            return None
+        if self.sampleCount >= self.maxSamples:
+            return self.firstSampleTime
+        return self.firstSampleTime + self.maxAgeMs
+
+    def due(self, currentTime):
+        deadline = self.deadline()
+        return deadline is not None and currentTime >= deadline
+
+    def flush(self):
+        """Returns the serialized batch and starts a new one."""
+        with self.lock:
+            if self.sampleCount == 0:
+                return None
+            self.sequence += 1
+            self.batch.Sequence = self.sequence
+            payload = self.batch.SerializeToString()
+            self.reset()
+            return payload
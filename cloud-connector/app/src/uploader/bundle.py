@@ -0,0 +1,147 @@
+import gzip
+import hashlib
+import os
+import tarfile
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # gzip is used instead
+    zstandard = None
+
+BUNDLE_ZSTD_LEVEL = 3
+BUNDLE_GZIP_LEVEL = 6
+
+
+class HashingReader:
+    """Reads size bytes of a file into the tar and hashes them on the way."""
+
+    def __init__(self, f, size, job=None) -> None:
+        self.f = f
+        self.remaining = size
+        self.digest = hashlib.sha256()
+        self.job = job
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        self.digest.update(data)
+        if self.job is not None:
+            self.job.transferred(len(data))
+        return data
+
+
+class BundleReader:
+    """Read end of the bundle pipe. Raises instead of returning the end of
+    the stream if the archive could not be completed, so a truncated bundle
+    is never committed as the S3 object."""
+
+    def __init__(self, fd, bundle) -> None:
+        self.f = os.fdopen(fd, "rb")
+        self.bundle = bundle
+
+    def read(self, size=-1):
+        if self.bundle.job is not None:
+            self.bundle.job.check_cancelled()
+        data = self.f.read(size)
+        if not data and self.bundle.error is not None:
+            raise IOError("bundle incomplete: {}".format(self.bundle.error))
+        return data
+
+    def close(self):
+        self.f.close()
+
+
+class StreamingBundle:
+    """Streams files into a compressed tar that is uploaded while it is
+    written.
+
+    A thread writes the archive into a pipe, the upload reads the other end,
+    so the bundle is never staged on disk and memory stays at the pipe and
+    part buffers. compression is zstd, falling back to gzip if zstandard is
+    not installed. The optional job is told about the files and bytes
+    archived, as the pipe holds the writer back that is close to what was
+    uploaded."""
+
+    def __init__(self, files, compression="zstd", job=None) -> None:
+        self.files = files
+        self.job = job
+        if compression == "zstd" and zstandard is None:
+            print("zstandard not available, bundling with gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.extension = ".tar.zst" if compression == "zstd" else ".tar.gz"
+        self.manifest = []
+        self.error = None
+
+    def open_compressor(self, pipe):
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=BUNDLE_ZSTD_LEVEL).stream_writer(pipe)
+        return gzip.GzipFile(fileobj=pipe, mode="wb", compresslevel=BUNDLE_GZIP_LEVEL)
+
+    def write(self, fd):
+        # unbuffered, closing the pipe never flushes into a gone reader
+        pipe = os.fdopen(fd, "wb", buffering=0)
+        try:
+            compressor = self.open_compressor(pipe)
+            tar = tarfile.open(fileobj=compressor, mode="w|")
+            for path, name in self.files:
+                self.add(tar, path, name)
+            tar.close()
+            compressor.close()
+        except Exception as e:
+            print("bundling failed:", e)
+            # set before the reader sees the end of the pipe
+            self.error = e
+        finally:
+            pipe.close()
+
+    def add(self, tar, path, name):
+        with open(path, "rb") as f:
+            info = tar.gettarinfo(name=path, arcname=name, fileobj=f)
+            # a log growing meanwhile is archived as it was when listed
+            reader = HashingReader(f, info.size, self.job)
+            tar.addfile(info, reader)
+        self.manifest.append(
+            {
+                "name": name,
+                "bytes": info.size,
+                "mtime": int(info.mtime),
+                "sha256": reader.digest.hexdigest(),
+            }
+        )
+        if self.job is not None:
+            self.job.file_done()
+
+    def open(self):
+        readFd, writeFd = os.pipe()
+        self.thread = threading.Thread(target=self.write, args=(writeFd,), daemon=True)
+        self.thread.start()
+        return BundleReader(readFd, self)
+
+
+def upload_bundle(engine, files, key_prefix, compression="zstd", job=None):
+    """Uploads files as one bundle object, returns the bundle key and the
+    manifest of its files."""
+    start = time.monotonic()
+    bundle = StreamingBundle(files, compression, job)
+    key = key_prefix + bundle.extension
+    reader = bundle.open()
+    try:
+        result = engine.upload_stream(reader, key)
+    finally:
+        # unblocks the writer if the upload gave up early
+        reader.close()
+        bundle.thread.join()
+    return {
+        "bundle": key,
+        "result": result["result"],
+        "files": len(bundle.manifest),
+        "bytes": sum(entry["bytes"] for entry in bundle.manifest),
+        "compressedBytes": result["bytes"],
+        "seconds": round(time.monotonic() - start, 3),
+        "manifest": bundle.manifest,
+    }
@@ -0,0 +1,191 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.s3.transfer import TransferConfig
+from utils.bandwidth import PRIORITY_UPLOAD, bandwidthShaper
+
+UPLOAD_WORKERS = 4
+UPLOAD_RETRIES = 3
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_PART_CONCURRENCY = 4
+
+
+class UploadCancelled(Exception):
+    pass
+
+
+class FileSlice:
+    """Readable view of length bytes of a file from offset."""
+
+    def __init__(self, path, offset, length) -> None:
+        self.f = open(path, "rb")
+        self.f.seek(offset)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.f.close()
+
+
+class UploadEngine:
+    """Uploads files to S3 with a bounded pool of workers.
+
+    Files larger than part_size are sent as multipart uploads with up to
+    UPLOAD_PART_CONCURRENCY parts in flight. A failed file is retried with
+    backoff, other files continue meanwhile. upload returns one report for
+    all files. client_factory returns the S3 client to use, None if there are
+    no credentials, it is called per attempt so rotated credentials are
+    picked up. The parts are sent at the rate the bandwidth shaper allows for
+    priority. An optional job is told about the bytes and files sent and can
+    cancel the upload, the files not done yet are reported as cancelled."""
+
+    def __init__(
+        self,
+        client_factory,
+        bucket,
+        workers=UPLOAD_WORKERS,
+        part_size=UPLOAD_PART_SIZE,
+        retries=UPLOAD_RETRIES,
+        priority=PRIORITY_UPLOAD,
+        job=None,
+    ) -> None:
+        self.client_factory = client_factory
+        self.bucket = bucket
+        self.workers = workers
+        self.retries = retries
+        self.priority = priority
+        self.job = job
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=UPLOAD_PART_CONCURRENCY,
+        )
+
+    def callback(self, sent):
+        def transferred(size):
+            # boto3 calls this while reading each part, blocking it delays the send
+            bandwidthShaper.consume(size, self.priority)
+            sent[0] += size
+            if self.job is not None:
+                self.job.transferred(size)
+
+        return transferred
+
+    def upload_file(self, path, key, offset=0, length=None):
+        """Uploads the file, or length bytes of it from offset."""
+        result = {"name": key, "result": "", "bytes": 0, "attempts": 0}
+        for attempt in range(self.retries):
+            result["attempts"] = attempt + 1
+            sent = [0]
+            try:
+                if self.job is not None:
+                    self.job.check_cancelled()
+                s3_cli = self.client_factory()
+                if s3_cli is None:
+                    print("No credentials available for accessing AWS S3")
+                    result["result"] = "AWS S3 credentials missing"
+                    return result
+                if length is None:
+                    result["bytes"] = os.path.getsize(path)
+                    s3_cli.upload_file(
+                        path,
+                        self.bucket,
+                        key,
+                        Config=self.transfer_config,
+                        Callback=self.callback(sent),
+                    )
+                else:
+                    result["bytes"] = length
+                    with FileSlice(path, offset, length) as f:
+                        s3_cli.upload_fileobj(
+                            f,
+                            self.bucket,
+                            key,
+                            Config=self.transfer_config,
+                            Callback=self.callback(sent),
+                        )
+                result["result"] = "success"
+                if self.job is not None:
+                    self.job.file_done()
+                return result
+            except UploadCancelled:
+                result["result"] = "cancelled"
+                return result
+            except Exception as e:
+                print("upload of {} failed: {}".format(path, e))
+                result["result"] = str(e)
+                if self.job is not None:
+                    # the next attempt sends it again
+                    self.job.transferred(-sent[0])
+                if attempt < self.retries - 1:
+                    time.sleep(2**attempt)
+        return result
+
+    def delete(self, keys):
+        """Deletes keys, returns False if any of them could not be deleted."""
+        s3_cli = self.client_factory()
+        if s3_cli is None:
+            print("No credentials available for accessing AWS S3")
+            return False
+        try:
+            for key in keys:
+                s3_cli.delete_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            print("deleting {} failed: {}".format(keys, e))
+            return False
+        return True
+
+    def upload_stream(self, stream, key):
+        """Uploads a stream of unknown length as one multipart object. A
+        stream can only be read once, so it is not retried."""
+        result = {"name": key, "result": "", "bytes": 0, "attempts": 1}
+        s3_cli = self.client_factory()
+        if s3_cli is None:
+            print("No credentials available for accessing AWS S3")
+            result["result"] = "AWS S3 credentials missing"
+            return result
+        sent = [0]
+        try:
+            s3_cli.upload_fileobj(
+                stream,
+                self.bucket,
+                key,
+                Config=self.transfer_config,
+                Callback=self.callback(sent),
+            )
+            result["result"] = "success"
+        except UploadCancelled:
+            result["result"] = "cancelled"
+        except Exception as e:
+            print("upload of {} failed: {}".format(key, e))
+            result["result"] = str(e)
+        result["bytes"] = sent[0]
+        return result
+
+    def upload(self, files):
+        """Uploads [(path, key)] or [(path, key, offset, length)] and returns
+        the aggregate report."""
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(lambda file: self.upload_file(*file), files))
+        uploaded = [result for result in results if result["result"] == "success"]
+        cancelled = [result for result in results if result["result"] == "cancelled"]
+        return {
+            "files": len(results),
+            "uploaded": len(uploaded),
+            "failed": len(results) - len(uploaded) - len(cancelled),
+            "cancelled": len(cancelled),
+            "bytes": sum(result["bytes"] for result in uploaded),
+            "seconds": round(time.monotonic() - start, 3),
+            "results": results,
+        }
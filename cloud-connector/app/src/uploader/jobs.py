@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from uploader.engine import UploadCancelled
+
+PROGRESS_INTERVAL_S = 5
+JOB_HISTORY = 16
+
+
+class UploadJob:
+    """State of one scan_and_upload request.
+
+    The uploader announces the files and bytes it is going to send with
+    planned and reports them as they go, report is then called with the
+    status at most every progress_interval seconds. cancel makes the next
+    transfer callback of the job raise UploadCancelled."""
+
+    def __init__(
+        self,
+        job_id,
+        directory,
+        filter,
+        bundle=None,
+        report=None,
+        progress_interval=PROGRESS_INTERVAL_S,
+    ) -> None:
+        self.id = job_id
+        self.directory = directory
+        self.filter = filter
+        self.bundle = bundle
+        self.report = report
+        self.progress_interval = progress_interval
+        self.state = "queued"
+        self.error = None
+        self.files = 0
+        self.files_done = 0
+        self.bytes = 0
+        self.bytes_done = 0
+        self.started = None
+        self.finished = None
+        self.last_report = 0
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+
+    def planned(self, files, size):
+        with self.lock:
+            self.files = files
+            self.bytes = size
+        self.progress(force=True)
+
+    def transferred(self, size):
+        # negative when a failed attempt is taken back
+        with self.lock:
+            self.bytes_done = max(0, self.bytes_done + size)
+        self.check_cancelled()
+        self.progress()
+
+    def file_done(self):
+        with self.lock:
+            self.files_done += 1
+        self.progress()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise UploadCancelled("upload job {} cancelled".format(self.id))
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def progress(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_report < self.progress_interval:
+                return
+            self.last_report = now
+        if self.report is not None:
+            self.report(self.status())
+
+    def status(self):
+        with self.lock:
+            status = {
+                "id": self.id,
+                "state": self.state,
+                "directory": self.directory,
+                "filter": self.filter,
+                "files": self.files,
+                "filesDone": self.files_done,
+                "bytes": self.bytes,
+                "bytesDone": self.bytes_done,
+                "seconds": 0,
+                "eta": None,
+            }
+            if self.started is not None:
+                elapsed = (self.finished or time.monotonic()) - self.started
+                status["seconds"] = round(elapsed, 1)
+                if self.state == "running" and self.bytes_done and elapsed > 0:
+                    rate = self.bytes_done / elapsed
+                    status["eta"] = round(
+                        max(0, self.bytes - self.bytes_done) / rate, 1
+                    )
+            if self.error is not None:
+                status["error"] = self.error
+            return status
+
+
+class UploadJobQueue:
+    """Runs upload jobs one after the other on a worker thread.
+
+    submit returns right away, so a config message never waits for an upload.
+    run(job) does the upload and returns its report, report(status, result)
+    is called from the worker thread on every state change and progress
+    update, result only once the job is finished."""
+
+    def __init__(
+        self, run, report, progress_interval=PROGRESS_INTERVAL_S, history=JOB_HISTORY
+    ) -> None:
+        self.run = run
+        self.report = report
+        self.progress_interval = progress_interval
+        self.history = history
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def submit(self, directory, filter, bundle=None, job_id=None):
+        job = UploadJob(
+            job_id or uuid.uuid4().hex[:12],
+            directory,
+            filter,
+            bundle,
+            lambda status: self.report(status, None),
+            self.progress_interval,
+        )
+        with self.lock:
+            if job.id in self.jobs and self.jobs[job.id].finished is None:
+                # a redelivered request, the job is already known
+                return self.jobs[job.id]
+            self.jobs[job.id] = job
+            self.forget()
+        self.report(job.status(), None)
+        self.queue.put(job)
+        return job
+
+    def forget(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
+
+    def cancel(self, job_id):
+        """Returns False for unknown or finished jobs. A queued job is dropped
+        when its turn comes, a running one stops at its next transfer."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None or job.finished is not None:
+            return False
+        job.cancel()
+        return True
+
+    def statuses(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job.status() for job in jobs]
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            result = None
+            job.started = time.monotonic()
+            if not job.cancelled.is_set():
+                job.state = "running"
+                self.report(job.status(), None)
+                try:
+                    result = self.run(job)
+                except UploadCancelled:
+                    pass
+                except Exception as e:
+                    print("upload job {} failed: {}".format(job.id, e))
+                    job.error = str(e)
+            finished = time.monotonic()
+            if job.cancelled.is_set():
+                job.state = "cancelled"
+            elif job.error is not None:
+                job.state = "failed"
+            else:
+                job.state = "done"
+            job.finished = finished
+            self.report(job.status(), result)
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import sqlite3
+from threading import Lock
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_bytes(f, digest, length):
+    while length > 0:
+        block = f.read(min(HASH_BLOCK_SIZE, length))
+        if not block:
+            raise IOError("{} shrank while hashing".format(f.name))
+        digest.update(block)
+        length -= len(block)
+
+
+def file_digest(path, size, prefix_size=None):
+    """Returns (sha256 of the first prefix_size bytes, sha256 of the first size
+    bytes), computed in one read. Bytes appended after the scan are left for
+    the next one."""
+    digest = hashlib.sha256()
+    prefix_digest = None
+    with open(path, "rb") as f:
+        if prefix_size is not None:
+            hash_bytes(f, digest, prefix_size)
+            prefix_digest = digest.hexdigest()
+        hash_bytes(f, digest, size - (prefix_size or 0))
+    return prefix_digest, digest.hexdigest()
+
+
+def part_key(key, part):
+    return "{}.part{}".format(key, part)
+
+
+def part_keys(key, parts):
+    return [part_key(key, part) for part in range(1, parts + 1)]
+
+
+class UploadManifest:
+    """Local record of the files already uploaded, keyed by path.
+
+    Files with the same size and mtime as recorded are skipped without being
+    read, touched files with the same content hash as well. A file that grew
+    while its recorded content stayed the same, like an appended log, only
+    gets the new bytes uploaded as key.partN. Anything else is uploaded in
+    full and starts again at part 1, the partN objects of the old content are
+    listed as stale_parts and have to be deleted before, else they would be
+    taken for parts of the new content."""
+
+    def __init__(self, path) -> None:
+        self.lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "path TEXT PRIMARY KEY, "
+            "key TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, "
+            "sha256 TEXT NOT NULL, "
+            "parts INTEGER NOT NULL)"
+        )
+
+    def plan(self, path, key):
+        """Returns what to do with the file: action is skip, append or upload,
+        offset is the first byte to upload. Returns None if the file was
+        deleted meanwhile, like a rotated log. A touched file with unchanged
+        content is recorded with its new mtime right away, so it is not hashed
+        again on the next scan."""
+        try:
+            return self.plan_file(path, key)
+        except FileNotFoundError:
+            print("skipping vanished file", path)
+            return None
+
+    def plan_file(self, path, key):
+        stat = os.stat(path)
+        entry = {
+            "path": path,
+            "key": key,
+            "offset": 0,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "parts": 0,
+        }
+        with self.lock:
+            row = self.db.execute(
+                "SELECT key, size, mtime_ns, sha256, parts FROM uploads WHERE path = ?",
+                (os.path.abspath(path),),
+            ).fetchone()
+        if row is None or row[0] != key or stat.st_size < row[1]:
+            entry["sha256"] = file_digest(path, stat.st_size)[1]
+            entry["action"] = "upload"
+            if row is not None:
+                entry["stale_parts"] = part_keys(row[0], row[4])
+            return entry
+        old_key, old_size, old_mtime_ns, old_sha256, parts = row
+        if stat.st_size == old_size and stat.st_mtime_ns == old_mtime_ns:
+            entry.update(sha256=old_sha256, parts=parts, action="skip")
+            return entry
+        prefix_sha256, entry["sha256"] = file_digest(path, stat.st_size, old_size)
+        if prefix_sha256 != old_sha256:
+            entry.update(action="upload", stale_parts=part_keys(old_key, parts))
+        elif stat.st_size == old_size:
+            entry.update(parts=parts, action="skip")
+            self.record(entry)
+        else:
+            entry.update(
+                action="append",
+                offset=old_size,
+                parts=parts + 1,
+                key=part_key(key, parts + 1),
+            )
+            entry["object_key"] = key
+        return entry
+
+    def record(self, entry):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO uploads "
+                "(path, key, size, mtime_ns, sha256, parts) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    os.path.abspath(entry["path"]),
+                    entry.get("object_key", entry["key"]),
+                    entry["size"],
+                    entry["mtime_ns"],
+                    entry["sha256"],
+                    entry["parts"],
+                ),
+            )
@@ -1,66 +1,87 @@
 import glob
 import os
+import time
 
-import boto3
-import requests
+from uploader.bundle import upload_bundle
+from uploader.engine import UploadEngine
+from uploader.manifest import UploadManifest
+from utils.bandwidth import PRIORITY_BULK
 from utils.config_loader import loadConfig
+from utils.credentials import s3Client
 
 
-def scan_dir_and_upload(directory, filter):
+def scan_dir_and_upload(directory, filter, bundle=None, job=None):
+    """Uploads the changed files matching filter. With bundle ("zstd" or
+    "gzip") all matching files are streamed into one compressed tar instead
+    and only its key and manifest are reported. job gets the progress and may
+    cancel the upload."""
     config = loadConfig("/mnt/env_var.json")
     print("directory to scan: ", directory)
-    uploadResult = []
-    os.chdir(directory)
-    for file in glob.glob(filter):
-        print("scanned:", file)
-        fileResult = {"name": file, "result": ""}
-        try:
-            fileResult["result"] = upload_file_to_s3(file, config)
-        except Exception as e:
-            fileResult["result"] = e
-
-        uploadResult.append(fileResult.copy())
-    return uploadResult
-
-
-def upload_file_to_s3(file, config):
-    result = ""
-    access_key_id, secrete_access_key, session_token = obtain_temporary_credentials(
-        config
+    if bundle is not None:
+        return scan_dir_and_upload_bundle(config, directory, filter, bundle, job)
+    # no chdir, the FOTA handler may run in another thread of this process
+    manifest = UploadManifest(config.upload_manifest_path)
+    plans = [
+        plan
+        for plan in (
+            manifest.plan(file, os.path.basename(file))
+            for file in glob.glob(os.path.join(directory, filter))
+            if os.path.isfile(file)
+        )
+        if plan is not None
+    ]
+    pending = [plan for plan in plans if plan["action"] != "skip"]
+    print("scanned {} files, {} changed".format(len(plans), len(pending)))
+    engine = UploadEngine(
+        lambda: s3Client(config),
+        config.upload_bucket,
+        int(config.upload_workers),
+        int(config.upload_part_size),
+        job=job,
     )
-    if access_key_id:
-        object_name = os.path.basename(file)
-        s3_cli = boto3.client(
-            "s3",
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secrete_access_key,
-            aws_session_token=session_token,
+    # a rotated file is only uploaded once the parts of its old content are
+    # gone, otherwise it is tried again on the next scan
+    pending = [
+        plan
+        for plan in pending
+        if not plan.get("stale_parts") or engine.delete(plan["stale_parts"])
+    ]
+    if job is not None:
+        job.planned(
+            len(pending), sum(plan["size"] - plan["offset"] for plan in pending)
         )
-        s3_cli.upload_file(file, config.upload_bucket, object_name)
-        result = "success"
-    else:
-        print("No credentials available for accessing AWS S3")
-        result = "AWS S3 credentials missing"
-
-    return result
-
+    report = engine.upload(
+        [
+            (plan["path"], plan["key"], plan["offset"], plan["size"] - plan["offset"])
+            for plan in pending
+        ]
+    )
+    report["skipped"] = len(plans) - len(pending)
+    report["appended"] = 0
+    for plan, result in zip(pending, report["results"]):
+        if result["result"] == "success":
+            manifest.record(plan)
+            report["appended"] += plan["action"] == "append"
+    return report
 
-def obtain_temporary_credentials(config):
-    device_cert_path = config.cert_filepath
-    device_private_key_path = config.pri_key_filepath
 
-    resp = requests.get(
-        config.credentials_provider,
-        headers={"x-amzn-iot-thingname": config.deviceId},
-        cert=(device_cert_path, device_private_key_path),
+def scan_dir_and_upload_bundle(config, directory, filter, compression, job=None):
+    files = sorted(
+        (file, os.path.relpath(file, directory))
+        for file in glob.glob(os.path.join(directory, filter))
+        if os.path.isfile(file)
     )
-
-    if resp:  # check whether https request succeeds
-        credentials = resp.json()
-        access_key_id = credentials["credentials"]["accessKeyId"]
-        secrete_access_key = credentials["credentials"]["secretAccessKey"]
-        session_token = credentials["credentials"]["sessionToken"]
-        return access_key_id, secrete_access_key, session_token
-    else:
-        print("error requesting temporary access to AWS S3")
-        return "", "", ""
+    print("bundling {} files".format(len(files)))
+    if job is not None:
+        job.planned(len(files), sum(os.path.getsize(file) for file, _ in files))
+    engine = UploadEngine(
+        lambda: s3Client(config),
+        config.upload_bucket,
+        part_size=int(config.upload_part_size),
+        priority=PRIORITY_BULK,
+    )
+    key_prefix = "{}-{}".format(
+        config.deviceId, time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    )
+    # the bundle reports the archived bytes, the engine would count compressed ones
+    return upload_bundle(engine, files, key_prefix, compression, job)
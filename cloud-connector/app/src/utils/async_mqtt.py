@@ -0,0 +1,45 @@
+import asyncio
+from functools import partial
+
+
+class AsyncMqttConnection:
+    """Makes an awscrt mqtt.Connection usable from an asyncio loop.
+
+    awscrt completes its futures and runs message and connection callbacks on
+    its own event-loop thread. Futures are wrapped into awaitables of loop and
+    callbacks are handed over to loop with call_soon_threadsafe, so all state
+    of the connector is only touched from loop."""
+
+    def __init__(self, loop) -> None:
+        self.loop = loop
+        self.connection = None
+
+    def threadsafe(self, callback):
+        def dispatch(*args, **kwargs):
+            self.loop.call_soon_threadsafe(partial(callback, *args, **kwargs))
+
+        return dispatch
+
+    def wrap(self, future):
+        return asyncio.wrap_future(future, loop=self.loop)
+
+    async def connect(self):
+        return await self.wrap(self.connection.connect())
+
+    async def subscribe(self, topic, qos, callback):
+        subscribe_future, packet_id = self.connection.subscribe(
+            topic=topic, qos=qos, callback=self.threadsafe(callback)
+        )
+        return await self.wrap(subscribe_future)
+
+    async def resubscribeExistingTopics(self):
+        resubscribe_future, packet_id = self.connection.resubscribe_existing_topics()
+        return await self.wrap(resubscribe_future)
+
+    def publish(self, topic, payload, qos, retain=False):
+        """Sends the message right away, the returned future completes once
+        it is acknowledged."""
+        publish_future, packet_id = self.connection.publish(
+            topic=topic, payload=payload, qos=qos, retain=retain
+        )
+        return self.wrap(publish_future)
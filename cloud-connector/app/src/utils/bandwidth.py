@@ -0,0 +1,139 @@
+import threading
+import time
+
+PRIORITY_FOTA = 0
+PRIORITY_UPLOAD = 1
+PRIORITY_BULK = 2
+
+BANDWIDTH_BURST = 256 * 1024
+PUBLISH_LATENCY_TARGET_MS = 500
+BACKOFF_INTERVAL_S = 1.0
+BACKOFF_FACTOR = 0.5
+RECOVERY_FACTOR = 1.25
+MIN_BACKOFF_RATE = 16 * 1024
+LATENCY_SMOOTHING = 0.2
+
+
+class BandwidthShaper:
+    """Token bucket shared by all S3 transfers of the process.
+
+    Transfers call consume with the bytes they are about to send or have
+    received and block until the bucket allows them. Waiting transfers of a
+    lower priority number are served first, so a FOTA download keeps going
+    while a bulk upload waits. rateLimit is in bytes per second, 0 leaves the
+    uplink unshaped.
+
+    reportPublishLatency is fed with the time MQTT publishes take to be
+    acknowledged. While its moving average stays above latencyTargetMs the
+    rate is halved once per BACKOFF_INTERVAL_S, starting from the measured
+    transfer rate if there is no limit, and raised again by RECOVERY_FACTOR
+    once latency is back below the target."""
+
+    def __init__(
+        self,
+        rateLimit=0,
+        burst=BANDWIDTH_BURST,
+        latencyTargetMs=PUBLISH_LATENCY_TARGET_MS,
+    ) -> None:
+        self.condition = threading.Condition()
+        self.rateLimit = rateLimit
+        self.burst = burst
+        self.latencyTargetMs = latencyTargetMs
+        self.tokens = burst
+        self.lastRefill = time.monotonic()
+        self.waiting = {}
+        self.backoffRate = None
+        self.latencyMs = None
+        self.lastAdjust = time.monotonic()
+        self.transferred = 0
+        self.backoffs = 0
+
+    def configure(self, rateLimit=None, burst=None, latencyTargetMs=None):
+        with self.condition:
+            if rateLimit is not None:
+                self.rateLimit = int(rateLimit)
+            if burst is not None:
+                self.burst = int(burst)
+            if latencyTargetMs is not None:
+                self.latencyTargetMs = int(latencyTargetMs)
+            self.tokens = min(self.tokens, self.burst)
+            self.condition.notify_all()
+
+    def rate(self):
+        # None if transfers are not shaped
+        rates = [rate for rate in (self.rateLimit, self.backoffRate) if rate]
+        return min(rates) if rates else None
+
+    def refill(self, now, rate):
+        self.tokens = min(self.burst, self.tokens + (now - self.lastRefill) * rate)
+        self.lastRefill = now
+
+    def consume(self, size, priority=PRIORITY_UPLOAD):
+        if size <= 0:
+            # boto3 reports negative progress when it rewinds for a retry
+            return
+        with self.condition:
+            self.transferred += size
+            self.waiting[priority] = self.waiting.get(priority, 0) + 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    rate = self.rate()
+                    if rate is None:
+                        self.lastRefill = now
+                        return
+                    self.refill(now, rate)
+                    preferred = any(
+                        count and waitingPriority < priority
+                        for waitingPriority, count in self.waiting.items()
+                    )
+                    if not preferred and self.tokens > 0:
+                        # may go into debt, so sizes above burst pass as well
+                        self.tokens -= size
+                        return
+                    self.condition.wait(max(-self.tokens, size) / rate)
+            finally:
+                self.waiting[priority] -= 1
+                self.condition.notify_all()
+
+    def reportPublishLatency(self, latencyMs):
+        with self.condition:
+            if self.latencyMs is None:
+                self.latencyMs = latencyMs
+            else:
+                self.latencyMs += LATENCY_SMOOTHING * (latencyMs - self.latencyMs)
+            now = time.monotonic()
+            elapsed = now - self.lastAdjust
+            if elapsed < BACKOFF_INTERVAL_S:
+                return
+            throughput = self.transferred / elapsed
+            self.transferred = 0
+            self.lastAdjust = now
+            if self.latencyMs > self.latencyTargetMs:
+                if throughput > 0:
+                    current = self.backoffRate or self.rateLimit or throughput
+                    self.backoffRate = max(
+                        MIN_BACKOFF_RATE, BACKOFF_FACTOR * min(current, throughput)
+                    )
+                    self.backoffs += 1
+            elif self.backoffRate is not None:
+                self.backoffRate *= RECOVERY_FACTOR
+                if (self.rateLimit and self.backoffRate >= self.rateLimit) or (
+                    throughput < BACKOFF_FACTOR * self.backoffRate
+                ):
+                    # no longer the bottleneck
+                    self.backoffRate = None
+            self.condition.notify_all()
+
+    def metrics(self):
+        with self.condition:
+            return {
+                "rateLimit": self.rateLimit,
+                "rate": self.rate(),
+                "latencyMs": self.latencyMs,
+                "backoffs": self.backoffs,
+                "waiting": sum(self.waiting.values()),
+            }
+
+
+bandwidthShaper = BandwidthShaper()
@@ -104,4 +104,94 @@ def init_argparse(content) -> argparse.ArgumentParser:
         help="This will set the AWS S3 Upload Bucket" "No AWS S3 Upload Bucket set",
     )
 
+    parser.add_argument(
+        "--outbox_path",
+        default=content.get("outbox_path", "/data/cloud-connector/outbox.db"),
+        help="This will set the path of the persistent upstream message queue",
+    )
+
+    parser.add_argument(
+        "--outbox_max_bytes",
+        default=content.get("outbox_max_bytes", 64 * 1024 * 1024),
+        help="This will set the maximum size of the persistent upstream message queue",
+    )
+
+    parser.add_argument(
+        "--binary_compression",
+        default=content.get("binary_compression", "none"),
+        help="This will set the codec for binary payloads (none, zlib or zstd)",
+    )
+
+    parser.add_argument(
+        "--binary_dictionary",
+        default=content.get("binary_dictionary", ""),
+        help="This will set the path of the compression dictionary",
+    )
+
+    parser.add_argument(
+        "--vss_catalog",
+        default=content.get("vss_catalog", "/mnt/vss_rel_5.0-immo.json"),
+        help="This will set the VSS json used to type and validate signal writes",
+    )
+
+    parser.add_argument(
+        "--fota_download_concurrency",
+        default=content.get("fota_download_concurrency", 4),
+        help="This will set the number of parallel range requests of FOTA downloads",
+    )
+
+    parser.add_argument(
+        "--fota_download_chunk_size",
+        default=content.get("fota_download_chunk_size", 4 * 1024 * 1024),
+        help="This will set the size of the range requests of FOTA downloads",
+    )
+
+    parser.add_argument(
+        "--fota_require_signature",
+        default=content.get("fota_require_signature", False),
+        help="This will reject FOTA packages without a signature",
+    )
+
+    parser.add_argument(
+        "--fota_allow_unverified",
+        default=content.get("fota_allow_unverified", False),
+        help="This will accept FOTA packages without a sha256 or signature",
+    )
+
+    parser.add_argument(
+        "--upload_workers",
+        default=content.get("upload_workers", 4),
+        help="This will set the number of files uploaded in parallel",
+    )
+
+    parser.add_argument(
+        "--upload_part_size",
+        default=content.get("upload_part_size", 8 * 1024 * 1024),
+        help="This will set the size above which files are uploaded in parts",
+    )
+
+    parser.add_argument(
+        "--upload_manifest_path",
+        default=content.get("upload_manifest_path", "/data/cloud-connector/uploads.db"),
+        help="This will set the path of the record of already uploaded files",
+    )
+
+    parser.add_argument(
+        "--bandwidth_limit",
+        default=content.get("bandwidth_limit", 0),
+        help="This will set the S3 transfer rate limit in bytes per second, 0 is unlimited",
+    )
+
+    parser.add_argument(
+        "--bandwidth_burst",
+        default=content.get("bandwidth_burst", 256 * 1024),
+        help="This will set the bytes S3 transfers may send at once",
+    )
+
+    parser.add_argument(
+        "--publish_latency_target_ms",
+        default=content.get("publish_latency_target_ms", 500),
+        help="This will set the MQTT publish latency above which S3 transfers back off",
+    )
+
     return parser
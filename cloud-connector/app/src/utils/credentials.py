@@ -0,0 +1,113 @@
+import threading
+import time
+from datetime import datetime
+
+from utils.s3_pool import s3Pool
+
+CREDENTIALS_REFRESH_MARGIN_S = 300
+NO_CREDENTIALS = ("", "", "")
+
+
+class CredentialsManager:
+    """Caches the temporary S3 credentials of the AWS IoT credentials provider.
+
+    Credentials are reused until refreshMarginS before their expiration. Within
+    the margin the cached ones are still returned while one background thread
+    refreshes them. Callers finding no valid credentials wait for a single
+    refresh instead of each requesting their own."""
+
+    def __init__(self, config, refreshMarginS=CREDENTIALS_REFRESH_MARGIN_S) -> None:
+        self.config = config
+        self.refreshMarginS = refreshMarginS
+        self.credentials = None
+        self.expiration = 0
+        self.refreshing = False
+        self.condition = threading.Condition()
+
+    def fetch(self):
+        session = s3Pool.httpSession(
+            (self.config.cert_filepath, self.config.pri_key_filepath)
+        )
+        resp = session.get(
+            self.config.credentials_provider,
+            headers={"x-amzn-iot-thingname": self.config.deviceId},
+        )
+        if not resp:  # check whether https request succeeds
+            print("error requesting temporary access to AWS S3:", resp)
+            return None, 0
+        credentials = resp.json()["credentials"]
+        expiration = parseExpiration(credentials["expiration"])
+        return (
+            credentials["accessKeyId"],
+            credentials["secretAccessKey"],
+            credentials["sessionToken"],
+        ), expiration
+
+    def refresh(self):
+        try:
+            credentials, expiration = self.fetch()
+        except Exception as e:
+            print("error requesting temporary access to AWS S3:", e)
+            credentials, expiration = None, 0
+        with self.condition:
+            if credentials is not None:
+                self.credentials = credentials
+                self.expiration = expiration
+            self.refreshing = False
+            self.condition.notify_all()
+
+    def startRefresh(self):
+        # called with self.condition held
+        if not self.refreshing:
+            self.refreshing = True
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def get(self):
+        """Returns (access key id, secret access key, session token), empty
+        strings if no credentials could be obtained."""
+        with self.condition:
+            now = time.time()
+            if self.credentials is not None and now < self.expiration:
+                if now >= self.expiration - self.refreshMarginS:
+                    self.startRefresh()
+                return self.credentials
+            waitForRefresh = self.refreshing
+            self.refreshing = True
+        if not waitForRefresh:
+            self.refresh()
+        with self.condition:
+            self.condition.wait_for(lambda: not self.refreshing)
+            if self.credentials is not None and time.time() < self.expiration:
+                return self.credentials
+            return NO_CREDENTIALS
+
+
+def parseExpiration(expiration):
+    # the provider sends UTC with a "Z" suffix, which fromisoformat only
+    # accepts from Python 3.11 on
+    return datetime.fromisoformat(expiration.replace("Z", "+00:00")).timestamp()
+
+
+managers = {}
+managersLock = threading.Lock()
+
+
+def credentialsManager(config):
+    key = (config.credentials_provider, config.deviceId)
+    with managersLock:
+        if key not in managers:
+            managers[key] = CredentialsManager(config)
+        return managers[key]
+
+
+def obtain_temporary_credentials(config):
+    return credentialsManager(config).get()
+
+
+def s3Client(config):
+    """Pooled S3 client with the current temporary credentials, None if there
+    are none."""
+    credentials = obtain_temporary_credentials(config)
+    if not credentials[0]:
+        return None
+    return s3Pool.client(credentials)
@@ -0,0 +1,178 @@
+import asyncio
+import os
+
+import grpc
+from velocitas_sdk.proto.broker_pb2 import GetMetadataRequest
+from velocitas_sdk.proto.broker_pb2_grpc import BrokerStub
+from velocitas_sdk.proto.collector_pb2 import (
+    RegisterDatapointsRequest,
+    RegistrationMetadata,
+    UpdateDatapointsRequest,
+)
+from velocitas_sdk.proto.collector_pb2_grpc import CollectorStub
+from velocitas_sdk.proto.types_pb2 import (
+    ChangeType,
+    Datapoint,
+    DatapointError,
+    DataType,
+)
+
+DATABROKER_ADDRESS = "localhost:55555"
+HEALTH_CHECK_INTERVALL_S = 10
+MAX_WRITES_IN_FLIGHT = 8
+
+# VSS datatype -> (databroker type, Datapoint field)
+DATATYPES = {
+    "boolean": (DataType.BOOL, "bool_value"),
+    "string": (DataType.STRING, "string_value"),
+    "int8": (DataType.INT8, "int32_value"),
+    "int16": (DataType.INT16, "int32_value"),
+    "int32": (DataType.INT32, "int32_value"),
+    "int64": (DataType.INT64, "int64_value"),
+    "uint8": (DataType.UINT8, "uint32_value"),
+    "uint16": (DataType.UINT16, "uint32_value"),
+    "uint32": (DataType.UINT32, "uint32_value"),
+    "uint64": (DataType.UINT64, "uint64_value"),
+    "float": (DataType.FLOAT, "float_value"),
+    "double": (DataType.DOUBLE, "double_value"),
+    "boolean[]": (DataType.BOOL_ARRAY, "bool_array"),
+    "string[]": (DataType.STRING_ARRAY, "string_array"),
+    "int8[]": (DataType.INT8_ARRAY, "int32_array"),
+    "int16[]": (DataType.INT16_ARRAY, "int32_array"),
+    "int32[]": (DataType.INT32_ARRAY, "int32_array"),
+    "int64[]": (DataType.INT64_ARRAY, "int64_array"),
+    "uint8[]": (DataType.UINT8_ARRAY, "uint32_array"),
+    "uint16[]": (DataType.UINT16_ARRAY, "uint32_array"),
+    "uint32[]": (DataType.UINT32_ARRAY, "uint32_array"),
+    "uint64[]": (DataType.UINT64_ARRAY, "uint64_array"),
+    "float[]": (DataType.FLOAT_ARRAY, "float_array"),
+    "double[]": (DataType.DOUBLE_ARRAY, "double_array"),
+}
+
+
+def databrokerAddress():
+    address = os.getenv("SDV_VEHICLEDATABROKER_ADDRESS")
+    if address:
+        return address.replace("grpc://", "")
+    port = os.getenv("VDB_PORT")
+    if port:
+        return "localhost:{}".format(port)
+    return DATABROKER_ADDRESS
+
+
+def createDatapoint(value, datatype):
+    datapoint = Datapoint()
+    field = DATATYPES[datatype][1]
+    if datatype.endswith("[]"):
+        getattr(datapoint, field).values.extend(value)
+    else:
+        setattr(datapoint, field, value)
+    return datapoint
+
+
+class DatabrokerWriter:
+    """Long-lived writer for the kuksa databroker owned by the app.
+
+    All writes share one gRPC channel, the datapoint ids are resolved once per
+    channel. Up to maxInFlight writes are sent concurrently over the channel,
+    so a burst of commands does not wait for each other. A health check
+    reconnects when the channel failed, a write failing with UNAVAILABLE is
+    retried once on a new channel."""
+
+    def __init__(self, address=None, maxInFlight=MAX_WRITES_IN_FLIGHT) -> None:
+        self.address = address or databrokerAddress()
+        self.channel = None
+        self.ids = None
+        self.inFlight = asyncio.Semaphore(maxInFlight)
+        self.connectLock = asyncio.Lock()
+        self.metadataLock = asyncio.Lock()
+        self.healthCheckTask = None
+
+    def start(self):
+        self.healthCheckTask = asyncio.get_running_loop().create_task(
+            self.healthCheck()
+        )
+
+    async def connect(self):
+        async with self.connectLock:
+            if self.channel is not None:
+                await self.channel.close()
+            print("connecting to databroker at", self.address)
+            self.channel = grpc.aio.insecure_channel(self.address)
+            self.collector = CollectorStub(self.channel)
+            self.broker = BrokerStub(self.channel)
+            self.ids = None
+
+    async def close(self):
+        if self.healthCheckTask is not None:
+            self.healthCheckTask.cancel()
+        if self.channel is not None:
+            await self.channel.close()
+            self.channel = None
+
+    async def healthCheck(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVALL_S)
+            if self.channel is None:
+                continue
+            state = self.channel.get_state(try_to_connect=True)
+            if state in (
+                grpc.ChannelConnectivity.TRANSIENT_FAILURE,
+                grpc.ChannelConnectivity.SHUTDOWN,
+            ):
+                print("databroker channel is {}, reconnecting".format(state))
+                await self.connect()
+
+    async def datapointId(self, name, datatype):
+        async with self.metadataLock:
+            if self.ids is None:
+                response = await self.broker.GetMetadata(GetMetadataRequest())
+                self.ids = {item.name: item.id for item in response.list}
+            if name in self.ids:
+                return self.ids[name]
+            response = await self.collector.RegisterDatapoints(
+                RegisterDatapointsRequest(
+                    list=[
+                        RegistrationMetadata(
+                            name=name,
+                            data_type=DATATYPES[datatype][0],
+                            description="",
+                            change_type=ChangeType.CONTINUOUS,
+                        )
+                    ]
+                )
+            )
+            self.ids[name] = response.results[name]
+            return self.ids[name]
+
+    async def update(self, writes):
+        datapoints = {}
+        names = {}
+        for name, (value, datatype) in writes.items():
+            datapointId = await self.datapointId(name, datatype)
+            datapoints[datapointId] = createDatapoint(value, datatype)
+            names[datapointId] = name
+        reply = await self.collector.UpdateDatapoints(
+            UpdateDatapointsRequest(datapoints=datapoints)
+        )
+        return {
+            names.get(datapointId, str(datapointId)): DatapointError.Name(error)
+            for datapointId, error in reply.errors.items()
+        }
+
+    async def write(self, writes):
+        """Writes {name: (value, VSS datatype)} in one request and returns the
+        errors reported by the databroker by name."""
+        async with self.inFlight:
+            if self.channel is None:
+                await self.connect()
+            try:
+                return await self.update(writes)
+            except grpc.aio.AioRpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise
+                await self.connect()
+                return await self.update(writes)
+
+    async def set(self, name, value, datatype):
+        return await self.write({name: (value, datatype)})
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+import boto3
+import requests
+from botocore.config import Config
+
+S3_MAX_CLIENTS = 2
+S3_MAX_POOL_CONNECTIONS = 16
+
+
+class S3ClientPool:
+    """Process wide S3 clients and HTTP sessions.
+
+    Clients are keyed by credentials, so every caller with the same temporary
+    credentials shares one client and its keep-alive connections. Rotated
+    credentials get a new client, the least recently used ones beyond
+    maxClients are dropped from the pool but not closed, as a running
+    transfer may still hold them. Their connections are released when the
+    last reference is gone. boto3 clients are thread safe, only their
+    creation is serialized."""
+
+    def __init__(
+        self, maxClients=S3_MAX_CLIENTS, maxPoolConnections=S3_MAX_POOL_CONNECTIONS
+    ) -> None:
+        self.maxClients = maxClients
+        self.clientConfig = Config(
+            max_pool_connections=maxPoolConnections, tcp_keepalive=True
+        )
+        self.session = boto3.session.Session()
+        self.clients = OrderedDict()
+        self.httpSessions = {}
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def client(self, credentials, endpointUrl=None):
+        key = (credentials, endpointUrl)
+        with self.lock:
+            if key in self.clients:
+                self.clients.move_to_end(key)
+                self.reused += 1
+                return self.clients[key]
+            accessKeyId, secretAccessKey, sessionToken = credentials
+            client = self.session.client(
+                "s3",
+                aws_access_key_id=accessKeyId,
+                aws_secret_access_key=secretAccessKey,
+                aws_session_token=sessionToken,
+                endpoint_url=endpointUrl,
+                config=self.clientConfig,
+            )
+            self.clients[key] = client
+            self.created += 1
+            while len(self.clients) > self.maxClients:
+                self.clients.popitem(last=False)
+                self.evicted += 1
+            return client
+
+    def httpSession(self, cert):
+        """requests session keeping the mTLS connection of cert alive."""
+        with self.lock:
+            if cert not in self.httpSessions:
+                session = requests.Session()
+                session.cert = cert
+                self.httpSessions[cert] = session
+            return self.httpSessions[cert]
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+                "httpSessions": len(self.httpSessions),
+            }
+
+
+s3Pool = S3ClientPool()
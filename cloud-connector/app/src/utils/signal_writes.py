@@ -0,0 +1,91 @@
+# result of a downstream write without a signal name or value
+INVALID_WRITE = "INVALID_WRITE"
+
+
+class SignalWrites:
+    """Downstream signal writes, checked against the VSS catalog before they
+    are sent to the databroker. Every write gets a result for its ACK, "OK"
+    or why it was not applied."""
+
+    def __init__(self, writer, catalog) -> None:
+        self.writer = writer
+        self.catalog = catalog
+
+    def resolveWrite(self, signalName, data, type=None):
+        """Returns the datatype to write the signal with and why the value
+        is rejected, if so. Signals missing in the VSS catalog are written
+        with the type hint of the message."""
+        signal = self.catalog.get(signalName)
+        if signal is None:
+            return datatypeFor(data, type), None
+        return signal.datatype, signal.validate(data)
+
+    async def transmit(self, signalName, data, type=None):
+        """Sets one signal, returns "OK" or why it was not written."""
+        # print("sending on kuksa broker ", signalName, " ", data)
+        try:
+            datatype, error = self.resolveWrite(signalName, data, type)
+            if error:
+                print("rejected", signalName, error)
+                return error
+            errors = await self.writer.set(signalName, data, datatype)
+            if errors:
+                print("databroker rejected", signalName, errors)
+                return errors.get(signalName, "NOT_APPLIED")
+            return "OK"
+        except Exception as e:
+            print(e)
+            return str(e)
+
+    async def transmitSingle(self, write):
+        name, error = checkWrite(write, 0)
+        if error:
+            return {name: error}
+        return {name: await self.transmit(name, write["value"], write.get("type"))}
+
+    async def transmitBatch(self, writes):
+        """Sets all signals in one databroker request and returns the result
+        per signal. Nothing is written if any value is rejected."""
+        if not isinstance(writes, list):
+            return {"signals": INVALID_WRITE}
+        resolved = {}
+        rejected = {}
+        for index, write in enumerate(writes):
+            name, error = checkWrite(write, index)
+            if error is None:
+                datatype, error = self.resolveWrite(
+                    name, write["value"], write.get("type")
+                )
+            if error:
+                rejected[name] = error
+                continue
+            resolved[name] = (write["value"], datatype)
+        if rejected:
+            return {**{name: "NOT_APPLIED" for name in resolved}, **rejected}
+        try:
+            errors = await self.writer.write(resolved)
+        except Exception as e:
+            print(e)
+            return {name: str(e) for name in resolved}
+        return {name: errors.get(name, "OK") for name in resolved}
+
+
+def checkWrite(write, index):
+    """Returns the signal name of a write and INVALID_WRITE if it lacks the
+    signal or the value. Writes without a name are reported by position."""
+    name = write.get("signal") if isinstance(write, dict) else None
+    if not isinstance(name, str):
+        return "#{}".format(index), INVALID_WRITE
+    if "value" not in write:
+        return name, INVALID_WRITE
+    return name, None
+
+
+def datatypeFor(data, type=None):
+    if type is not None:
+        return type
+    if isinstance(data, str):
+        return "string"
+    if isinstance(data, list):
+        return "uint8[]"
+    return "boolean"
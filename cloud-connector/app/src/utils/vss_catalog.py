@@ -0,0 +1,95 @@
+import json
+
+# value range implied by the VSS datatype
+TYPE_RANGES = {
+    "int8": (-(2**7), 2**7 - 1),
+    "int16": (-(2**15), 2**15 - 1),
+    "int32": (-(2**31), 2**31 - 1),
+    "int64": (-(2**63), 2**63 - 1),
+    "uint8": (0, 2**8 - 1),
+    "uint16": (0, 2**16 - 1),
+    "uint32": (0, 2**32 - 1),
+    "uint64": (0, 2**64 - 1),
+}
+
+
+class VssSignal:
+    def __init__(self, datatype, minimum=None, maximum=None, allowed=None) -> None:
+        self.datatype = datatype
+        self.elementType = datatype[:-2] if datatype.endswith("[]") else datatype
+        self.isArray = datatype.endswith("[]")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.allowed = set(allowed) if allowed else None
+
+    def validateElement(self, value):
+        if self.elementType == "boolean":
+            if not isinstance(value, bool):
+                return "expected boolean"
+            return None
+        if self.elementType == "string":
+            if not isinstance(value, str):
+                return "expected string"
+        elif self.elementType in ("float", "double"):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return "expected number"
+        else:
+            if isinstance(value, bool) or not isinstance(value, int):
+                return "expected integer"
+            low, high = TYPE_RANGES[self.elementType]
+            if not low <= value <= high:
+                return "{} out of {} range".format(value, self.elementType)
+        if self.minimum is not None and value < self.minimum:
+            return "{} below min {}".format(value, self.minimum)
+        if self.maximum is not None and value > self.maximum:
+            return "{} above max {}".format(value, self.maximum)
+        if self.allowed is not None and value not in self.allowed:
+            return "{} not allowed".format(value)
+        return None
+
+    def validate(self, value):
+        """Returns why value can not be written to the signal, or None."""
+        if not self.isArray:
+            return self.validateElement(value)
+        if not isinstance(value, list):
+            return "expected {}".format(self.datatype)
+        for element in value:
+            error = self.validateElement(element)
+            if error:
+                return error
+        return None
+
+
+class VssCatalog:
+    """Datatype and value constraints of all leaves of a VSS json export,
+    indexed by path."""
+
+    def __init__(self, signals=None) -> None:
+        self.signals = signals or {}
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                tree = json.load(f)
+        except (OSError, ValueError) as e:
+            print("no VSS catalog loaded:", e)
+            return cls()
+        signals = {}
+        for name, node in tree.items():
+            addSignals(signals, name, node)
+        print("loaded {} VSS signals from {}".format(len(signals), path))
+        return cls(signals)
+
+    def get(self, signalName):
+        return self.signals.get(signalName)
+
+
+def addSignals(signals, path, node):
+    if "children" in node:
+        for name, child in node["children"].items():
+            addSignals(signals, path + "." + name, child)
+    elif "datatype" in node:
+        signals[path] = VssSignal(
+            node["datatype"], node.get("min"), node.get("max"), node.get("allowed")
+        )
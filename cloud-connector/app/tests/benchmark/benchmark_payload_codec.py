@@ -0,0 +1,113 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Reports bytes saved and CPU time per message of the binary payload codecs.
+
+Run on the CCU with PYTHONPATH pointing to app/src:
+
+    python tests/benchmark/benchmark_payload_codec.py [recorded payload files]
+
+Recorded payloads are raw Vehicle protobuf messages, one per file. Without
+them a drive is simulated. The first half of the payloads trains the
+dictionary, the second half is measured. --write-dictionary stores the
+trained dictionary for use as binary_dictionary.
+"""
+
+import argparse
+import math
+import random
+import time
+
+from minidemocar2_pb2 import Vehicle as ProtoVehicle
+from publisher.payload_codec import PayloadCodec, trainDictionary, zstandard
+
+
+def simulatePayloads(count):
+    state = ProtoVehicle()
+    state.Powertrain.Application_SW_Version = "VRTE 1.4.2"
+    state.Powertrain.PropulsionLockControl.extend([0, 1, 0, 0])
+    state.Chassis.MechanicalLockControl.extend([1, 0])
+    payloads = []
+    for step in range(count):
+        speed = 20 + 10 * math.sin(step / 50) + random.random()
+        wheels = state.Chassis.Axle
+        for wheel in (wheels.Row1.Wheel.Left, wheels.Row1.Wheel.Right):
+            wheel.Speed = speed
+            wheel.SpeedSet = round(speed)
+        for wheel in (wheels.Row2.Wheel.Left, wheels.Row2.Wheel.Right):
+            wheel.Speed = speed * 0.99
+        state.Chassis.SteeringWheel.Angle = int(30 * math.sin(step / 20))
+        state.Chassis.Accelerator.PedalPosition = random.randint(0, 100)
+        state.Chassis.Brake.BrakePedalSwitch = step % 40 == 0
+        state.Body.Lights.Beam.Low.Left.IsOn = step > count / 2
+        state.Powertrain.RequestRoundTripCounter = step % 256
+        payloads.append(state.SerializeToString())
+    return payloads
+
+
+def measure(codec, payloads):
+    rawBytes = sum(len(payload) for payload in payloads)
+    start = time.process_time()
+    encoded = [codec.encode(payload) for payload in payloads]
+    cpuSeconds = time.process_time() - start
+    assert [codec.decode(payload) for payload in encoded] == payloads
+    encodedBytes = sum(len(payload) for payload in encoded)
+    return rawBytes, encodedBytes, cpuSeconds / len(payloads) * 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("payloads", nargs="*")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--dictionary-size", type=int, default=4096)
+    parser.add_argument("--write-dictionary")
+    args = parser.parse_args()
+
+    if args.payloads:
+        payloads = []
+        for path in args.payloads:
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+    else:
+        payloads = simulatePayloads(args.count)
+    training, measured = payloads[: len(payloads) // 2], payloads[len(payloads) // 2 :]
+    dictionary = trainDictionary(training, args.dictionary_size)
+    if args.write_dictionary:
+        with open(args.write_dictionary, "wb") as f:
+            f.write(dictionary)
+
+    codecs = ["zlib"] + (["zstd"] if zstandard is not None else [])
+    print(
+        "{:<16} {:>10} {:>10} {:>8} {:>10}".format(
+            "codec", "bytes", "encoded", "saved", "us/msg"
+        )
+    )
+    for name in codecs:
+        for withDictionary in (False, True):
+            codec = PayloadCodec()
+            codec.configure(name, dictionary if withDictionary else b"")
+            rawBytes, encodedBytes, cpuMicros = measure(codec, measured)
+            print(
+                "{:<16} {:>10} {:>10} {:>7.1f}% {:>10.1f}".format(
+                    name + ("+dict" if withDictionary else ""),
+                    rawBytes,
+                    encodedBytes,
+                    100 * (1 - encodedBytes / rawBytes),
+                    cpuMicros,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Minimal S3 HTTP endpoint for tests, used through boto3 with endpoint_url."""
+
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+import boto3
+from botocore.config import Config
+
+
+class S3StandIn:
+    def __init__(self, latency=0.0) -> None:
+        self.objects = {}
+        self.latency = latency
+        self.requests = []
+        self.heads = 0
+        self.uploads = {}
+        self.parts_received = 0
+        self.put_failures = 0
+        self.fail_after = None
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler(self))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def endpoint(self):
+        return "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def client(self):
+        return boto3.client(
+            "s3",
+            endpoint_url=self.endpoint,
+            region_name="us-east-1",
+            aws_access_key_id="test",
+            aws_secret_access_key="test",
+            config=Config(
+                s3={"addressing_style": "path"},
+                retries={"total_max_attempts": 1},
+                max_pool_connections=32,
+            ),
+        )
+
+    def put(self, bucket, key, data):
+        self.objects[(bucket, key)] = data
+
+    def etag(self, data):
+        return '"{}"'.format(hashlib.md5(data).hexdigest())
+
+
+def handler(stand_in):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def location(self):
+            url = urlparse(self.path)
+            bucket, _, key = url.path.lstrip("/").partition("/")
+            return bucket, unquote(key), parse_qs(url.query, keep_blank_values=True)
+
+        def object(self):
+            bucket, key, query = self.location()
+            return stand_in.objects.get((bucket, key))
+
+        def list_objects(self, bucket, prefix):
+            contents = "".join(
+                "<Contents><Key>{}</Key><Size>{}</Size><ETag>{}</ETag></Contents>".format(
+                    escape(key), len(data), escape(stand_in.etag(data))
+                )
+                for (object_bucket, key), data in sorted(stand_in.objects.items())
+                if object_bucket == bucket and key.startswith(prefix)
+            )
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?><ListBucketResult>'
+                "<Name>{}</Name><Prefix>{}</Prefix><IsTruncated>false</IsTruncated>"
+                "{}</ListBucketResult>".format(bucket, escape(prefix), contents)
+            ).encode()
+            self.reply(200, {"Content-Type": "application/xml"}, body)
+
+        def body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_PUT(self):
+            bucket, key, query = self.location()
+            data = self.body()
+            with stand_in.lock:
+                if stand_in.put_failures:
+                    stand_in.put_failures -= 1
+                    return self.reply(503, {})
+                stand_in.active += 1
+                stand_in.max_active = max(stand_in.max_active, stand_in.active)
+            try:
+                time.sleep(stand_in.latency)
+                if "uploadId" in query:
+                    upload = stand_in.uploads[query["uploadId"][0]]
+                    upload[int(query["partNumber"][0])] = data
+                    stand_in.parts_received += 1
+                else:
+                    stand_in.put(bucket, key, data)
+                self.reply(200, {"ETag": stand_in.etag(data)})
+            finally:
+                with stand_in.lock:
+                    stand_in.active -= 1
+
+        def do_POST(self):
+            bucket, key, query = self.location()
+            self.body()
+            if "uploads" in query:
+                upload_id = str(len(stand_in.uploads) + 1)
+                stand_in.uploads[upload_id] = {}
+                body = (
+                    "<InitiateMultipartUploadResult><Bucket>{}</Bucket><Key>{}</Key>"
+                    "<UploadId>{}</UploadId></InitiateMultipartUploadResult>".format(
+                        bucket, escape(key), upload_id
+                    )
+                ).encode()
+                return self.reply(200, {"Content-Type": "application/xml"}, body)
+            parts = stand_in.uploads.pop(query["uploadId"][0])
+            data = b"".join(parts[number] for number in sorted(parts))
+            stand_in.put(bucket, key, data)
+            body = (
+                "<CompleteMultipartUploadResult><Bucket>{}</Bucket><Key>{}</Key>"
+                "<ETag>{}</ETag></CompleteMultipartUploadResult>".format(
+                    bucket, escape(key), escape(stand_in.etag(data))
+                )
+            ).encode()
+            self.reply(200, {"Content-Type": "application/xml"}, body)
+
+        def do_DELETE(self):
+            bucket, key, query = self.location()
+            if "uploadId" in query:
+                stand_in.uploads.pop(query["uploadId"][0], None)
+            else:
+                stand_in.objects.pop((bucket, key), None)
+            self.reply(204, {})
+
+        def reply(self, status, headers, body=b""):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_HEAD(self):
+            stand_in.heads += 1
+            data = self.object()
+            if data is None:
+                return self.reply(404, {})
+            self.send_response(200)
+            self.send_header("ETag", stand_in.etag(data))
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+
+        def do_GET(self):
+            bucket, key, query = self.location()
+            if not key:
+                return self.list_objects(bucket, query.get("prefix", [""])[0])
+            with stand_in.lock:
+                stand_in.requests.append(self.headers.get("Range"))
+                stand_in.active += 1
+                stand_in.max_active = max(stand_in.max_active, stand_in.active)
+                failing = (
+                    stand_in.fail_after is not None
+                    and len(stand_in.requests) > stand_in.fail_after
+                )
+            try:
+                time.sleep(stand_in.latency)
+                data = self.object()
+                if failing:
+                    return self.reply(503, {})
+                if data is None:
+                    return self.reply(404, {})
+                etag = stand_in.etag(data)
+                if self.headers.get("If-Match", etag) != etag:
+                    return self.reply(412, {})
+                if self.headers.get("If-None-Match") == etag:
+                    return self.reply(304, {"ETag": etag})
+                match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+                if match is None:
+                    return self.reply(200, {"ETag": etag}, data)
+                start, end = int(match.group(1)), int(match.group(2))
+                end = min(end, len(data) - 1)
+                self.reply(
+                    206,
+                    {
+                        "ETag": etag,
+                        "Content-Range": "bytes {}-{}/{}".format(start, end, len(data)),
+                    },
+                    data[start : end + 1],
+                )
+            finally:
+                with stand_in.lock:
+                    stand_in.active -= 1
+
+    return Handler
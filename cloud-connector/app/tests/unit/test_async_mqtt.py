@@ -0,0 +1,63 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import pytest
+from utils.async_mqtt import AsyncMqttConnection
+
+
+class FakeConnection:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos, retain=False):
+        future = Future()
+        self.published.append((topic, payload, qos, retain))
+        threading.Timer(0.01, future.set_result, args=({"packet_id": 1},)).start()
+        return future, 1
+
+
+@pytest.mark.asyncio
+async def test_publish_is_awaitable():
+    connection = AsyncMqttConnection(asyncio.get_running_loop())
+    connection.connection = FakeConnection()
+
+    result = await connection.publish("topic", b"payload", 1)
+
+    assert result == {"packet_id": 1}
+    assert connection.connection.published == [("topic", b"payload", 1, False)]
+
+
+@pytest.mark.asyncio
+async def test_callbacks_run_on_loop():
+    loop = asyncio.get_running_loop()
+    connection = AsyncMqttConnection(loop)
+    received = loop.create_future()
+
+    def on_message(topic, payload, **kwargs):
+        received.set_result((topic, payload, threading.current_thread()))
+
+    callback = connection.threadsafe(on_message)
+    threading.Thread(
+        target=callback, args=("topic", b"{}"), kwargs={"dup": False}
+    ).start()
+
+    topic, payload, thread = await asyncio.wait_for(received, 1)
+    assert (topic, payload) == ("topic", b"{}")
+    assert thread is threading.current_thread()
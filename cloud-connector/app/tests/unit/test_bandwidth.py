@@ -0,0 +1,78 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import threading
+import time
+
+from utils.bandwidth import PRIORITY_BULK, PRIORITY_FOTA, BandwidthShaper
+
+
+def test_unlimited_does_not_wait():
+    shaper = BandwidthShaper()
+    start = time.monotonic()
+    shaper.consume(100 * 1024 * 1024)
+    assert time.monotonic() - start < 0.1
+
+
+def test_limits_rate():
+    shaper = BandwidthShaper(rateLimit=2 * 1024 * 1024, burst=64 * 1024)
+    start = time.monotonic()
+    for _ in range(16):
+        shaper.consume(64 * 1024)
+    # the burst passes at once, the remaining 960 KiB take about 0.47 s
+    assert 0.35 < time.monotonic() - start < 1.0
+
+
+def test_higher_priority_is_served_first():
+    shaper = BandwidthShaper(rateLimit=1024 * 1024, burst=1024)
+    shaper.consume(200 * 1024)
+    finished = []
+
+    def transfer(priority):
+        shaper.consume(1024, priority)
+        finished.append(priority)
+
+    bulk = threading.Thread(target=transfer, args=(PRIORITY_BULK,))
+    bulk.start()
+    time.sleep(0.05)
+    fota = threading.Thread(target=transfer, args=(PRIORITY_FOTA,))
+    fota.start()
+    bulk.join()
+    fota.join()
+    assert finished == [PRIORITY_FOTA, PRIORITY_BULK]
+
+
+def test_backs_off_while_publish_latency_is_high():
+    shaper = BandwidthShaper(latencyTargetMs=200)
+    shaper.consume(4 * 1024 * 1024)
+    shaper.lastAdjust -= 2
+    shaper.reportPublishLatency(1500)
+    # half of the 2 MiB/s measured
+    assert abs(shaper.rate() - 1024 * 1024) < 1024
+    assert shaper.metrics()["backoffs"] == 1
+
+    backoffRate = shaper.rate()
+    for _ in range(20):
+        shaper.reportPublishLatency(10)
+    shaper.consume(1024 * 1024)
+    shaper.lastAdjust -= 1
+    shaper.reportPublishLatency(10)
+    assert shaper.rate() == 1.25 * backoffRate
+
+    shaper.lastAdjust -= 1
+    shaper.reportPublishLatency(10)
+    # idle, the back-off no longer limits anything
+    assert shaper.rate() is None
@@ -0,0 +1,80 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import hashlib
+import io
+import json
+import os
+import tarfile
+
+import zstandard
+from s3_stand_in import S3StandIn
+from uploader.bundle import upload_bundle
+from uploader.engine import UploadEngine
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+def write_files(directory, sizes):
+    files = []
+    for index, size in enumerate(sizes):
+        path = os.path.join(directory, "trace{}.dlt".format(index))
+        with open(path, "wb") as f:
+            # incompressible, so the bundle spans several parts
+            f.write(os.urandom(size))
+        files.append((path, os.path.basename(path)))
+    return files
+
+
+def read_bundle(data, compression):
+    if compression == "zstd":
+        data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+        return tarfile.open(fileobj=io.BytesIO(data), mode="r:")
+    return tarfile.open(fileobj=io.BytesIO(data), mode="r:gz")
+
+
+def test_streams_files_into_one_multipart_bundle(tmp_path):
+    files = write_files(str(tmp_path), [1000, 2 * PART_SIZE, 10])
+    for compression, extension in (("zstd", ".tar.zst"), ("gzip", ".tar.gz")):
+        with S3StandIn() as s3:
+            client = s3.client()
+            engine = UploadEngine(lambda: client, "upload", part_size=PART_SIZE)
+            result = upload_bundle(engine, files, "car-1", compression)
+        assert result["result"] == "success"
+        assert result["bundle"] == "car-1" + extension
+        assert result["files"] == 3
+        assert result["bytes"] == 1000 + 2 * PART_SIZE + 10
+        assert s3.parts_received == 3
+        data = s3.objects[("upload", result["bundle"])]
+        assert result["compressedBytes"] == len(data)
+        with read_bundle(data, compression) as tar:
+            for (path, name), entry in zip(files, result["manifest"]):
+                with open(path, "rb") as f:
+                    content = f.read()
+                assert tar.extractfile(name).read() == content
+                assert entry["name"] == name
+                assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+        json.dumps(result)
+
+
+def test_unreadable_file_aborts_bundle(tmp_path):
+    files = write_files(str(tmp_path), [1000])
+    files.append((str(tmp_path / "missing.dlt"), "missing.dlt"))
+    with S3StandIn() as s3:
+        client = s3.client()
+        result = upload_bundle(UploadEngine(lambda: client, "upload"), files, "car-1")
+    assert result["result"] != "success"
+    assert ("upload", "car-1.tar.zst") not in s3.objects
@@ -0,0 +1,111 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import utils.credentials
+from utils.credentials import NO_CREDENTIALS, CredentialsManager
+
+PROVIDER_RESPONSE = {
+    "credentials": {
+        "accessKeyId": "ASIAEXAMPLEKEYID",
+        "secretAccessKey": "wJalrXUtnFEMI/K7MDENG/bPxRfiCYEXAMPLEKEY",
+        "sessionToken": "IQoJb3JpZ2luX2VjEXAMPLETOKEN",
+        "expiration": "2024-05-03T12:34:56Z",
+    }
+}
+
+
+class CountingManager(CredentialsManager):
+    def __init__(self, lifetimeS, refreshMarginS=300):
+        super().__init__(None, refreshMarginS)
+        self.lifetimeS = lifetimeS
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def fetch(self):
+        self.release.wait()
+        self.calls += 1
+        key = ("key{}".format(self.calls), "secret", "token")
+        return key, time.time() + self.lifetimeS
+
+
+def test_concurrent_callers_share_one_refresh():
+    manager = CountingManager(3600)
+    manager.release.clear()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        futures = [executor.submit(manager.get) for _ in range(500)]
+        time.sleep(0.1)
+        manager.release.set()
+        results = {future.result() for future in futures}
+    assert manager.calls == 1
+    assert results == {("key1", "secret", "token")}
+
+
+def test_refreshes_in_background_before_expiration():
+    manager = CountingManager(100, refreshMarginS=300)
+    assert manager.get()[0] == "key1"
+    # within the margin the cached credentials are returned right away
+    assert manager.get()[0] == "key1"
+    with manager.condition:
+        manager.condition.wait_for(lambda: not manager.refreshing, timeout=5)
+    assert manager.get()[0] == "key2"
+
+
+def test_failed_refresh_returns_no_credentials():
+    manager = CountingManager(3600)
+    manager.fetch = lambda: (None, 0)
+    assert manager.get() == NO_CREDENTIALS
+
+
+class ProviderResponse:
+    def __bool__(self):
+        return True
+
+    def json(self):
+        return PROVIDER_RESPONSE
+
+
+class ProviderSession:
+    def get(self, url, headers):
+        assert headers == {"x-amzn-iot-thingname": "car"}
+        return ProviderResponse()
+
+
+def test_parses_the_provider_response(monkeypatch):
+    monkeypatch.setattr(
+        utils.credentials.s3Pool, "httpSession", lambda cert: ProviderSession()
+    )
+    config = SimpleNamespace(
+        cert_filepath="cert.pem",
+        pri_key_filepath="key.pem",
+        credentials_provider="https://provider/role-aliases/s3/credentials",
+        deviceId="car",
+    )
+    manager = CredentialsManager(config)
+
+    manager.refresh()
+
+    assert manager.credentials == (
+        "ASIAEXAMPLEKEYID",
+        "wJalrXUtnFEMI/K7MDENG/bPxRfiCYEXAMPLEKEY",
+        "IQoJb3JpZ2luX2VjEXAMPLETOKEN",
+    )
+    assert manager.expiration == 1714739696
@@ -0,0 +1,78 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import asyncio
+
+from utils.databroker_writer import DatabrokerWriter, createDatapoint
+from velocitas_sdk.proto.broker_pb2 import GetMetadataReply
+from velocitas_sdk.proto.collector_pb2 import (
+    RegisterDatapointsReply,
+    UpdateDatapointsReply,
+)
+from velocitas_sdk.proto.types_pb2 import DatapointError, Metadata
+
+
+class FakeBroker:
+    def __init__(self):
+        self.calls = 0
+
+    async def GetMetadata(self, request):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return GetMetadataReply(list=[Metadata(id=1, name="Vehicle.Speed")])
+
+
+class FakeCollector:
+    def __init__(self):
+        self.requests = []
+
+    async def RegisterDatapoints(self, request):
+        return RegisterDatapointsReply(results={request.list[0].name: 2})
+
+    async def UpdateDatapoints(self, request):
+        self.requests.append(request)
+        errors = {2: DatapointError.OUT_OF_BOUNDS} if 2 in request.datapoints else {}
+        return UpdateDatapointsReply(errors=errors)
+
+
+def createWriter():
+    writer = DatabrokerWriter(address="localhost:0")
+    writer.channel = object()
+    writer.broker = FakeBroker()
+    writer.collector = FakeCollector()
+    return writer
+
+
+def test_create_array_datapoint():
+    datapoint = createDatapoint([1, -2], "int16[]")
+    assert list(datapoint.int32_array.values) == [1, -2]
+    assert createDatapoint(7, "uint8").uint32_value == 7
+
+
+def test_writes_reuse_resolved_ids():
+    writer = createWriter()
+
+    async def writeBurst():
+        return await asyncio.gather(
+            *[writer.set("Vehicle.Speed", float(i), "float") for i in range(5)],
+            writer.set("Vehicle.Immo", [1, 2], "uint8[]"),
+        )
+
+    results = asyncio.run(writeBurst())
+    assert writer.broker.calls == 1
+    assert len(writer.collector.requests) == 6
+    assert results[0] == {}
+    assert results[-1] == {"Vehicle.Immo": "OUT_OF_BOUNDS"}
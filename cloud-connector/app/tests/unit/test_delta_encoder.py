@@ -0,0 +1,111 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+from minidemocar2_pb2 import Vehicle as ProtoVehicle
+from minidemocar2_pb2 import VehicleDelta
+from publisher.delta_encoder import DeltaEncoder
+
+WHEEL_SPEED = "Vehicle.Chassis.Axle.Row1.Wheel.Left.Speed"
+LOCK_CONTROL = "Vehicle.Powertrain.PropulsionLockControl"
+
+
+def decode(encoded):
+    sequence, payload = encoded
+    delta = VehicleDelta()
+    delta.ParseFromString(payload)
+    assert delta.Sequence == sequence
+    return delta
+
+
+def test_first_update_is_keyframe():
+    state = ProtoVehicle()
+    state.Chassis.Axle.Row1.Wheel.Left.Speed = 12.5
+    encoder = DeltaEncoder(keyframeIntervalMs=1000)
+    encoder.markChanged(WHEEL_SPEED)
+
+    delta = decode(encoder.encode(state, 0))
+
+    assert delta.Keyframe
+    assert delta.State == state
+    assert encoder.encode(state, 10) is None
+
+
+def test_delta_only_carries_changed_leaves():
+    state = ProtoVehicle()
+    state.Body.Horn.IsActive = True
+    encoder = DeltaEncoder(keyframeIntervalMs=1000)
+    encoder.encode(state, 0)
+
+    state.Chassis.Axle.Row1.Wheel.Left.Speed = 3.0
+    state.Powertrain.PropulsionLockControl.extend([1, 2])
+    encoder.markChanged(WHEEL_SPEED)
+    encoder.markChanged(LOCK_CONTROL)
+    delta = decode(encoder.encode(state, 10))
+
+    assert not delta.Keyframe
+    assert delta.State.Chassis.Axle.Row1.Wheel.Left.Speed == 3.0
+    assert list(delta.State.Powertrain.PropulsionLockControl) == [1, 2]
+    assert not delta.State.HasField("Body")
+    assert len(delta.ClearedPaths) == 0
+
+
+def test_default_values_are_sent_as_cleared_paths():
+    state = ProtoVehicle()
+    encoder = DeltaEncoder(keyframeIntervalMs=1000)
+    encoder.encode(state, 0)
+
+    encoder.markChanged(WHEEL_SPEED)
+    delta = decode(encoder.encode(state, 10))
+
+    assert list(delta.ClearedPaths) == [WHEEL_SPEED]
+
+
+def test_rejected_delta_is_resent():
+    state = ProtoVehicle()
+    encoder = DeltaEncoder(keyframeIntervalMs=1000)
+    encoder.encode(state, 0)
+
+    state.Chassis.Axle.Row1.Wheel.Left.Speed = 7.0
+    encoder.markChanged(WHEEL_SPEED)
+    sequence, _ = encoder.encode(state, 10)
+    encoder.reject(sequence)
+    delta = decode(encoder.encode(state, 20))
+
+    assert delta.Sequence == sequence + 1
+    assert delta.State.Chassis.Axle.Row1.Wheel.Left.Speed == 7.0
+
+
+def test_rejected_keyframe_is_resent():
+    state = ProtoVehicle()
+    encoder = DeltaEncoder(keyframeIntervalMs=1000)
+    sequence, _ = encoder.encode(state, 0)
+    encoder.reject(sequence)
+
+    state.Chassis.Axle.Row1.Wheel.Left.Speed = 7.0
+    encoder.markChanged(WHEEL_SPEED)
+    delta = decode(encoder.encode(state, 10))
+
+    assert delta.Keyframe
+    assert delta.State == state
+
+
+def test_keyframe_interval():
+    state = ProtoVehicle()
+    encoder = DeltaEncoder(keyframeIntervalMs=1000)
+    encoder.encode(state, 0)
+
+    assert encoder.encode(state, 999) is None
+    assert decode(encoder.encode(state, 1000)).Keyframe
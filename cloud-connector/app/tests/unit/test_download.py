@@ -0,0 +1,144 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import hashlib
+import json
+import os
+
+import pytest
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from fota.download import RangedDownload
+from s3_stand_in import S3StandIn
+
+CHUNK_SIZE = 64 * 1024
+
+
+def download(s3, path, concurrency=4, decryption=None):
+    download = RangedDownload(
+        s3.client(),
+        "fota",
+        "vrte.tar",
+        path,
+        CHUNK_SIZE,
+        concurrency,
+        decryption=decryption,
+    )
+    download.run()
+    return download
+
+
+def encrypt(data, key, iv):
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    return encryptor.update(data) + encryptor.finalize()
+
+
+def test_downloads_ranges_in_parallel(tmp_path):
+    data = os.urandom(10 * CHUNK_SIZE + 123)
+    with S3StandIn(latency=0.05) as s3:
+        s3.put("fota", "vrte.tar", data)
+        result = download(s3, str(tmp_path / "vrte.tar"))
+    with open(result.path, "rb") as f:
+        assert f.read() == data
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert len(s3.requests) == 11
+    assert s3.max_active > 1
+    assert os.listdir(tmp_path) == ["vrte.tar"]
+
+
+def test_resumes_interrupted_download(tmp_path, monkeypatch):
+    monkeypatch.setattr("fota.download.time.sleep", lambda seconds: None)
+    data = os.urandom(8 * CHUNK_SIZE)
+    path = str(tmp_path / "vrte.tar")
+    with S3StandIn() as s3:
+        s3.put("fota", "vrte.tar", data)
+        s3.fail_after = 3
+        with pytest.raises(Exception):
+            download(s3, path, concurrency=1)
+        assert not os.path.exists(path)
+
+        s3.fail_after = None
+        s3.requests.clear()
+        result = download(s3, path)
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert len(s3.requests) == 5
+
+
+def test_restarts_when_object_changed(tmp_path, monkeypatch):
+    monkeypatch.setattr("fota.download.time.sleep", lambda seconds: None)
+    path = str(tmp_path / "vrte.tar")
+    with S3StandIn() as s3:
+        s3.put("fota", "vrte.tar", os.urandom(4 * CHUNK_SIZE))
+        s3.fail_after = 2
+        with pytest.raises(Exception):
+            download(s3, path, concurrency=1)
+
+        data = os.urandom(4 * CHUNK_SIZE)
+        s3.put("fota", "vrte.tar", data)
+        s3.fail_after = None
+        s3.requests.clear()
+        download(s3, path)
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert len(s3.requests) == 4
+
+
+def test_decrypts_while_downloading_and_after_resume(tmp_path, monkeypatch):
+    monkeypatch.setattr("fota.download.time.sleep", lambda seconds: None)
+    key, iv = os.urandom(32), os.urandom(16)
+    data = os.urandom(6 * CHUNK_SIZE)
+    path = str(tmp_path / "vrte.tar")
+    with S3StandIn() as s3:
+        s3.put("fota", "vrte.tar", encrypt(data, key, iv))
+        s3.fail_after = 2
+        with pytest.raises(Exception):
+            download(s3, path, concurrency=1, decryption=(key, iv))
+        s3.fail_after = None
+        result = download(s3, path, decryption=(key, iv))
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert not os.path.exists(path + ".part")
+
+
+def test_resumes_encrypted_download_with_all_chunks_written(tmp_path):
+    key, iv = os.urandom(32), os.urandom(16)
+    data = os.urandom(3 * CHUNK_SIZE)
+    path = str(tmp_path / "vrte.tar")
+    with S3StandIn() as s3:
+        s3.put("fota", "vrte.tar", encrypt(data, key, iv))
+        download(s3, path, decryption=(key, iv))
+        # stopped after the last chunk was recorded, before the rename
+        os.replace(path, path + ".part")
+        head = s3.client().head_object(Bucket="fota", Key="vrte.tar")
+        with open(path + ".part.json", "w") as f:
+            json.dump(
+                {
+                    "etag": head["ETag"],
+                    "size": head["ContentLength"],
+                    "chunk_size": CHUNK_SIZE,
+                    "next": 3,
+                },
+                f,
+            )
+        s3.requests.clear()
+        result = download(s3, path, decryption=(key, iv))
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert s3.requests == []
+    assert os.listdir(tmp_path) == ["vrte.tar"]
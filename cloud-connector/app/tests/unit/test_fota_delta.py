@@ -0,0 +1,136 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import gzip
+import hashlib
+import json
+import os
+import random
+
+import pytest
+from fota.delta import (
+    DeltaError,
+    apply_delta,
+    installed_base,
+    make_delta,
+    promote_pending,
+    record_flash_pending,
+)
+
+BLOCK_SIZE = 1024
+
+
+def write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+def releases(tmp_path):
+    generator = random.Random(7)
+    binaries = [generator.randbytes(20 * BLOCK_SIZE) for _ in range(4)]
+    base = b"".join(binaries)
+    # one binary changed, one grew, the others only moved
+    binaries[1] = generator.randbytes(20 * BLOCK_SIZE)
+    binaries[2] = b"patch" + binaries[2]
+    target = b"".join(binaries)
+    return write(tmp_path / "vrte_1.1.tar", base), write(
+        tmp_path / "vrte_1.2.tar", target
+    )
+
+
+def test_rebuilds_target_from_small_delta(tmp_path):
+    base, target = releases(tmp_path)
+    delta = str(tmp_path / "vrte.delta")
+    header = make_delta(base, target, delta, BLOCK_SIZE)
+    # the changed binary and the unaligned tail of the grown one
+    assert os.path.getsize(delta) < 25 * BLOCK_SIZE
+    rebuilt = str(tmp_path / "rebuilt.tar")
+    sha256 = apply_delta(base, delta, rebuilt, header["target_sha256"])
+    with open(target, "rb") as f:
+        content = f.read()
+    with open(rebuilt, "rb") as f:
+        assert f.read() == content
+    assert sha256 == hashlib.sha256(content).hexdigest()
+
+
+def test_rejects_other_base_and_corrupt_delta(tmp_path):
+    base, target = releases(tmp_path)
+    delta = str(tmp_path / "vrte.delta")
+    make_delta(base, target, delta, BLOCK_SIZE)
+    rebuilt = str(tmp_path / "rebuilt.tar")
+    with pytest.raises(DeltaError):
+        apply_delta(target, delta, rebuilt)
+    with open(delta, "rb") as f:
+        content = bytearray(f.read())
+    content[-10] ^= 0xFF
+    write(delta, bytes(content))
+    with pytest.raises(DeltaError):
+        apply_delta(base, delta, rebuilt)
+    assert not os.path.exists(rebuilt)
+    assert not os.path.exists(rebuilt + ".part")
+
+
+def test_flashed_package_becomes_base(tmp_path):
+    host_dir = str(tmp_path)
+    assert installed_base(host_dir) is None
+    write(tmp_path / "vrte_1.1.tar.gz", b"1.1")
+    record_flash_pending(host_dir, "vrte_1.1.tar.gz", "sha-1.1")
+    assert installed_base(host_dir) is None
+    assert promote_pending(host_dir)["file"] == "vrte_1.1.tar.gz"
+    write(tmp_path / "vrte_1.2.tar.gz", b"1.2")
+    record_flash_pending(host_dir, "vrte_1.2.tar.gz", "sha-1.2")
+    os.remove(tmp_path / "vrte_1.1.tar.gz")
+    # flashing 1.2 did not finish, 1.1 stays the base
+    base = installed_base(host_dir)
+    assert base["sha256"] == "sha-1.1"
+    with open(base["path"], "rb") as f:
+        assert f.read() == b"1.1"
+    promote_pending(host_dir)
+    assert installed_base(host_dir)["file"] == "vrte_1.2.tar.gz"
+    assert os.listdir(tmp_path / "installed") == ["vrte_1.2.tar.gz"]
+    with open(tmp_path / "installed.json") as f:
+        assert "pending" not in json.load(f)
+
+
+def test_gzipped_packages_are_delta_encoded_uncompressed(tmp_path):
+    base, target = releases(tmp_path)
+    with open(base, "rb") as f:
+        base_tar = f.read()
+    with open(target, "rb") as f:
+        target_tar = f.read()
+    write(tmp_path / "vrte_1.1.tar.gz", gzip.compress(base_tar))
+    write(tmp_path / "vrte_1.2.tar.gz", gzip.compress(target_tar))
+    delta = str(tmp_path / "vrte.delta")
+    header = make_delta(
+        str(tmp_path / "vrte_1.1.tar.gz"),
+        str(tmp_path / "vrte_1.2.tar.gz"),
+        delta,
+        BLOCK_SIZE,
+    )
+    assert os.path.getsize(delta) < 25 * BLOCK_SIZE
+    assert header["base_sha256"] == hashlib.sha256(base_tar).hexdigest()
+
+    host_dir = str(tmp_path)
+    record_flash_pending(host_dir, "vrte_1.1.tar.gz", "sha-of-download")
+    installed = promote_pending(host_dir)
+    assert installed == {"file": "vrte_1.1.tar", "sha256": header["base_sha256"]}
+
+    base = installed_base(host_dir)
+    rebuilt = str(tmp_path / "vrte_1.2.tar")
+    apply_delta(base["path"], delta, rebuilt, header["target_sha256"], base["sha256"])
+    with open(rebuilt, "rb") as f:
+        assert f.read() == target_tar
@@ -0,0 +1,102 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import json
+import os
+
+from fota.executor import FLASH_DONE_STATE, FOTA_CONTROL_TOPIC, FotaExecutor
+
+
+class Vip:
+    """Records the commands run against the VIP, ping fails as configured."""
+
+    def __init__(self, unreachable=False) -> None:
+        self.unreachable = unreachable
+        self.commands = []
+
+    def __call__(self, args, timeout=None):
+        self.commands.append(args)
+        if args[0] == "ping" and self.unreachable:
+            return 1
+        if args[0] == "tar":
+            os.makedirs(os.path.join(args[-1], "vrte", "bin"))
+        return 0
+
+
+def executor_for(tmp_path, vip, messages):
+    (tmp_path / "vrte_1.2.tar.gz").write_bytes(b"package")
+    return FotaExecutor(
+        str(tmp_path),
+        lambda topic, payload: messages.append((topic, payload)),
+        vip,
+        lambda seconds: None,
+    )
+
+
+def states(messages):
+    return [
+        json.loads(payload)["state"]
+        for topic, payload in messages
+        if topic == FOTA_CONTROL_TOPIC
+    ]
+
+
+def modes(messages):
+    return [payload for topic, payload in messages if topic == "fota_mode"]
+
+
+def test_flashes_queued_package(tmp_path):
+    vip, messages = Vip(), []
+    executor = executor_for(tmp_path, vip, messages)
+    assert executor.submit("vrte_1.2.tar.gz\n")
+    assert not executor.submit("vrte_1.2.tar.gz")
+    assert not executor.submit("missing.tar.gz")
+    assert executor.flash(executor.next_job())
+    assert states(messages) == [1, -2, 3, 4, 5, 6, 7, 8, 9, 10, 11, FLASH_DONE_STATE]
+    assert modes(messages) == ["1", "2", "5"]
+    assert any(args[0] == "tar" for args in vip.commands)
+    assert [args for args in vip.commands if "scp" in args][0][-2].endswith("bin")
+    assert executor.next_job() is None
+
+
+def test_unreachable_vip_is_not_touched(tmp_path):
+    vip, messages = Vip(unreachable=True), []
+    executor = executor_for(tmp_path, vip, messages)
+    executor.submit("vrte_1.2.tar.gz")
+    assert not executor.flash(executor.next_job())
+    assert states(messages) == [1, -2, -3]
+    assert modes(messages) == ["1", "3", "5"]
+    assert [args[0] for args in vip.commands] == ["ping"]
+
+
+def test_restart_resumes_interrupted_phase_and_queue(tmp_path):
+    vip, messages = Vip(), []
+    executor = executor_for(tmp_path, vip, messages)
+    (tmp_path / "vrte_1.3.tar.gz").write_bytes(b"package")
+    executor.submit("vrte_1.2.tar.gz")
+    executor.submit("vrte_1.3.tar.gz")
+    job = executor.next_job()
+    (tmp_path / "vrte" / "bin").mkdir(parents=True)
+    executor.enter(job, "copy_vrte")
+
+    # the CCU rebooted while copying
+    restarted = executor_for(tmp_path, vip, messages)
+    messages.clear()
+    job = restarted.next_job()
+    assert job == {"package": "vrte_1.2.tar.gz", "phase": "copy_vrte"}
+    assert restarted.flash(job)
+    assert states(messages) == [1, 8, 9, 10, 11, FLASH_DONE_STATE]
+    assert restarted.next_job()["package"] == "vrte_1.3.tar.gz"
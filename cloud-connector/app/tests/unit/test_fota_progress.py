@@ -0,0 +1,40 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import json
+
+from publisher.fota_progress import FotaProgress
+
+
+def test_updates_are_numbered_and_parsed():
+    progress = FotaProgress()
+    progress.reset(100)
+    first = progress.update("downloading file:vrte.tar", "download", 110)
+    second = progress.update('{"state": 3, "text": "Ping successfull"}', "flash", 120)
+    assert (first["sequence"], first["phase"]) == (1, "download")
+    assert (second["sequence"], second["state"]) == (2, 3)
+    assert second["text"] == "Ping successfull"
+    assert progress.summary()["state"] == 3
+
+
+def test_summary_size_is_bounded():
+    progress = FotaProgress(maxEntries=4, maxTextLength=10)
+    for i in range(100):
+        progress.update("x" * 50, "flash", i)
+    summary = progress.summary()
+    assert summary["sequence"] == 100
+    assert [update["sequence"] for update in summary["recent"]] == [97, 98, 99, 100]
+    assert len(json.dumps(summary)) < 600
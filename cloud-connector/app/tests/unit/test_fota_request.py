@@ -0,0 +1,87 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+from types import SimpleNamespace
+
+import fota.fota
+from fota.fota import handle_fota_request
+
+
+class FakeAwsClient:
+    def __init__(self) -> None:
+        self.messages = []
+
+    def publishFOTAControlMessage(self, payload, phase="flash"):
+        self.messages.append((phase, payload))
+
+
+def flash_request(tmp_path):
+    return {
+        "command": "flash-vip",
+        "file": "vrte.tar.gz",
+        "key": "",
+        "hostDir": str(tmp_path),
+    }
+
+
+def test_download_error_is_reported_as_failed(tmp_path, monkeypatch):
+    def failing_download(*args):
+        raise OSError("connection reset")
+
+    monkeypatch.setattr(fota.fota, "download_file_from_s3", failing_download)
+    awsClient = FakeAwsClient()
+
+    result = handle_fota_request(flash_request(tmp_path), None, None, awsClient)
+
+    assert result == {"state": "error", "file": "vrte.tar.gz"}
+    assert awsClient.messages[-1] == ("failed", "download failed: connection reset")
+
+
+def test_missing_package_is_not_flashed(tmp_path, monkeypatch):
+    monkeypatch.setattr(fota.fota, "download_file_from_s3", lambda *args: ("", None))
+    awsClient = FakeAwsClient()
+
+    result = handle_fota_request(flash_request(tmp_path), None, None, awsClient)
+
+    assert result == {"state": "error", "file": "vrte.tar.gz"}
+    assert awsClient.messages[-1] == ("failed", "package not found: vrte.tar.gz")
+
+
+class FakeFlashRequests:
+    def __init__(self, acknowledged):
+        self.acknowledged = acknowledged
+        self.packages = []
+
+    def publish(self, package):
+        self.packages.append(package)
+        return self.acknowledged
+
+
+def test_unacknowledged_flash_request_is_reported_as_failed(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        fota.fota, "download_file_from_s3", lambda *args: ("vrte.tar.gz", None)
+    )
+    for acknowledged in (True, False):
+        vehicleApp = SimpleNamespace(flashRequests=FakeFlashRequests(acknowledged))
+        awsClient = FakeAwsClient()
+
+        result = handle_fota_request(
+            flash_request(tmp_path), vehicleApp, None, awsClient
+        )
+
+        assert vehicleApp.flashRequests.packages == ["vrte.tar.gz"]
+        assert result["state"] == ("ok" if acknowledged else "error")
+        assert (awsClient.messages[-1][0] == "failed") != acknowledged
@@ -0,0 +1,75 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import json
+
+from fota.manifest import load_manifest, resolve_fota_object, write_manifest
+from s3_stand_in import S3StandIn
+
+
+def test_resolves_key_of_s3_uri_directly():
+    with S3StandIn() as s3:
+        for i in range(50):
+            s3.put("fota", "other/file{}.tar".format(i), b"x")
+        s3.put("fota", "enc_PT.dbc", b"package")
+        client = s3.client()
+        key, head, entry = resolve_fota_object(client, "fota", "s3://fota/enc_PT.dbc")
+        assert key == "enc_PT.dbc"
+        assert head["ContentLength"] == 7
+        assert resolve_fota_object(client, "fota", "PT.dbc") == (None, None, None)
+        # no listing, one HEAD per request
+        assert s3.requests == []
+        assert s3.heads == 2
+
+
+def test_resolves_key_from_campaign_manifest():
+    with S3StandIn() as s3:
+        s3.put("fota", "campaigns/2024-08/vrte.tar", b"vrte")
+        s3.put("fota", "campaigns/2024-09/vrte.tar", b"newer vrte")
+        client = s3.client()
+        files = write_manifest(
+            client, "fota", "campaigns/2024-09", {"vrte.tar": {"sha256": "ab"}}
+        )
+        assert list(files) == ["vrte.tar"]
+        manifest = json.loads(s3.objects[("fota", "campaigns/2024-09/manifest.json")])
+        assert manifest["files"]["vrte.tar"]["size"] == 10
+
+        key, head, entry = resolve_fota_object(
+            client, "fota", "vrte.tar", campaign="campaigns/2024-09"
+        )
+        assert key == "campaigns/2024-09/vrte.tar"
+        assert entry["sha256"] == "ab"
+        # unchanged manifest is served from the cache
+        assert load_manifest(client, "fota", "campaigns/2024-09") == files
+
+
+def test_manifest_is_fetched_conditionally_only_when_cached():
+    with S3StandIn() as s3:
+        s3.put("fota", "campaigns/2024-10/vrte.tar", b"vrte")
+        client = s3.client()
+        write_manifest(client, "fota", "campaigns/2024-10")
+        conditions = []
+
+        def record(request, **kwargs):
+            if request.url.endswith("manifest.json"):
+                conditions.append(request.headers.get("If-None-Match"))
+
+        client.meta.events.register("before-send.s3.GetObject", record)
+        load_manifest(client, "fota", "campaigns/2024-10")
+        load_manifest(client, "fota", "campaigns/2024-10")
+
+        assert conditions[0] is None
+        assert conditions[1]
@@ -0,0 +1,76 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+from publisher.outbox import Outbox
+
+
+def test_messages_survive_reopen(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    outbox = Outbox(path)
+    outbox.append("ack", '{"ack": 1}', 1)
+    outbox.append("state", b"\x01", 1, retain=True)
+
+    reopened = Outbox(path)
+
+    assert len(reopened) == 2
+    assert [message[1:] for message in reopened.peek(10)] == [
+        ("ack", b'{"ack": 1}', 1, False),
+        ("state", b"\x01", 1, True),
+    ]
+
+
+def test_coalesced_messages_keep_latest(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    outbox.append("state", b"old", 1, coalesceKey="state")
+    outbox.append("ack", b"ack", 1)
+    outbox.append("state", b"new", 1, coalesceKey="state")
+
+    assert [message[2] for message in outbox.peek(10)] == [b"ack", b"new"]
+
+
+def test_oldest_messages_are_evicted(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"), maxBytes=10)
+    for index in range(5):
+        outbox.append("telemetry", bytes([index]) * 4, 1)
+
+    assert [message[2][0] for message in outbox.peek(10)] == [3, 4]
+    assert outbox.size == 8
+
+
+def test_remove(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    outbox.append("ack", b"ack", 1)
+    messageId = outbox.peek(1)[0][0]
+
+    outbox.remove(messageId)
+
+    assert len(outbox) == 0
+    assert outbox.size == 0
+
+
+def test_eviction_drops_only_what_is_needed(tmp_path, capsys):
+    outbox = Outbox(str(tmp_path / "outbox.db"), maxBytes=10)
+    outbox.append("telemetry", b"a" * 3, 1)
+    outbox.append("telemetry", b"b" * 3, 1)
+    outbox.append("telemetry", b"c" * 3, 1)
+    assert "dropped" not in capsys.readouterr().out
+
+    outbox.append("telemetry", b"d" * 5, 1)
+
+    assert [message[2][0:1] for message in outbox.peek(10)] == [b"c", b"d"]
+    assert outbox.size == 8
+    assert len(outbox) == 2
+    assert "dropped 6 bytes" in capsys.readouterr().out
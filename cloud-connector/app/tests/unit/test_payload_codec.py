@@ -0,0 +1,53 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import pytest
+from publisher.payload_codec import HEADER, PayloadCodec
+
+PAYLOAD = b"\x2a\x0c\x0a\x0a\x0a\x08\x12\x06\x0d\x00\x00\x48\x41" * 4
+
+
+def test_uncompressed_payload_is_unchanged():
+    codec = PayloadCodec()
+
+    assert codec.encode(PAYLOAD) is PAYLOAD
+    assert codec.decode(PAYLOAD) == PAYLOAD
+
+
+@pytest.mark.parametrize("name", ["zlib", "zstd"])
+def test_roundtrip_with_dictionary(name):
+    codec = PayloadCodec()
+    codec.configure(name, PAYLOAD * 8)
+
+    encoded = codec.encode(PAYLOAD)
+    magic, codecId, dictionaryId = HEADER.unpack_from(encoded)
+
+    assert magic == 0
+    assert codecId == codec.codecId
+    assert dictionaryId == codec.dictionaryId != 0
+    assert len(encoded) < len(PAYLOAD)
+    assert codec.decode(encoded) == PAYLOAD
+
+
+def test_unknown_dictionary_is_rejected():
+    codec = PayloadCodec()
+    codec.configure("zlib", b"dictionary")
+    encoded = codec.encode(PAYLOAD)
+
+    codec.configure("zlib", b"other dictionary")
+
+    with pytest.raises(ValueError):
+        codec.decode(encoded)
@@ -0,0 +1,53 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+from minidemocar2_pb2 import Vehicle as ProtoVehicle
+from publisher.proto_setters import (
+    compileSetterTable,
+    findUnmappedFilters,
+    findUnmappedSignals,
+)
+
+
+def test_setters_write_scalar_and_repeated_fields():
+    state = ProtoVehicle()
+    table = compileSetterTable(state)
+
+    table["Vehicle.Chassis.Axle.Row1.Wheel.Left.Speed"](4.5)
+    table["Vehicle.Powertrain.PropulsionLockControl"]([1, 2])
+    table["Vehicle.Powertrain.PropulsionLockControl"]([3])
+
+    assert state.Chassis.Axle.Row1.Wheel.Left.Speed == 4.5
+    assert list(state.Powertrain.PropulsionLockControl) == [3]
+
+
+def test_only_leaves_are_mapped():
+    table = compileSetterTable(ProtoVehicle())
+
+    assert "Vehicle.StartPermissions" in table
+    assert "Vehicle.Chassis" not in table
+    assert "Vehicle.Chassis.Axle.Row1" not in table
+
+
+def test_unmapped_signals_and_filters():
+    table = compileSetterTable(ProtoVehicle())
+
+    assert findUnmappedSignals(
+        table, ["Vehicle.Body.Horn.IsActive", "Vehicle.Speed"]
+    ) == ["Vehicle.Speed"]
+    assert findUnmappedFilters(table, ["Vehicle.", "Vehicle.Cabin"]) == [
+        "Vehicle.Cabin"
+    ]
@@ -0,0 +1,45 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+from s3_stand_in import S3StandIn
+from utils.s3_pool import S3ClientPool
+
+
+def test_reuses_client_until_credentials_rotate():
+    pool = S3ClientPool(maxClients=2)
+    with S3StandIn() as s3:
+        s3.put("upload", "a.log", b"log")
+        first = pool.client(("key1", "secret", "token"), s3.endpoint)
+        assert pool.client(("key1", "secret", "token"), s3.endpoint) is first
+        assert first.get_object(Bucket="upload", Key="a.log")["Body"].read() == b"log"
+
+        rotated = pool.client(("key2", "secret", "token"), s3.endpoint)
+        assert rotated is not first
+        pool.client(("key3", "secret", "token"), s3.endpoint)
+    assert pool.metrics() == {
+        "clients": 2,
+        "created": 3,
+        "reused": 1,
+        "evicted": 1,
+        "httpSessions": 0,
+    }
+
+
+def test_http_sessions_are_shared_per_certificate():
+    pool = S3ClientPool()
+    cert = ("cert.pem", "private.key")
+    assert pool.httpSession(cert) is pool.httpSession(cert)
+    assert pool.httpSession(cert).cert == cert
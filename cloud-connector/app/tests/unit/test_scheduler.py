@@ -0,0 +1,68 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import asyncio
+
+import pytest
+from publisher.scheduler import PublishScheduler, timeMillis
+
+
+def test_changes_are_rate_limited():
+    scheduler = PublishScheduler()
+    scheduler.lastPublish = 1000
+    scheduler.lastActivity = 1000
+
+    scheduler.notifyChange()
+
+    assert scheduler.nextDeadline(1100) == 1000 + scheduler.stateUpdateRateMs
+
+
+def test_refresh_without_changes():
+    scheduler = PublishScheduler()
+    scheduler.lastPublish = 1000
+    scheduler.lastActivity = 1000
+
+    assert scheduler.nextDeadline(1100) == 1000 + scheduler.stateRefreshIntervalMs
+
+
+def test_idle_rate():
+    scheduler = PublishScheduler()
+    scheduler.idleStateTriggerTimeMs = 100
+    scheduler.idleStatePublishIntervall = 20000
+    scheduler.lastPublish = 1000
+    scheduler.lastActivity = 0
+
+    scheduler.notifyChange()
+
+    assert scheduler.isIdle(1000)
+    assert scheduler.nextDeadline(1000) == 21000
+
+
+@pytest.mark.asyncio
+async def test_change_wakes_waiting_publisher():
+    scheduler = PublishScheduler()
+    scheduler.stateUpdateRateMs = 0
+    scheduler.lastPublish = timeMillis()
+
+    waiter = asyncio.ensure_future(scheduler.waitUntilDue())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    scheduler.notifyChange()
+
+    currentTime = await asyncio.wait_for(waiter, 1)
+    assert scheduler.takeStateSlot(currentTime)
+    assert not scheduler.pending
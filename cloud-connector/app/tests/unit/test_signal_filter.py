@@ -0,0 +1,118 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+from publisher.signal_filter import SignalFilters
+
+WHEEL_SPEED = "Vehicle.Chassis.Axle.Row1.Wheel.Left.Speed"
+
+
+def test_unfiltered_signals_pass():
+    filters = SignalFilters()
+
+    assert filters.accept(WHEEL_SPEED, 1.0, 0)
+    assert filters.accept(WHEEL_SPEED, 1.0, 0)
+
+
+def test_absolute_deadband_and_longest_prefix():
+    filters = SignalFilters()
+    filters.configure(
+        {
+            "Vehicle.Chassis": {"deadbandAbs": 10},
+            "Vehicle.Chassis.Axle": {"deadbandAbs": 0.5},
+        }
+    )
+
+    assert filters.accept(WHEEL_SPEED, 1.0, 0)
+    assert not filters.accept(WHEEL_SPEED, 1.4, 10)
+    assert filters.accept(WHEEL_SPEED, 1.6, 20)
+
+
+def test_relative_deadband_ignores_booleans():
+    filters = SignalFilters()
+    filters.configure({"Vehicle.": {"deadbandRel": 0.1}})
+
+    assert filters.accept(WHEEL_SPEED, 100.0, 0)
+    assert not filters.accept(WHEEL_SPEED, 109.0, 10)
+    assert filters.accept("Vehicle.Body.Horn.IsActive", True, 0)
+    assert filters.accept("Vehicle.Body.Horn.IsActive", False, 10)
+
+
+def test_min_and_max_interval():
+    filters = SignalFilters()
+    filters.configure(
+        {WHEEL_SPEED: {"deadbandAbs": 5, "minIntervalMs": 100, "maxIntervalMs": 1000}}
+    )
+
+    assert filters.accept(WHEEL_SPEED, 1.0, 0)
+    assert not filters.accept(WHEEL_SPEED, 20.0, 50)
+    assert filters.accept(WHEEL_SPEED, 20.0, 150)
+    assert not filters.accept(WHEEL_SPEED, 20.1, 500)
+    assert filters.accept(WHEEL_SPEED, 20.1, 1150)
+
+
+def test_held_back_value_is_flushed_after_max_interval():
+    filters = SignalFilters()
+    filters.configure({WHEEL_SPEED: {"deadbandAbs": 5, "maxIntervalMs": 1000}})
+
+    assert filters.accept(WHEEL_SPEED, 1.0, 0)
+    assert filters.deadline() is None
+    assert not filters.accept(WHEEL_SPEED, 2.0, 100)
+    assert not filters.accept(WHEEL_SPEED, 3.0, 200)
+
+    assert filters.deadline() == 1000
+    assert filters.flushDue(999) == []
+    assert filters.flushDue(1000) == [(WHEEL_SPEED, 3.0)]
+    assert filters.deadline() is None
+    assert not filters.accept(WHEEL_SPEED, 4.0, 1100)
+
+
+def test_unknown_filter_settings_are_skipped():
+    filters = SignalFilters()
+    filters.configure(
+        {
+            "Vehicle.Chassis": {"deadbandAbs": 0.5, "deadband": 10},
+            "Vehicle.Body": 5,
+        }
+    )
+
+    assert filters.accept(WHEEL_SPEED, 1.0, 0)
+    assert not filters.accept(WHEEL_SPEED, 1.4, 10)
+    assert filters.filterFor("Vehicle.Body.Horn.IsActive") is None
+
+
+def test_value_dropped_by_min_interval_is_flushed_after_it():
+    filters = SignalFilters()
+    filters.configure({WHEEL_SPEED: {"minIntervalMs": 1000}})
+
+    assert filters.accept(WHEEL_SPEED, 0.0, 0)
+    assert not filters.accept(WHEEL_SPEED, 50.0, 100)
+
+    assert filters.deadline() == 1000
+    assert filters.flushDue(5000) == [(WHEEL_SPEED, 50.0)]
+    assert filters.deadline() is None
+
+
+def test_value_within_deadband_waits_for_max_interval():
+    filters = SignalFilters()
+    filters.configure(
+        {WHEEL_SPEED: {"deadbandAbs": 5, "minIntervalMs": 100, "maxIntervalMs": 1000}}
+    )
+
+    assert filters.accept(WHEEL_SPEED, 1.0, 0)
+    assert not filters.accept(WHEEL_SPEED, 2.0, 50)
+    assert filters.deadline() == 1000
+    assert not filters.accept(WHEEL_SPEED, 20.0, 60)
+    assert filters.deadline() == 100
@@ -0,0 +1,96 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import asyncio
+
+from utils.signal_writes import INVALID_WRITE, SignalWrites
+from utils.vss_catalog import VssCatalog, VssSignal
+
+SPEED = "Vehicle.Speed"
+HORN = "Vehicle.Body.Horn.IsActive"
+
+
+class FakeWriter:
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.writes = []
+
+    async def write(self, writes):
+        self.writes.append(writes)
+        return self.errors
+
+    async def set(self, name, value, datatype):
+        return await self.write({name: (value, datatype)})
+
+
+def createWrites(errors=None):
+    catalog = VssCatalog(
+        {SPEED: VssSignal("float", maximum=250), HORN: VssSignal("boolean")}
+    )
+    return SignalWrites(FakeWriter(errors), catalog)
+
+
+def test_batch_is_written_in_one_request():
+    writes = createWrites({HORN: "OUT_OF_BOUNDS"})
+    results = asyncio.run(
+        writes.transmitBatch(
+            [{"signal": SPEED, "value": 50.0}, {"signal": HORN, "value": True}]
+        )
+    )
+    assert writes.writer.writes == [{SPEED: (50.0, "float"), HORN: (True, "boolean")}]
+    assert results == {SPEED: "OK", HORN: "OUT_OF_BOUNDS"}
+
+
+def test_nothing_is_written_if_a_value_is_rejected():
+    writes = createWrites()
+    results = asyncio.run(
+        writes.transmitBatch(
+            [
+                {"signal": SPEED, "value": 300.0},
+                {"signal": HORN, "value": True},
+                {"value": 1},
+                {"signal": "Vehicle.Cabin.Light"},
+            ]
+        )
+    )
+    assert writes.writer.writes == []
+    assert results == {
+        SPEED: "300.0 above max 250",
+        HORN: "NOT_APPLIED",
+        "#2": INVALID_WRITE,
+        "Vehicle.Cabin.Light": INVALID_WRITE,
+    }
+
+
+def test_signals_must_be_a_list():
+    writes = createWrites()
+    results = asyncio.run(writes.transmitBatch({"signal": SPEED, "value": 1.0}))
+    assert results == {"signals": INVALID_WRITE}
+    assert writes.writer.writes == []
+
+
+def test_single_write_reports_its_result():
+    writes = createWrites()
+    assert asyncio.run(writes.transmitSingle({"signal": SPEED, "value": 1.0})) == {
+        SPEED: "OK"
+    }
+    assert asyncio.run(writes.transmitSingle({"signal": HORN, "value": 1})) == {
+        HORN: "expected boolean"
+    }
+    assert asyncio.run(writes.transmitSingle({"signal": SPEED})) == {
+        SPEED: INVALID_WRITE
+    }
+    assert writes.writer.writes == [{SPEED: (1.0, "float")}]
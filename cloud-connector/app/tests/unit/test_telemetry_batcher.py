@@ -0,0 +1,53 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+from minidemocar2_pb2 import TelemetryBatch
+from publisher.telemetry_batcher import TelemetryBatcher
+
+WHEEL_SPEED = "Vehicle.Chassis.Axle.Row1.Wheel.Left.Speed"
+LOCK_CONTROL = "Vehicle.Powertrain.PropulsionLockControl"
+
+
+def test_samples_are_kept_with_timestamps():
+    batcher = TelemetryBatcher(maxSamples=10, maxAgeMs=1000)
+    batcher.add(WHEEL_SPEED, 1.5, 100, 0, 0)
+    batcher.add(WHEEL_SPEED, 2.5, 100, 2000000, 1)
+    batcher.add(LOCK_CONTROL, [1, 0], 101, 0, 2)
+
+    batch = TelemetryBatch()
+    batch.ParseFromString(batcher.flush())
+
+    assert batch.Sequence == 1
+    assert batch.BaseTimeSec == 100
+    speed, lock = batch.Series
+    assert speed.Path == WHEEL_SPEED
+    assert list(speed.FloatValues) == [1.5, 2.5]
+    assert list(speed.TimeOffsetUs) == [0, 2000]
+    assert list(lock.ArrayValues[0].Values) == [1, 0]
+    assert list(lock.TimeOffsetUs) == [1000000]
+    assert batcher.flush() is None
+
+
+def test_batch_is_due_by_count_or_age():
+    batcher = TelemetryBatcher(maxSamples=2, maxAgeMs=1000)
+    assert batcher.deadline() is None
+
+    batcher.add(WHEEL_SPEED, 1.0, 100, 0, 500)
+    assert not batcher.due(1499)
+    assert batcher.due(1500)
+
+    batcher.add(WHEEL_SPEED, 1.0, 100, 0, 600)
+    assert batcher.due(600)
@@ -0,0 +1,68 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import json
+import os
+
+from s3_stand_in import S3StandIn
+from uploader.engine import UploadEngine
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+def write_files(directory, sizes):
+    files = []
+    for index, size in enumerate(sizes):
+        path = os.path.join(directory, "trace{}.dlt".format(index))
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        files.append((path, os.path.basename(path)))
+    return files
+
+
+def test_uploads_files_in_parallel_and_large_ones_in_parts(tmp_path):
+    files = write_files(str(tmp_path), [1000] * 8 + [2 * PART_SIZE + 10])
+    with S3StandIn(latency=0.05) as s3:
+        client = s3.client()
+        engine = UploadEngine(lambda: client, "upload", workers=4, part_size=PART_SIZE)
+        report = engine.upload(files)
+    assert report["uploaded"] == 9
+    assert report["failed"] == 0
+    assert report["bytes"] == 8 * 1000 + 2 * PART_SIZE + 10
+    assert s3.max_active > 1
+    assert s3.parts_received == 3
+    for path, key in files:
+        with open(path, "rb") as f:
+            assert s3.objects[("upload", key)] == f.read()
+    json.dumps(report)
+
+
+def test_retries_failed_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("uploader.engine.time.sleep", lambda seconds: None)
+    files = write_files(str(tmp_path), [100])
+    with S3StandIn() as s3:
+        s3.put_failures = 1
+        client = s3.client()
+        report = UploadEngine(lambda: client, "upload").upload(files)
+    assert report["results"][0]["result"] == "success"
+    assert report["results"][0]["attempts"] == 2
+
+
+def test_reports_missing_credentials(tmp_path):
+    files = write_files(str(tmp_path), [100])
+    report = UploadEngine(lambda: None, "upload").upload(files)
+    assert report["failed"] == 1
+    assert report["results"][0]["result"] == "AWS S3 credentials missing"
@@ -0,0 +1,96 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import json
+import os
+import threading
+import time
+
+from s3_stand_in import S3StandIn
+from uploader.engine import UploadEngine
+from uploader.jobs import UploadJobQueue
+
+
+def write_files(directory, count, size):
+    files = []
+    for index in range(count):
+        path = os.path.join(directory, "trace{}.dlt".format(index))
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        files.append((path, os.path.basename(path)))
+    return files
+
+
+class Reports:
+    def __init__(self) -> None:
+        self.statuses = []
+        self.results = {}
+        self.finished = threading.Event()
+
+    def __call__(self, status, result):
+        json.dumps(status)
+        self.statuses.append(status)
+        if status["state"] in ("done", "cancelled", "failed"):
+            self.results[status["id"]] = result
+            self.finished.set()
+
+
+def upload_job(client, files, workers=4):
+    def run(job):
+        job.planned(len(files), sum(os.path.getsize(path) for path, _ in files))
+        engine = UploadEngine(lambda: client, "upload", workers=workers, job=job)
+        return engine.upload(files)
+
+    return run
+
+
+def test_job_reports_progress_and_result(tmp_path):
+    files = write_files(str(tmp_path), 6, 1000)
+    reports = Reports()
+    with S3StandIn(latency=0.02) as s3:
+        jobs = UploadJobQueue(upload_job(s3.client(), files), reports, 0)
+        job = jobs.submit(str(tmp_path), "*.dlt", job_id="job-1")
+        assert reports.finished.wait(10)
+    assert job.id == "job-1"
+    states = [status["state"] for status in reports.statuses]
+    assert states[:2] == ["queued", "running"]
+    assert states[-1] == "done"
+    final = reports.statuses[-1]
+    assert final["filesDone"] == final["files"] == 6
+    assert final["bytesDone"] == final["bytes"] == 6000
+    assert any(status["eta"] is not None for status in reports.statuses)
+    assert reports.results["job-1"]["uploaded"] == 6
+
+
+def test_cancel_running_and_queued_jobs(tmp_path):
+    files = write_files(str(tmp_path), 20, 1000)
+    reports = Reports()
+    with S3StandIn(latency=0.1) as s3:
+        jobs = UploadJobQueue(upload_job(s3.client(), files, workers=1), reports, 0)
+        running = jobs.submit(str(tmp_path), "*.dlt")
+        queued = jobs.submit(str(tmp_path), "*.dlt")
+        while running.files_done == 0:
+            time.sleep(0.01)
+        assert jobs.cancel(queued.id)
+        assert jobs.cancel(running.id)
+        while queued.finished is None:
+            time.sleep(0.01)
+    assert running.state == "cancelled"
+    assert 0 < running.files_done < 20
+    assert reports.results[running.id]["cancelled"] > 0
+    assert queued.state == "cancelled"
+    assert queued.files_done == 0
+    assert not jobs.cancel(queued.id)
@@ -0,0 +1,117 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import os
+
+from s3_stand_in import S3StandIn
+from uploader.engine import UploadEngine
+from uploader.manifest import UploadManifest
+
+
+def upload(manifest, engine, path):
+    plan = manifest.plan(path, os.path.basename(path))
+    if plan["action"] != "skip":
+        assert engine.delete(plan.get("stale_parts", []))
+        report = engine.upload(
+            [(path, plan["key"], plan["offset"], plan["size"] - plan["offset"])]
+        )
+        assert report["uploaded"] == 1
+        manifest.record(plan)
+    return plan
+
+
+def test_skips_unchanged_and_appends_grown_files(tmp_path):
+    manifest = UploadManifest(str(tmp_path / "uploads.db"))
+    log = str(tmp_path / "app.log")
+    with open(log, "wb") as f:
+        f.write(b"first line\n")
+    with S3StandIn() as s3:
+        client = s3.client()
+        engine = UploadEngine(lambda: client, "upload")
+        assert upload(manifest, engine, log)["action"] == "upload"
+        assert upload(manifest, engine, log)["action"] == "skip"
+
+        os.utime(log)
+        assert upload(manifest, engine, log)["action"] == "skip"
+
+        with open(log, "ab") as f:
+            f.write(b"second line\n")
+        plan = upload(manifest, engine, log)
+        assert (plan["action"], plan["key"]) == ("append", "app.log.part1")
+        assert s3.objects[("upload", "app.log.part1")] == b"second line\n"
+        assert upload(manifest, engine, log)["action"] == "skip"
+
+        with open(log, "wb") as f:
+            f.write(b"rotated\n")
+        assert upload(manifest, engine, log)["action"] == "upload"
+        assert s3.objects[("upload", "app.log")] == b"rotated\n"
+
+
+def test_manifest_survives_restart(tmp_path):
+    trace = str(tmp_path / "trace.dlt")
+    with open(trace, "wb") as f:
+        f.write(b"trace")
+    manifest = UploadManifest(str(tmp_path / "uploads.db"))
+    manifest.record(manifest.plan(trace, "trace.dlt"))
+    restarted = UploadManifest(str(tmp_path / "uploads.db"))
+    assert restarted.plan(trace, "trace.dlt")["action"] == "skip"
+
+
+def test_touched_file_is_not_hashed_again(tmp_path, monkeypatch):
+    trace = str(tmp_path / "trace.dlt")
+    with open(trace, "wb") as f:
+        f.write(b"trace")
+    manifest = UploadManifest(str(tmp_path / "uploads.db"))
+    manifest.record(manifest.plan(trace, "trace.dlt"))
+    os.utime(trace, ns=(0, 0))
+    assert manifest.plan(trace, "trace.dlt")["action"] == "skip"
+
+    def no_hashing(*args):
+        raise AssertionError("hashed again")
+
+    monkeypatch.setattr("uploader.manifest.file_digest", no_hashing)
+    assert manifest.plan(trace, "trace.dlt")["action"] == "skip"
+
+
+def test_vanished_file_is_skipped(tmp_path):
+    manifest = UploadManifest(str(tmp_path / "uploads.db"))
+    assert manifest.plan(str(tmp_path / "rotated.log"), "rotated.log") is None
+
+
+def test_rotation_deletes_parts_of_the_old_content(tmp_path):
+    manifest = UploadManifest(str(tmp_path / "uploads.db"))
+    log = str(tmp_path / "a.log")
+    with S3StandIn() as s3:
+        client = s3.client()
+        engine = UploadEngine(lambda: client, "upload")
+        # 10, 20 and 30 bytes
+        for _ in range(3):
+            with open(log, "ab") as f:
+                f.write(b"x" * 10)
+            upload(manifest, engine, log)
+        assert ("upload", "a.log.part2") in s3.objects
+
+        with open(log, "wb") as f:
+            f.write(b"y" * 5)
+        plan = upload(manifest, engine, log)
+        assert plan["stale_parts"] == ["a.log.part1", "a.log.part2"]
+        with open(log, "ab") as f:
+            f.write(b"z" * 10)
+        upload(manifest, engine, log)
+
+        assert sorted(key for bucket, key in s3.objects) == ["a.log", "a.log.part1"]
+        assert s3.objects[("upload", "a.log")] == b"y" * 5
+        assert s3.objects[("upload", "a.log.part1")] == b"z" * 10
@@ -0,0 +1,75 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import base64
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from fota.download import RangedDownload
+from fota.fota import package_verifier
+from fota.verify import PackageVerifier, VerificationError
+from s3_stand_in import S3StandIn
+
+PACKAGE = b"vrte package" * 1000
+
+
+def test_verifies_rsa_and_ecdsa_signatures():
+    digest = hashlib.sha256(PACKAGE).digest()
+    rsaKey = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    rsaSignature = rsaKey.sign(PACKAGE, padding.PKCS1v15(), hashes.SHA256())
+    ecKey = ec.generate_private_key(ec.SECP256R1())
+    ecSignature = ecKey.sign(PACKAGE, ec.ECDSA(hashes.SHA256()))
+
+    for key, signature in ((rsaKey, rsaSignature), (ecKey, ecSignature)):
+        verifier = PackageVerifier.from_metadata(
+            {"signature": base64.b64encode(signature).decode()},
+            {"sha256": digest.hex()},
+            key.public_key(),
+        )
+        verifier.verify(digest)
+        with pytest.raises(VerificationError):
+            verifier.verify(hashlib.sha256(b"corrupt").digest())
+
+
+def test_corrupt_download_is_deleted(tmp_path):
+    path = str(tmp_path / "vrte.tar")
+    verifier = PackageVerifier(sha256=hashlib.sha256(b"expected").hexdigest())
+    with S3StandIn() as s3:
+        s3.put("fota", "vrte.tar", PACKAGE)
+        download = RangedDownload(
+            s3.client(), "fota", "vrte.tar", path, 4096, verifier=verifier
+        )
+        with pytest.raises(VerificationError):
+            download.run()
+    assert os.listdir(tmp_path) == []
+
+
+def test_package_without_digest_is_rejected_unless_allowed():
+    config = SimpleNamespace(
+        fota_public_key="missing.pub",
+        fota_require_signature=False,
+        fota_allow_unverified=False,
+    )
+    with pytest.raises(VerificationError, match="no sha256 or signature"):
+        package_verifier({"Metadata": {}}, {}, config)
+    assert package_verifier({"Metadata": {"sha256": "ab"}}, {}, config).checks
+
+    config.fota_allow_unverified = "true"
+    assert not package_verifier({"Metadata": {}}, {}, config).checks
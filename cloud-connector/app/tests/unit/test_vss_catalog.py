@@ -0,0 +1,46 @@
+# Copyright (c) 2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# skip B101
+
+import os
+
+from utils.vss_catalog import VssCatalog
+
+CATALOG = os.path.join(
+    os.path.dirname(__file__), "../../../immo-vss/vss_rel_5.0-immo.json"
+)
+
+
+def test_resolves_datatypes_from_catalog():
+    catalog = VssCatalog.load(CATALOG)
+    assert catalog.get("Vehicle.Body.Lights.Brake.Left.IsActive").datatype == "string"
+    assert catalog.get("Vehicle.Unknown") is None
+
+
+def test_validates_values():
+    catalog = VssCatalog.load(CATALOG)
+    brake = catalog.get("Vehicle.Body.Lights.Brake.Left.IsActive")
+    assert brake.validate("ACTIVE") is None
+    assert brake.validate("BLINKING") is not None
+    uint8Arrays = [s for s in catalog.signals.values() if s.datatype == "uint8[]"]
+    assert uint8Arrays[0].validate([0, 255]) is None
+    assert uint8Arrays[0].validate([256]) is not None
+    assert uint8Arrays[0].validate(True) is not None
+    booleans = [s for s in catalog.signals.values() if s.datatype == "boolean"]
+    assert booleans[0].validate(1) is not None
+
+
+def test_missing_catalog_is_empty():
+    assert VssCatalog.load("/nonexistent.json").signals == {}